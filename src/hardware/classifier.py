@@ -18,10 +18,10 @@ __docformat__ = 'epytext'
 
 # Native imports
 import os
-from   itertools import izip
+from multiprocessing import Pool
 
-# Third party imports
-import numpy as np
+# Program imports
+from lfw_gender.hw_results import read_labels, result_accuracy, aggregate
 
 def classify(test_path, source_path):
 	"""
@@ -32,14 +32,7 @@ def classify(test_path, source_path):
 	@param source_path: The Full path to the output from the HW.
 	"""
 	
-	accuracy = 0.
-	c        = 0
-	with open(test_path, 'rb') as yt, open(source_path, 'rb') as ys:
-		for tline, sline in izip(yt, ys):
-			c += 1
-			if tline[0] == sline[0]: accuracy += 1
-	
-	return (accuracy / c) * 100
+	return result_accuracy(source_path, read_labels(test_path))[0]
 
 def main(train_dir, test_dir, train_path, test_path):
 	"""
@@ -55,25 +48,18 @@ def main(train_dir, test_dir, train_path, test_path):
 	@param test_path: The full path to the HW test file.
 	"""
 	
-	# Get all of the training data
-	train = []
-	for path in os.listdir(train_dir):
-		train.append(classify(train_path, os.path.join(train_dir, path)))
-	train_results = np.array(train)
-	
-	# Get all of the testing data
-	test = []
-	for path in os.listdir(test_dir):
-		test.append(classify(test_path, os.path.join(test_dir, path)))
-	test_results = np.array(test)
-	
-	# Compute the mean costs
-	train_mean = np.mean(train_results, 0)
-	test_mean  = np.mean(test_results, 0)
-	
-	# Compute the standard deviations
-	train_std = np.std(train_results, 0)
-	test_std  = np.std(test_results, 0)
+	# Compute the mean and standard deviation of the first epoch of each file
+	pool = Pool()
+	try:
+		train_mean, train_std, _ = aggregate(train_dir, read_labels(
+			train_path), pool=pool)
+		test_mean, test_std, _   = aggregate(test_dir, read_labels(test_path),
+			pool=pool)
+	finally:
+		pool.terminate()
+		pool.join()
+	train_mean, train_std = train_mean[0], train_std[0]
+	test_mean, test_std   = test_mean[0], test_std[0]
 	
 	print 'Train Accuracy: {0}; Train STDEV: {1}'.format(train_mean, train_std)
 	print 'Test Accuracy: {0}; Test STDEV: {1}'.format(test_mean, test_std)
@@ -18,12 +18,15 @@ __docformat__ = 'epytext'
 
 # Native imports
 import os
+from multiprocessing import Pool
 
 # Third party imports
 import numpy as np
 
 # Program imports
-from lfw_gender.plot import plot_epoch
+from lfw_gender.plot       import plot_epoch
+from lfw_gender.hw_results import read_labels, accuracy, result_accuracy, \
+	aggregate
 
 def get_labels(path):
 	"""
@@ -34,11 +37,7 @@ def get_labels(path):
 	@return: A numpy array containing the labels.
 	"""
 	
-	labels = []
-	with open(path, 'rb') as f:
-		for line in f:
-			labels.append(int(line[0]))
-	return np.array(labels)
+	return read_labels(path)
 
 def classify(predicted, actual):
 	"""
@@ -51,7 +50,7 @@ def classify(predicted, actual):
 	@return: The percent correct.
 	"""
 	
-	return np.average(predicted == actual) * 100
+	return accuracy(np.asarray(predicted), actual)
 
 def get_case(path, actual):
 	"""
@@ -64,11 +63,7 @@ def get_case(path, actual):
 	@return: A set of accuracies corresponding to multiple epochs.
 	"""
 	
-	accuracies = []
-	with open(path, 'rb') as f:
-		for line in f:
-			accuracies.append(classify([int(x) for x in line.split()], actual))
-	return accuracies
+	return result_accuracy(path, actual)
 
 def main(train_dir, test_dir, train_path, test_path, out_path):
 	"""
@@ -90,25 +85,15 @@ def main(train_dir, test_dir, train_path, test_path, out_path):
 	train_labels = get_labels(train_path)
 	test_labels  = get_labels(test_path)
 	
-	# Get all of the training data
-	train = []
-	for path in os.listdir(train_dir):
-		train.append(get_case(os.path.join(train_dir, path), train_labels))
-	train_results = np.array(train)
-	
-	# Get all of the testing data
-	test = []
-	for path in os.listdir(test_dir):
-		test.append(get_case(os.path.join(test_dir, path), test_labels))
-	test_results = np.array(test)
-	
-	# Compute the mean costs
-	train_mean = np.mean(train_results, 0)
-	test_mean  = np.mean(test_results, 0)
-	
-	# Compute the standard deviations
-	train_std = np.std(train_results, 0)
-	test_std  = np.std(test_results, 0)
+	# Compute the mean and standard deviation of each epoch over all files
+	pool = Pool()
+	try:
+		train_mean, train_std, _ = aggregate(train_dir, train_labels,
+			pool=pool)
+		test_mean, test_std, _   = aggregate(test_dir, test_labels, pool=pool)
+	finally:
+		pool.terminate()
+		pool.join()
 	
 	# Plot the results
 	plot_epoch(y_series=(train_mean, test_mean), y_bounds=(-5, 105),
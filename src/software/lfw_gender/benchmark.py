@@ -0,0 +1,614 @@
+# benchmark.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Throughput benchmarks for the hot paths.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Throughput benchmarks for the hot paths.
+
+Every benchmark reports the number of samples processed per second, where a
+sample is an image (or a single operation for the Q arithmetic). The results
+of each run are appended to a JSON history and may be compared against a
+baseline run to catch regressions.
+
+The scaling mode instead sweeps the configuration of the classifier (image
+size, clusters, dataset size, floating point type and classification path),
+reporting the throughput, time per epoch and peak memory of each.
+
+Usage:
+	python benchmark.py [history_path [baseline_path]]
+	python benchmark.py scaling [out_dir]
+
+G{packagetree lfw_gender}
+"""
+
+__docformat__ = 'epytext'
+
+# Native imports
+import os, sys, json, time, shutil, random, cPickle, tempfile, platform
+from itertools       import product
+from multiprocessing import Pool
+
+# Third party imports
+import numpy as np
+
+# Program imports
+from lfw_gender.net        import SimpleCompetitiveLearning, \
+	CompetitiveLearning, CompetitiveLearningClassifier
+from lfw_gender.q_format   import Q, imgs_to_fp
+from lfw_gender.split_data import get_count, build_dataset
+from lfw_gender.timers     import clock, pretty_time
+from lfw_gender.memory     import PeakMemory
+
+###############################################################################
+########## Globals
+###############################################################################
+
+# The image sizes (width and height) to benchmark
+SIZES = (10, 30)
+
+# The cluster counts to benchmark
+NCLUSTERS = (2, 8, 32)
+
+###############################################################################
+########## Measurement
+###############################################################################
+
+def measure(func, nsamples, repeat=3, min_time=0.1):
+	"""
+	Measure the throughput of a function. The function is called in a loop
+	that is long enough to last for at least "min_time" seconds, and the
+	fastest of the repeated loops is used.
+	
+	@param func: The function to measure. It is called without arguments.
+	
+	@param nsamples: The number of samples processed by a single call.
+	
+	@param repeat: The number of loops to time.
+	
+	@param min_time: The minimum duration of a loop, in seconds.
+	
+	@return: The number of samples per second.
+	"""
+	
+	# Determine the number of calls per loop
+	nloops = 1
+	while True:
+		start = clock()
+		for _ in xrange(nloops):
+			func()
+		best = clock() - start
+		if best >= min_time:
+			break
+		nloops *= 2
+	
+	# Time the remaining loops
+	for _ in xrange(repeat - 1):
+		start = clock()
+		for _ in xrange(nloops):
+			func()
+		best = min(best, clock() - start)
+	
+	return nsamples * nloops / best
+
+def _images(nsamples, size, seed=0):
+	"""
+	Create random grayscale images.
+	
+	@param nsamples: The number of images.
+	
+	@param size: The width and height of the images.
+	
+	@param seed: The seed for the random number generator.
+	
+	@return: A 2D numpy array with one flattened image, scaled to [0, 1], per
+	row.
+	"""
+	
+	return np.random.RandomState(seed).randint(0, 256, (nsamples,
+		size * size)) / 255.
+
+def _stepper(net, x):
+	"""
+	Create a function that steps a network through all of the images.
+	
+	@param net: The network.
+	
+	@param x: The images.
+	
+	@return: The function.
+	"""
+	
+	def run():
+		step = net.step
+		for xi in x:
+			step(xi)
+	
+	return run
+
+###############################################################################
+########## Benchmarks
+###############################################################################
+
+def bench_simple_step(nsamples):
+	"""
+	Training steps of a SimpleCompetitiveLearning network.
+	
+	@param nsamples: The number of images per call.
+	
+	@return: A generator of (name, function, nsamples) tuples.
+	"""
+	
+	for size in SIZES:
+		net = SimpleCompetitiveLearning(size * size)
+		net.enable_learning()
+		yield ('simple_step/size={0}'.format(size), _stepper(net,
+			_images(nsamples, size)), nsamples)
+
+def bench_cl_step(nsamples):
+	"""
+	Training steps of a CompetitiveLearning network.
+	
+	@param nsamples: The number of images per call.
+	
+	@return: A generator of (name, function, nsamples) tuples.
+	"""
+	
+	for size in SIZES:
+		for nclusters in NCLUSTERS:
+			net = CompetitiveLearning(size * size, nclusters)
+			net.enable_learning()
+			yield ('cl_step/size={0}/nclusters={1}'.format(size, nclusters),
+				_stepper(net, _images(nsamples, size)), nsamples)
+
+def bench_classify(nsamples):
+	"""
+	Classification with the per sample and the batch paths.
+	
+	@param nsamples: The number of images per call.
+	
+	@return: A generator of (name, function, nsamples) tuples.
+	"""
+	
+	for size in SIZES:
+		for nclusters in NCLUSTERS:
+			x   = _images(nsamples, size)
+			y   = np.arange(nsamples) % 2
+			net = CompetitiveLearningClassifier(size * size, nclusters, (0, 1))
+			net.train(x, y)
+			suffix = 'size={0}/nclusters={1}'.format(size, nclusters)
+			yield ('classify/' + suffix, lambda net=net, x=x, y=y:
+				net.classify(x, y), nsamples)
+			yield ('predict/' + suffix, lambda net=net, x=x: net.predict(x),
+				nsamples)
+
+def bench_q(nsamples):
+	"""
+	Fixed point addition and multiplication.
+	
+	@param nsamples: The number of operations per call.
+	
+	@return: A generator of (name, function, nsamples) tuples.
+	"""
+	
+	rng = np.random.RandomState(0)
+	q0  = [Q(1, 11, v) for v in rng.uniform(-0.9, 0.9, nsamples)]
+	q1  = [Q(1, 11, v) for v in rng.uniform(-0.9, 0.9, nsamples)]
+	
+	def add():
+		for a, b in zip(q0, q1):
+			a + b
+	
+	def mult():
+		for a, b in zip(q0, q1):
+			a * b
+	
+	yield 'q_add', add, nsamples
+	yield 'q_mult', mult, nsamples
+
+def bench_imgs_to_fp(nsamples):
+	"""
+	Conversion of images to fixed point.
+	
+	@param nsamples: The number of images per call.
+	
+	@return: A generator of (name, function, nsamples) tuples.
+	"""
+	
+	x = _images(nsamples, 10)
+	yield 'imgs_to_fp/size=10', lambda: imgs_to_fp(x, 1, 11), nsamples
+
+def bench_reshape(nsamples):
+	"""
+	Resizing of the 30x30 images. This requires SciPy (with PIL); if it is not
+	available, the benchmark is skipped.
+	
+	@param nsamples: The number of images per call.
+	
+	@return: A generator of (name, function, nsamples) tuples.
+	"""
+	
+	try:
+		from lfw_gender.preprocess import reshape
+	except ImportError:
+		return
+	
+	x = (_images(nsamples, 30) * 255).astype('uint8')
+	yield 'reshape/size=10', lambda: reshape(x, (10, 10)), nsamples
+
+def bench_split_data(nsamples):
+	"""
+	Building of the datasets from a directory of preprocessed images. Each
+	person has a single image.
+	
+	@param nsamples: The number of images per gender.
+	
+	@return: A generator of (name, function, nsamples) tuples.
+	"""
+	
+	# Create the preprocessed images
+	base_path = tempfile.mkdtemp()
+	x         = (_images(nsamples, 30) * 255).astype('uint8')
+	for gender in ('male', 'female'):
+		os.makedirs(os.path.join(base_path, gender))
+		for i, img in enumerate(x):
+			with open(os.path.join(base_path, gender, 'person{0}_0.pkl'.format(
+				i)), 'wb') as f:
+				cPickle.dump(img, f, cPickle.HIGHEST_PROTOCOL)
+	
+	def build():
+		male_names, female_names = get_count(base_path)
+		build_dataset(base_path, male_names, 'male', nsamples / 2, nsamples / 2)
+		build_dataset(base_path, female_names, 'female', nsamples / 2,
+			nsamples / 2)
+	
+	try:
+		yield 'split_data', build, 2 * nsamples
+	finally:
+		shutil.rmtree(base_path)
+
+# All of the benchmarks, in the order they are run
+BENCHMARKS = (bench_simple_step, bench_cl_step, bench_classify, bench_q,
+	bench_imgs_to_fp, bench_reshape, bench_split_data)
+
+###############################################################################
+########## History
+###############################################################################
+
+def run(nsamples=200, repeat=3, min_time=0.1, benchmarks=BENCHMARKS,
+	verbose=True):
+	"""
+	Run the benchmarks.
+	
+	@param nsamples: The number of samples per call of each benchmark.
+	
+	@param repeat: The number of loops to time per benchmark.
+	
+	@param min_time: The minimum duration of a loop, in seconds.
+	
+	@param benchmarks: The benchmarks to run.
+	
+	@param verbose: If True, each result is printed as it completes.
+	
+	@return: A dictionary describing the run. The results are stored in the
+	"results" key, mapping each benchmark name to its samples per second.
+	"""
+	
+	random.seed(0)
+	results = {}
+	start   = clock()
+	for benchmark in benchmarks:
+		for name, func, n in benchmark(nsamples):
+			results[name] = measure(func, n, repeat, min_time)
+			if verbose:
+				print '{0:<40} {1:>14,.1f} samples/sec'.format(name,
+					results[name])
+	if verbose:
+		print '\nTotal Time : {0}'.format(pretty_time(clock() - start))
+	
+	return {
+		'timestamp' : time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'python'    : platform.python_version(),
+		'numpy'     : np.__version__,
+		'machine'   : platform.node(),
+		'nsamples'  : nsamples,
+		'results'   : results
+	}
+
+def load_history(path):
+	"""
+	Load a history of runs.
+	
+	@param path: The full path to the history.
+	
+	@return: A list of runs, oldest first. If the history doesn't exist, the
+	list is empty.
+	"""
+	
+	if not os.path.exists(path):
+		return []
+	with open(path, 'rb') as f:
+		return json.load(f)
+
+def save_history(path, record):
+	"""
+	Append a run to a history.
+	
+	@param path: The full path to the history.
+	
+	@param record: The run, as returned by L{run}.
+	"""
+	
+	history = load_history(path)
+	history.append(record)
+	with open(path, 'wb') as f:
+		json.dump(history, f, indent=1, sort_keys=True)
+
+def load_baseline(path):
+	"""
+	Load a baseline run. The baseline may be a single run or a history, in
+	which case the latest run is used.
+	
+	@param path: The full path to the baseline.
+	
+	@return: The run.
+	"""
+	
+	with open(path, 'rb') as f:
+		baseline = json.load(f)
+	
+	return baseline[-1] if isinstance(baseline, list) else baseline
+
+def compare(record, baseline, tolerance=0.1):
+	"""
+	Compare a run against a baseline run.
+	
+	@param record: The run, as returned by L{run}.
+	
+	@param baseline: The baseline run.
+	
+	@param tolerance: The fraction that the throughput may drop by before it
+	is considered a regression.
+	
+	@return: A list of (name, baseline, current, ratio) tuples, one for each
+	regression, where the ratio is the current throughput divided by the
+	baseline throughput.
+	"""
+	
+	regressions = []
+	for name, current in sorted(record['results'].iteritems()):
+		expected = baseline['results'].get(name)
+		if expected is None:
+			continue
+		ratio = current / expected
+		if ratio < 1 - tolerance:
+			regressions.append((name, expected, current, ratio))
+	
+	return regressions
+
+def main(history_path=None, baseline_path=None, tolerance=0.1, nsamples=200):
+	"""
+	Run the benchmarks, record them, and check them for regressions.
+	
+	@param history_path: If provided, the run is appended to this history.
+	
+	@param baseline_path: If provided, the run is compared against this
+	baseline.
+	
+	@param tolerance: The fraction that the throughput may drop by before it
+	is considered a regression.
+	
+	@param nsamples: The number of samples per call of each benchmark.
+	
+	@return: A list of the regressions, as returned by L{compare}.
+	"""
+	
+	record = run(nsamples)
+	if history_path is not None:
+		save_history(history_path, record)
+	
+	regressions = []
+	if baseline_path is not None:
+		regressions = compare(record, load_baseline(baseline_path), tolerance)
+		if regressions:
+			print '\nRegressions (more than {0:.0%} slower):'.format(tolerance)
+			for name, expected, current, ratio in regressions:
+				print '  {0:<38} {1:>12,.1f} -> {2:>12,.1f} ({3:.0%})'.format(
+					name, expected, current, ratio)
+		else:
+			print '\nNo regressions'
+	
+	return regressions
+
+###############################################################################
+########## Scaling
+###############################################################################
+
+def _scaling_point(size, nclusters, nsamples, dtype, backend):
+	"""
+	Measure a single configuration of the scaling sweep. This is meant to be
+	run in its own process, such that the measurements don't interfere. The
+	peak memory covers the data, the network and its execution.
+	
+	@param size: The width and height of the images.
+	
+	@param nclusters: The number of clusters per category.
+	
+	@param nsamples: The number of images in the dataset.
+	
+	@param dtype: The floating point type of the weights and data.
+	
+	@param backend: The classification path; "loop" for the per sample
+	classify, "batch" for the exhaustive predict, or "index" for the predict
+	using a cluster index.
+	
+	@return: A dictionary containing the configuration and its measurements.
+	"""
+	
+	with PeakMemory() as peak:
+		x   = _images(nsamples, size).astype(dtype)
+		y   = np.arange(nsamples) % 2
+		net = CompetitiveLearningClassifier(size * size, nclusters, (0, 1),
+			dtype=dtype)
+		
+		# Train for a single epoch
+		start = clock()
+		net.train(x, y)
+		train_time = clock() - start
+		
+		# Classify the whole dataset
+		start = clock()
+		if backend == 'loop':
+			net.classify(x, y)
+		elif backend == 'batch':
+			net.predict(x, exact=True)
+		else:
+			net.build_index(seed=0)
+			net.predict(x)
+		infer_time = clock() - start
+	
+	return {
+		'size'            : size,
+		'nclusters'       : nclusters,
+		'nsamples'        : nsamples,
+		'dtype'           : dtype,
+		'backend'         : backend,
+		'train_per_sec'   : nsamples / train_time,
+		'infer_per_sec'   : nsamples / infer_time,
+		'epoch_time'      : train_time + infer_time,
+		'peak_memory'     : peak.peak
+	}
+
+def scaling(sizes=(10, 20, 30), nclusters=(1, 8, 32), nsamples=(200, 800),
+	dtypes=('float64', 'float32'), backends=('loop', 'batch', 'index'),
+	verbose=True):
+	"""
+	Sweep the configurations of the classifier to determine how it scales.
+	Every configuration is measured in a fresh process, one at a time.
+	
+	@param sizes: The image sizes (width and height) to sweep.
+	
+	@param nclusters: The cluster counts to sweep.
+	
+	@param nsamples: The dataset sizes to sweep.
+	
+	@param dtypes: The floating point types to sweep.
+	
+	@param backends: The classification paths to sweep. Refer to
+	L{_scaling_point} for the options.
+	
+	@param verbose: If True, a table row is printed as each configuration
+	completes.
+	
+	@return: A list containing a dictionary per configuration. Refer to
+	L{_scaling_point} for the contents.
+	"""
+	
+	# Each worker only lives for a single configuration
+	pool    = Pool(1, maxtasksperchild=1)
+	results = []
+	if verbose:
+		print '{0:>4} {1:>9} {2:>8} {3:>7} {4:>7} {5:>12} {6:>12} {7:>14} ' \
+			'{8:>9}'.format('size', 'nclusters', 'nsamples', 'dtype',
+			'backend', 'train/sec', 'infer/sec', 'epoch', 'peak MB')
+	try:
+		for config in product(sizes, nclusters, nsamples, dtypes, backends):
+			result = pool.apply(_scaling_point, config)
+			results.append(result)
+			if verbose:
+				print '{size:>4} {nclusters:>9} {nsamples:>8} {dtype:>7} ' \
+					'{backend:>7} {train_per_sec:>12,.1f} ' \
+					'{infer_per_sec:>12,.1f} {0:>14} {1:>9}'.format(
+					pretty_time(result['epoch_time']), '-' if
+					result['peak_memory'] is None else '{0:.1f}'.format(
+					result['peak_memory'] / 2. ** 20), **result)
+	finally:
+		pool.close()
+		pool.join()
+	
+	return results
+
+def plot_scaling(results, metric='infer_per_sec', out_dir=None, show=True):
+	"""
+	Plot a surface of a metric over the image size and the number of clusters,
+	for every combination of the other parameters.
+	
+	@param results: The results, as returned by L{scaling}.
+	
+	@param metric: The name of the metric to plot.
+	
+	@param out_dir: If provided, the plots are saved in this directory.
+	
+	@param show: If True the plots will be displayed upon creation.
+	"""
+	
+	# Only needed for plotting
+	from lfw_gender.plot import plot_surface
+	
+	labels = {
+		'train_per_sec' : 'Training [samples/sec]',
+		'infer_per_sec' : 'Classification [samples/sec]',
+		'epoch_time'    : 'Epoch Time [sec]',
+		'peak_memory'   : 'Peak Memory [bytes]'
+	}
+	
+	# Group the results by everything but the axes
+	groups = {}
+	for result in results:
+		key = (result['nsamples'], result['dtype'], result['backend'])
+		groups.setdefault(key, []).append(result)
+	
+	for (nsamples, dtype, backend), group in sorted(groups.iteritems()):
+		sizes     = sorted(set(r['size'] for r in group))
+		nclusters = sorted(set(r['nclusters'] for r in group))
+		if len(sizes) < 2 or len(nclusters) < 2:
+			continue
+		
+		# Build the grid
+		z = np.zeros((len(nclusters), len(sizes)))
+		for r in group:
+			z[nclusters.index(r['nclusters'])][sizes.index(r['size'])] = \
+				r[metric] if r[metric] is not None else np.nan
+		x, y = np.meshgrid(sizes, nclusters)
+		
+		name     = '{0}_{1}_{2}_{3}'.format(metric, nsamples, dtype, backend)
+		out_path = None if out_dir is None else os.path.join(out_dir,
+			name + '.png')
+		plot_surface(x, y, z, x_label='Image Size', y_label='Clusters',
+			z_label=labels.get(metric, metric), title='{0} Samples, {1}, '
+			'{2}'.format(nsamples, dtype, backend), out_path=out_path,
+			show=show)
+
+def scaling_main(out_dir=None):
+	"""
+	Run the scaling sweep and plot every metric.
+	
+	@param out_dir: If provided, the results are saved to "scaling.json" and
+	the plots are saved in this directory.
+	
+	@return: The results, as returned by L{scaling}.
+	"""
+	
+	results = scaling()
+	if out_dir is not None:
+		with open(os.path.join(out_dir, 'scaling.json'), 'wb') as f:
+			json.dump(results, f, indent=1, sort_keys=True)
+	for metric in ('train_per_sec', 'infer_per_sec', 'epoch_time',
+		'peak_memory'):
+		plot_scaling(results, metric, out_dir, out_dir is None)
+	
+	return results
+
+if __name__ == '__main__':
+	if sys.argv[1:2] == ['scaling']:
+		scaling_main(*sys.argv[2:3])
+	else:
+		# Exit with an error if any benchmark regressed
+		sys.exit(1 if main(*sys.argv[1:3]) else 0)
\ No newline at end of file
@@ -0,0 +1,196 @@
+# cluster_index.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Approximate nearest cluster search over frozen weights.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Approximate nearest cluster search over frozen weights.
+
+The prototypes (one row per cluster) are partitioned into cells using a
+coarse k-means quantizer. A query is only compared against the prototypes in
+the "nprobe" cells whose centroids are closest to it. Increasing "nprobe"
+increases the recall at the cost of speed; probing every cell is identical to
+an exhaustive search.
+
+G{packagetree lfw_gender}
+"""
+
+__docformat__ = 'epytext'
+
+# Third party imports
+import numpy as np
+
+###############################################################################
+########## Functions
+###############################################################################
+
+def squared_distances(x, weights):
+	"""
+	Compute the squared euclidean distance between every sample and every
+	prototype.
+	
+	@param x: A 2D numpy array, where each row is a sample.
+	
+	@param weights: A 2D numpy array, where each row is a prototype.
+	
+	@return: A numpy array of shape (len(x), len(weights)).
+	"""
+	
+	d  = np.dot(x, weights.T)
+	d *= -2
+	d += np.einsum('ij,ij->i', x, x)[:, np.newaxis]
+	d += np.einsum('ij,ij->i', weights, weights)
+	
+	# Round-off may push distances of (near) identical vectors below zero
+	return np.maximum(d, 0, out=d)
+
+def nearest(x, weights, multipliers=None):
+	"""
+	Exhaustively find the nearest prototype for every sample.
+	
+	@param x: A 2D numpy array, where each row is a sample.
+	
+	@param weights: A 2D numpy array, where each row is a prototype.
+	
+	@param multipliers: The per prototype multiplier (e.g. the boost) to apply
+	to the distances. If None, the raw distances are used.
+	
+	@return: A tuple containing the index of the nearest prototype and its
+	distance, for each sample.
+	"""
+	
+	d = squared_distances(x, weights)
+	if multipliers is not None:
+		d *= multipliers
+	ix = np.argmin(d, 1)
+	
+	return ix, d[np.arange(len(d)), ix]
+
+def kmeans(x, k, niters=10, seed=None):
+	"""
+	Cluster the provided vectors using Lloyd's algorithm.
+	
+	@param x: A 2D numpy array, where each row is a vector.
+	
+	@param k: The number of clusters.
+	
+	@param niters: The number of iterations to perform.
+	
+	@param seed: The seed for the random initialization.
+	
+	@return: A tuple containing the centroids and the cluster of each vector.
+	"""
+	
+	# Initialize the centroids to randomly selected vectors
+	rng       = np.random.RandomState(seed)
+	centroids = x[rng.choice(len(x), k, replace=False)].astype('float64')
+	
+	for _ in xrange(niters):
+		assignments = np.argmin(squared_distances(x, centroids), 1)
+		
+		# Recompute the means, keeping the old centroid for empty clusters
+		counts = np.bincount(assignments, minlength=k)
+		sums   = np.zeros(centroids.shape)
+		np.add.at(sums, assignments, x)
+		full   = counts > 0
+		centroids[full] = sums[full] / counts[full][:, np.newaxis]
+	
+	return centroids, np.argmin(squared_distances(x, centroids), 1)
+
+###############################################################################
+########## Class Implementations
+###############################################################################
+
+class ClusterIndex(object):
+	"""
+	Inverted file index over a set of frozen prototypes.
+	"""
+	
+	def __init__(self, weights, ncells=None, nprobe=1, niters=10, seed=None):
+		"""
+		Build the index.
+		
+		@param weights: A 2D numpy array, where each row is a prototype. A copy
+		of the weights is retained, thus the index must be rebuilt if the
+		weights change.
+		
+		@param ncells: The number of cells to partition the prototypes into.
+		If None, the square root of the number of prototypes is used.
+		
+		@param nprobe: The default number of cells to search for each query.
+		
+		@param niters: The number of k-means iterations used to build the
+		cells.
+		
+		@param seed: The seed for the k-means initialization.
+		"""
+		
+		# Store the params
+		self.weights = np.array(weights, dtype='float64')
+		self.ncells  = min(len(self.weights), ncells if ncells is not None
+			else max(int(len(self.weights) ** 0.5), 1))
+		self.nprobe  = nprobe
+		
+		# Build the cells
+		self.centroids, assignments = kmeans(self.weights, self.ncells, niters,
+			seed)
+		self.cells = [np.flatnonzero(assignments == i) for i in
+			xrange(self.ncells)]
+	
+	def search(self, x, multipliers=None, nprobe=None):
+		"""
+		Find the (approximately) nearest prototype for every sample. Cells are
+		selected using the raw distances; the multipliers are only applied to
+		the prototypes within the probed cells.
+		
+		@param x: A 2D numpy array, where each row is a sample.
+		
+		@param multipliers: The per prototype multiplier (e.g. the boost) to
+		apply to the distances. If None, the raw distances are used.
+		
+		@param nprobe: The number of cells to search. If None, the default is
+		used. If at least the number of cells, an exhaustive search is done.
+		
+		@return: A tuple containing the index of the nearest prototype and its
+		distance, for each sample.
+		"""
+		
+		x      = np.atleast_2d(np.asarray(x, dtype='float64'))
+		nprobe = self.nprobe if nprobe is None else nprobe
+		
+		# Fall back to the exact search
+		if nprobe >= self.ncells:
+			return nearest(x, self.weights, multipliers)
+		
+		# Determine which cells to probe for each sample
+		cd     = squared_distances(x, self.centroids)
+		probes = np.argpartition(cd, nprobe - 1, 1)[:, :nprobe]
+		
+		# Search the probed cells, one cell at a time
+		best_ix   = np.zeros(len(x), dtype='int64')
+		best_dist = np.empty(len(x)); best_dist.fill(np.inf)
+		for i, members in enumerate(self.cells):
+			q = np.flatnonzero(np.any(probes == i, 1))
+			if len(q) == 0 or len(members) == 0:
+				continue
+			d = squared_distances(x[q], self.weights[members])
+			if multipliers is not None:
+				d *= multipliers[members]
+			j    = np.argmin(d, 1)
+			dist = d[np.arange(len(q)), j]
+			
+			# Keep the closest, using the lowest index on ties
+			ix     = members[j]
+			better = (dist < best_dist[q]) | ((dist == best_dist[q]) &
+				(ix < best_ix[q]))
+			best_ix[q[better]]   = ix[better]
+			best_dist[q[better]] = dist[better]
+		
+		return best_ix, best_dist
\ No newline at end of file
@@ -0,0 +1,257 @@
+# coalescer.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Micro-batching of concurrent prediction requests.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Micro-batching of concurrent prediction requests.
+
+Requests submitted from any number of threads are grouped into batches. A
+batch is closed once it holds "max_batch_size" images or once its first
+request has waited "max_wait" seconds, whichever occurs first. A request that
+doesn't fit in the current batch is held for the next one; only a request
+that is larger than "max_batch_size" on its own makes a larger batch. Each
+batch is classified with a single call to the batch prediction function (e.g.
+L{CompetitiveLearningClassifier.predict<lfw_gender.net.
+CompetitiveLearningClassifier.predict>}) and the result is split back out to
+the future of each request. Under load, the batches fill up immediately; when
+idle, a request waits at most "max_wait" seconds.
+
+G{packagetree lfw_gender}
+"""
+
+__docformat__ = 'epytext'
+
+# Native imports
+import threading, Queue
+
+# Third party imports
+import numpy as np
+
+# Program imports
+from lfw_gender.timers import clock
+
+###############################################################################
+########## Class Implementations
+###############################################################################
+
+class Future(object):
+	"""
+	The result of a request that may not have completed yet.
+	"""
+	
+	def __init__(self):
+		"""
+		Initialize this class.
+		"""
+		
+		self._result    = None
+		self._exception = None
+		self._done      = threading.Event()
+	
+	def set_result(self, result):
+		"""
+		Complete the request successfully.
+		
+		@param result: The result of the request.
+		"""
+		
+		self._result = result
+		self._done.set()
+	
+	def set_exception(self, exception):
+		"""
+		Complete the request with a failure.
+		
+		@param exception: The exception to raise to the caller.
+		"""
+		
+		self._exception = exception
+		self._done.set()
+	
+	def done(self):
+		"""
+		Determine if the request has completed.
+		
+		@return: True if the request has completed, else False.
+		"""
+		
+		return self._done.is_set()
+	
+	def result(self, timeout=None):
+		"""
+		Wait for the request to complete.
+		
+		@param timeout: The maximum number of seconds to wait. If None, wait
+		indefinitely.
+		
+		@return: The result of the request.
+		
+		@raise RuntimeError: Raised if the request did not complete in time.
+		"""
+		
+		# Wait in intervals, such that the thread remains interruptible
+		end = None if timeout is None else clock() + timeout
+		while not self._done.wait(1 if end is None else max(min(1,
+			end - clock()), 0)):
+			if end is not None and clock() >= end:
+				raise RuntimeError('The request did not complete in time')
+		if self._exception is not None:
+			raise self._exception
+		
+		return self._result
+
+class RequestCoalescer(object):
+	"""
+	Groups concurrent requests into batches for a batch prediction function.
+	"""
+	
+	def __init__(self, predict, max_batch_size=64, max_wait=0.002,
+		nthreads=1):
+		"""
+		Initialize this class and start the batching threads.
+		
+		@param predict: The batch prediction function. It must accept a 2D
+		numpy array, containing one image per row, and return a sequence
+		containing one result per row.
+		
+		@param max_batch_size: The maximum number of images in a batch.
+		
+		@param max_wait: The maximum number of seconds the first request in a
+		batch waits for more requests to arrive.
+		
+		@param nthreads: The number of batches that may be predicted
+		concurrently.
+		"""
+		
+		# Store the params
+		self.predict        = predict
+		self.max_batch_size = max_batch_size
+		self.max_wait       = max_wait
+		
+		# Start the batching threads
+		#   - The lock keeps requests from being queued while closing.
+		self.requests = Queue.Queue()
+		self.running  = True
+		self.lock     = threading.Lock()
+		self.threads  = [threading.Thread(target=self._run) for _ in
+			xrange(nthreads)]
+		for thread in self.threads:
+			thread.daemon = True
+			thread.start()
+	
+	def _next_batch(self, held=None):
+		"""
+		Collect the next batch of requests.
+		
+		@param held: A request that didn't fit in the previous batch. If
+		provided, it starts this batch.
+		
+		@return: A tuple containing a list of (images, future) tuples and the
+		request that didn't fit in this batch (or None). The list is empty if
+		no request arrived.
+		"""
+		
+		# Wait for the first request
+		if held is not None:
+			batch = [held]
+		else:
+			try:
+				batch = [self.requests.get(timeout=0.1)]
+			except Queue.Empty:
+				return [], None
+		
+		# Add more requests until the batch is full or the time is up
+		size     = len(batch[0][0])
+		deadline = clock() + self.max_wait
+		while size < self.max_batch_size:
+			remaining = deadline - clock()
+			try:
+				if remaining > 0:
+					request = self.requests.get(timeout=remaining)
+				else:
+					request = self.requests.get_nowait()
+			except Queue.Empty:
+				break
+			if size + len(request[0]) > self.max_batch_size:
+				return batch, request
+			batch.append(request)
+			size += len(request[0])
+		
+		return batch, None
+	
+	def _run(self):
+		"""
+		Predict the batches until stopped.
+		"""
+		
+		held = None
+		while self.running:
+			batch, held = self._next_batch(held)
+			if not batch:
+				continue
+			
+			# Predict the entire batch at once
+			try:
+				y = self.predict(np.vstack([x for x, _ in batch]))
+			except Exception, e:
+				for _, future in batch:
+					future.set_exception(e)
+				continue
+			
+			# Split the results back out to each request
+			i = 0
+			for x, future in batch:
+				future.set_result(y[i:i + len(x)])
+				i += len(x)
+		
+		# Fail the request that was held for the next batch
+		if held is not None:
+			held[1].set_exception(RuntimeError('The coalescer was closed'))
+	
+	def submit(self, x):
+		"""
+		Queue images for prediction.
+		
+		@param x: The images to predict, one per row. A single image may also
+		be provided.
+		
+		@return: A L{Future} for the results of the images.
+		
+		@raise RuntimeError: Raised if the coalescer was closed.
+		"""
+		
+		future = Future()
+		with self.lock:
+			if not self.running:
+				raise RuntimeError('The coalescer was closed')
+			self.requests.put((np.atleast_2d(np.asarray(x, dtype='float64')),
+				future))
+		
+		return future
+	
+	def close(self):
+		"""
+		Stop the batching threads. The batches being predicted are completed,
+		while the requests that are still queued fail with a RuntimeError.
+		"""
+		
+		with self.lock:
+			self.running = False
+		for thread in self.threads:
+			thread.join()
+		
+		# Fail the remaining requests, such that no caller waits forever
+		while True:
+			try:
+				_, future = self.requests.get_nowait()
+			except Queue.Empty:
+				break
+			future.set_exception(RuntimeError('The coalescer was closed'))
\ No newline at end of file
@@ -48,7 +48,8 @@ def reshape(data, shape):
 def main(train_x, train_y, test_x, test_y, categories, nepochs=1, plot=True,
 	verbose=True, nclusters=1, learning_rate=0.001, boost_inc=0.1, 
 	boost_dec=0.01, duty_cycle=50, min_duty_cycle=5, min_weight=-1,
-	max_weight=1, nrows=1, ncols=1, shape=(10, 10)):
+	max_weight=1, nrows=1, ncols=1, shape=(10, 10), model_path=None,
+	sink=None):
 	"""
 	Demonstrates the CompetitiveLearningClassifier on LFW.
 	
@@ -105,6 +106,12 @@ def main(train_x, train_y, test_x, test_y, categories, nepochs=1, plot=True,
 	shape of (100, ). This vector would then need to be resized to your desired
 	shape of (10, 10).
 	
+	@param model_path: If provided, the trained network will be saved to this
+	directory. Refer to L{CompetitiveLearningClassifier.save} for more details.
+	
+	@param sink: If provided, a record of metrics will be written to this
+	L{BaseMetricsSink<lfw_gender.metrics.BaseMetricsSink>} after every epoch.
+	
 	@return: A tuple containing the training results, testing results, and
 	weights, respectively.
 	"""
@@ -125,7 +132,11 @@ def main(train_x, train_y, test_x, test_y, categories, nepochs=1, plot=True,
 	
 	# Run the network
 	train_results, test_results = net.run(train_x, train_y, test_x, test_y,
-		nepochs, verbose)
+		nepochs, verbose, sink=sink)
+	
+	# Save the network
+	if model_path is not None:
+		net.save(model_path)
 	
 	# Reshape the weights
 	weights = {}
@@ -0,0 +1,226 @@
+# format_search.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Search for the best fixed point format.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Search for the best fixed point format.
+
+Every combination of the number of integer bits (m), the number of fractional
+bits (n), the rounding mode and the image size is simulated with the
+L{FixedPointClassifier<lfw_gender.hw_sim.FixedPointClassifier>}, recording its
+accuracy and the fractions of the arithmetic operations that saturated or
+flushed a nonzero result to zero. The cost of the datapath is estimated with
+the L{PerformanceModel<lfw_gender.hw_perf.PerformanceModel>}. The formats that
+aren't beaten in both accuracy and cost by another format form the Pareto
+front.
+
+G{packagetree lfw_gender}
+"""
+
+__docformat__ = 'epytext'
+
+# Native imports
+import os, random, cPickle
+
+# Third party imports
+import numpy as np
+
+# Program imports
+from lfw_gender.q_format   import fp_encode, new_counters
+from lfw_gender.preprocess import reshape
+from lfw_gender.util       import get_data
+from lfw_gender.hw_sim     import FixedPointClassifier
+from lfw_gender.hw_perf    import PerformanceModel
+
+###############################################################################
+########## Search
+###############################################################################
+
+def evaluate(data, m, n, nepochs=10, niters=3, learning_rate=0.001, seed=None,
+	rounding='truncate', **kargs):
+	"""
+	Evaluate a single format.
+	
+	@param data: The data, as returned by L{get_data<lfw_gender.util.
+	get_data>}, with the images scaled to [0, 1].
+	
+	@param m: The number of integer bits for fixed point.
+	
+	@param n: The number of fractional bits for fixed point.
+	
+	@param nepochs: The number of training epochs to perform.
+	
+	@param niters: The number of iterations to run for statistical purposes.
+	
+	@param learning_rate: The learning rate to use.
+	
+	@param seed: If provided, the random initial weights of the i-th
+	iteration are drawn with the seed, seed + i. The same seed is used for
+	stochastic rounding.
+	
+	@param rounding: The rounding mode (see L{fp_round<lfw_gender.q_format.
+	fp_round>}).
+	
+	@param kargs: Any keyword arguments for the L{PerformanceModel<
+	lfw_gender.hw_perf.PerformanceModel>}.
+	
+	@return: A dictionary containing the format, the rounding mode, the mean
+	and standard deviation of the final accuracies, the fractions of the
+	operations that saturated and flushed to zero, and the estimated
+	performance of the HW.
+	"""
+	
+	(train_x, train_y), (test_x, test_y) = data
+	rng      = np.random.RandomState(seed)
+	train_fp = fp_encode(train_x, m, n, None, rounding, rng)
+	test_fp  = fp_encode(test_x, m, n, None, rounding, rng)
+	imsize   = int(round(train_x.shape[1] ** 0.5))
+	
+	train_results = np.zeros(niters); test_results = np.zeros(niters)
+	counts        = new_counters()
+	for i in xrange(niters):
+		if seed is not None:
+			random.seed(seed + i)
+		sim = FixedPointClassifier(train_x.shape[1], m, n, (0, 1),
+			learning_rate, rounding=rounding, seed=None if seed is None else
+			seed + i)
+		train, test = sim.run(train_fp, train_y, test_fp, test_y, nepochs)
+		train_results[i] = train[-1] * 100
+		test_results[i]  = test[-1] * 100
+		for name, count in sim.counts.iteritems():
+			counts[name] += count
+	
+	result = PerformanceModel(imsize, m, n, **kargs).estimate(len(train_y),
+		len(test_y))
+	result.update({
+		'rounding'        : rounding,
+		'train_accuracy'  : np.mean(train_results),
+		'train_std'       : np.std(train_results),
+		'test_accuracy'   : np.mean(test_results),
+		'test_std'        : np.std(test_results),
+		'saturation_rate' : counts['saturations'] / float(max(counts['ops'],
+			1)),
+		'zero_flush_rate' : counts['zero_flushes'] / float(max(counts['ops'],
+			1))
+	})
+	
+	return result
+
+def search(ms=(1, 2), ns=range(4, 16), imsizes=(5, 7, 10),
+	roundings=('truncate',), verbose=True, **kargs):
+	"""
+	Evaluate every combination of the formats, rounding modes and image sizes.
+	
+	@param ms: The numbers of integer bits.
+	
+	@param ns: The numbers of fractional bits.
+	
+	@param imsizes: The image sizes.
+	
+	@param roundings: The rounding modes.
+	
+	@param verbose: If True, the progress is printed.
+	
+	@param kargs: Any keyword arguments for L{evaluate}.
+	
+	@return: A list containing the results.
+	"""
+	
+	(train_x, train_y), (test_x, test_y) = get_data(30)
+	configs = [(imsize, m, n, r) for imsize in imsizes for m in ms for n in ns
+		for r in roundings]
+	results = []
+	for i, (imsize, m, n, r) in enumerate(configs):
+		if verbose:
+			print 'Evaluating {0}x{0}, m = {1}, n = {2}, {3} ({4} of {5})' \
+				.format(imsize, m, n, r, i + 1, len(configs))
+		
+		# The data is only resized once per image size
+		if i == 0 or imsize != configs[i - 1][0]:
+			data = ((reshape(train_x, (imsize, imsize)) / 255., train_y),
+				(reshape(test_x, (imsize, imsize)) / 255., test_y))
+		results.append(evaluate(data, m, n, rounding=r, **kargs))
+	
+	return results
+
+def pareto_front(results, accuracy='test_accuracy', cost='area'):
+	"""
+	Find the results that aren't dominated by another result, i.e. no other
+	result has a higher accuracy and a lower (or equal) cost, or the same
+	accuracy and a lower cost.
+	
+	@param results: The results, as returned by L{search}.
+	
+	@param accuracy: The name of the accuracy to maximize.
+	
+	@param cost: The name of the cost to minimize.
+	
+	@return: A list containing the results on the front, ordered by cost.
+	"""
+	
+	front = []
+	for r in sorted(results, key=lambda r: (r[cost], -r[accuracy])):
+		if not front or r[accuracy] > front[-1][accuracy]:
+			front.append(r)
+	
+	return front
+
+def format_results(results):
+	"""
+	Format results as a table.
+	
+	@param results: The results.
+	
+	@return: A string containing the table.
+	"""
+	
+	lines = ['{0:>6} {1:>3} {2:>3} {3:>15} {4:>10} {5:>10} {6:>10} {7:>10} '
+		'{8:>10}'.format('imsize', 'm', 'n', 'rounding', 'train [%]',
+		'test [%]', 'saturated', 'flushed', 'area')]
+	for r in results:
+		lines.append('{0:>6} {1:>3} {2:>3} {3:>15} {4:>10.2f} {5:>10.2f} '
+			'{6:>10.6f} {7:>10.6f} {8:>10}'.format(r['imsize'], r['m'],
+			r['n'], r['rounding'], r['train_accuracy'], r['test_accuracy'],
+			r['saturation_rate'], r['zero_flush_rate'], r['area']))
+	
+	return '\n'.join(lines)
+
+def main(out_dir, **kargs):
+	"""
+	Search the formats, printing the Pareto front and saving all results.
+	
+	@param out_dir: The directory to save the results in.
+	
+	@param kargs: Any keyword arguments for L{search}.
+	
+	@return: A tuple containing all results and the Pareto front.
+	"""
+	
+	results = search(**kargs)
+	front   = pareto_front(results)
+	print '\nPareto front:\n' + format_results(front)
+	
+	out_dir2 = os.path.join(out_dir, 'format_search')
+	try:
+		os.makedirs(out_dir2)
+	except OSError:
+		pass
+	with open(os.path.join(out_dir2, 'format_search.pkl'), 'wb') as f:
+		cPickle.dump((results, front), f, cPickle.HIGHEST_PROTOCOL)
+	
+	return results, front
+
+if __name__ == '__main__':
+	# The results path (currently set to the path in the repo)
+	out_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(
+		os.getcwd()))), 'results', 'tmp')
+	
+	main(out_dir, seed=0)
\ No newline at end of file
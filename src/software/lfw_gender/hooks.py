@@ -0,0 +1,533 @@
+# hooks.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Pluggable profiling hooks around the hot paths.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Pluggable profiling hooks around the hot paths.
+
+Modules register their hot functions and methods as named probe points (e.g.
+"net.CompetitiveLearning.step" or "q_format.Q.mult"). Attaching a hook to a
+probe swaps a wrapper in for the original callable, which notifies the hook
+when the probe is entered and exited. Detaching the last hook puts the
+original back, thus a probe without hooks costs nothing.
+
+Example:
+	>>> hook = ProfileHook()
+	>>> with profiling(hook, 'net.CompetitiveLearningClassifier.train'):
+	...	net.run(train_x, train_y, test_x, test_y, nepochs)
+	>>> hook.print_stats()
+
+G{packagetree lfw_gender}
+"""
+
+__docformat__ = 'epytext'
+
+# Native imports
+import os, sys, time, types, threading, cProfile, pstats
+from   abc         import ABCMeta, abstractmethod
+from   collections import defaultdict
+from   contextlib  import contextmanager
+from   functools   import wraps
+
+# Program imports
+from lfw_gender.memory            import PeakMemory, rss, pretty_bytes
+from lfw_gender.exception_handler import BaseException, wrap_error
+
+###############################################################################
+########## Exception Handling
+###############################################################################
+
+class UnknownProbe(BaseException):
+	"""
+	Exception if a probe does not exist.
+	"""
+	
+	def __init__(self, name):
+		"""
+		Initialize this class.
+		
+		@param name: The name of the probe.
+		"""
+		
+		self.msg = wrap_error('The probe "{0}" does not exist. The available '
+			'probes are: {1}'.format(name, ', '.join(probes())))
+
+class UnavailableHook(BaseException):
+	"""
+	Exception if a hook can't be used with this Python installation.
+	"""
+	
+	def __init__(self, hook, requirement):
+		"""
+		Initialize this class.
+		
+		@param hook: The name of the hook.
+		
+		@param requirement: A description of what is missing.
+		"""
+		
+		self.msg = wrap_error('The {0} requires {1}, which is not available '
+			'on this platform.'.format(hook, requirement))
+
+###############################################################################
+########## Probe Registry
+###############################################################################
+
+# The registered probes, keyed by name, as (owner, attribute, original)
+_probes = {}
+
+# The hooks attached to each probe
+_hooks = {}
+
+def register_probes(owner, *attrs):
+	"""
+	Register functions or methods as probe points. The name of each probe is
+	the name of its module (without the package), followed by the name of the
+	class (if any) and the attribute, e.g. "q_format.Q.mult".
+	
+	@param owner: The class or module that holds the callables.
+	
+	@param attrs: The names of the callables.
+	"""
+	
+	if isinstance(owner, types.ModuleType):
+		prefix = owner.__name__
+	else:
+		prefix = '{0}.{1}'.format(owner.__module__, owner.__name__)
+	prefix = prefix.split('.', 1)[-1] if prefix.startswith('lfw_gender.') \
+		else prefix
+	
+	for attr in attrs:
+		name = '{0}.{1}'.format(prefix, attr)
+		if name not in _probes:
+			_probes[name] = (owner, attr, getattr(owner, attr) if isinstance(
+				owner, types.ModuleType) else owner.__dict__[attr])
+
+def probes():
+	"""
+	Get the names of all of the registered probes.
+	
+	@return: A sorted list of the names.
+	"""
+	
+	return sorted(_probes)
+
+def _install(name, target):
+	"""
+	Replace the callable of a probe.
+	
+	@param name: The name of the probe.
+	
+	@param target: The callable to install.
+	"""
+	
+	owner, attr, original = _probes[name]
+	current               = getattr(owner, attr) if isinstance(owner,
+		types.ModuleType) else owner.__dict__[attr]
+	setattr(owner, attr, target)
+	
+	# Functions imported by name into other modules are replaced as well
+	if isinstance(owner, types.ModuleType):
+		for module in sys.modules.values():
+			if module is None or module is owner:
+				continue
+			for key, value in vars(module).items():
+				if value is current:
+					setattr(module, key, target)
+
+def attach(hook, *names):
+	"""
+	Attach a hook to probes.
+	
+	@param hook: The hook to attach.
+	
+	@param names: The names of the probes.
+	
+	@raise UnknownProbe: Raised if a probe does not exist.
+	"""
+	
+	for name in names:
+		if name not in _probes:
+			raise UnknownProbe(name)
+		
+		if name not in _hooks:
+			_hooks[name] = []
+			_install(name, _wrap(name, _hooks[name], _probes[name][2]))
+		
+		if hook not in _hooks[name]:
+			_hooks[name].append(hook)
+
+def _wrap(name, hooks, original):
+	"""
+	Create the wrapper that notifies the hooks of a probe.
+	
+	@param name: The name of the probe.
+	
+	@param hooks: The list of hooks attached to the probe. The list is shared
+	with the registry, thus hooks may be added without rewrapping.
+	
+	@param original: The original callable.
+	
+	@return: The wrapper.
+	"""
+	
+	@wraps(original)
+	def wrapper(*args, **kargs):
+		active = tuple(hooks)
+		for h in active:
+			h.enter(name)
+		try:
+			return original(*args, **kargs)
+		finally:
+			for h in reversed(active):
+				h.exit(name)
+	
+	return wrapper
+
+def detach(hook, *names):
+	"""
+	Detach a hook from probes. Once a probe has no hooks, its original
+	callable is restored.
+	
+	@param hook: The hook to detach.
+	
+	@param names: The names of the probes. If none are provided, the hook is
+	detached from every probe.
+	"""
+	
+	for name in (names or list(_hooks)):
+		hooks = _hooks.get(name)
+		if hooks is None or hook not in hooks:
+			continue
+		hooks.remove(hook)
+		if not hooks:
+			_install(name, _probes[name][2])
+			del _hooks[name]
+
+@contextmanager
+def profiling(hook, *names):
+	"""
+	Context manager that attaches a hook to probes for the duration of the
+	block. The hook is closed upon exiting.
+	
+	@param hook: The hook to attach.
+	
+	@param names: The names of the probes.
+	"""
+	
+	attach(hook, *names)
+	try:
+		yield hook
+	finally:
+		detach(hook, *names)
+		hook.close()
+
+###############################################################################
+########## Class Templates
+###############################################################################
+
+class BaseHook(object):
+	"""
+	Base class for a profiling hook.
+	"""
+	__metaclass__ = ABCMeta
+	
+	@abstractmethod
+	def enter(self, name):
+		"""
+		Called before a probe runs.
+		
+		@param name: The name of the probe.
+		"""
+	
+	@abstractmethod
+	def exit(self, name):
+		"""
+		Called after a probe runs, even if it raised.
+		
+		@param name: The name of the probe.
+		"""
+	
+	def close(self):
+		"""
+		Release any resources held by the hook.
+		"""
+
+###############################################################################
+########## Class Implementations
+###############################################################################
+
+class ProfileHook(BaseHook):
+	"""
+	Deterministic profiling with cProfile. A separate profile is kept for each
+	probe. Only one profiler may be active at a time, thus probes entered
+	while another probe is being profiled are counted towards the outer one.
+	"""
+	
+	def __init__(self):
+		"""
+		Initialize this class.
+		"""
+		
+		self.profiles = {}
+		self.active   = None
+		self.depth    = 0
+	
+	def enter(self, name):
+		"""
+		Start profiling, if no probe is being profiled.
+		
+		@param name: The name of the probe.
+		"""
+		
+		self.depth += 1
+		if self.depth == 1:
+			self.active = name
+			if name not in self.profiles:
+				self.profiles[name] = cProfile.Profile()
+			self.profiles[name].enable()
+	
+	def exit(self, name):
+		"""
+		Stop profiling, if the outermost probe has exited.
+		
+		@param name: The name of the probe.
+		"""
+		
+		self.depth -= 1
+		if self.depth == 0:
+			self.profiles[self.active].disable()
+			self.active = None
+	
+	def stats(self, name):
+		"""
+		Get the statistics of a probe.
+		
+		@param name: The name of the probe.
+		
+		@return: A pstats.Stats instance.
+		"""
+		
+		return pstats.Stats(self.profiles[name])
+	
+	def print_stats(self, sort='cumulative', limit=20):
+		"""
+		Print the statistics of every profiled probe.
+		
+		@param sort: The key to sort the functions by.
+		
+		@param limit: The maximum number of functions to print per probe.
+		"""
+		
+		for name in sorted(self.profiles):
+			print '\n{0}\n{1}'.format(name, '*' * len(name))
+			self.stats(name).sort_stats(sort).print_stats(limit)
+	
+	def dump_stats(self, out_dir):
+		"""
+		Save the statistics of every profiled probe, for use with pstats or
+		other viewers. Each probe is saved to "<name>.prof".
+		
+		@param out_dir: The directory to save the files in.
+		"""
+		
+		for name, profile in self.profiles.iteritems():
+			profile.dump_stats(os.path.join(out_dir, name + '.prof'))
+
+class SamplingHook(BaseHook):
+	"""
+	Statistical profiling by periodically sampling the call stacks. A
+	background thread records the stack of every thread that is inside a
+	probe. Each sample is counted towards every probe the thread is in.
+	"""
+	
+	def __init__(self, interval=0.005):
+		"""
+		Initialize this class. The sampling thread is started upon entering
+		the first probe.
+		
+		@param interval: The number of seconds between samples.
+		"""
+		
+		self.interval = interval
+		self.samples  = defaultdict(lambda: defaultdict(int))
+		self.phases   = {}
+		self.thread   = None
+		self.running  = False
+	
+	def enter(self, name):
+		"""
+		Mark the current thread as being inside the probe.
+		
+		@param name: The name of the probe.
+		"""
+		
+		self.phases.setdefault(threading.current_thread().ident, []).append(
+			name)
+		if self.thread is None:
+			self.running = True
+			self.thread  = threading.Thread(target=self._run)
+			self.thread.daemon = True
+			self.thread.start()
+	
+	def exit(self, name):
+		"""
+		Mark the current thread as having left the probe.
+		
+		@param name: The name of the probe.
+		"""
+		
+		self.phases[threading.current_thread().ident].pop()
+	
+	def _run(self):
+		"""
+		Sample the stacks until closed.
+		"""
+		
+		while self.running:
+			time.sleep(self.interval)
+			frames = sys._current_frames()
+			for ident, phases in self.phases.items():
+				frame = frames.get(ident)
+				if not phases or frame is None:
+					continue
+				
+				# Collect the stack, starting at the outermost frame
+				stack = []
+				while frame is not None:
+					code = frame.f_code
+					stack.append('{0}:{1}:{2}'.format(os.path.basename(
+						code.co_filename), code.co_name, frame.f_lineno))
+					frame = frame.f_back
+				stack = tuple(reversed(stack))
+				
+				for name in set(phases):
+					self.samples[name][stack] += 1
+	
+	def top(self, name, limit=20):
+		"""
+		Get the lines that were sampled most often within a probe.
+		
+		@param name: The name of the probe.
+		
+		@param limit: The maximum number of lines to return.
+		
+		@return: A list of (line, count) tuples, most frequent first.
+		"""
+		
+		counts = defaultdict(int)
+		for stack, count in self.samples[name].iteritems():
+			counts[stack[-1]] += count
+		
+		return sorted(counts.iteritems(), key=lambda x: -x[1])[:limit]
+	
+	def dump_collapsed(self, out_path):
+		"""
+		Save the samples in the collapsed stack format used by flame graph
+		tools. Each stack is prefixed by the name of its probe.
+		
+		@param out_path: The full path to the file to write to.
+		"""
+		
+		with open(out_path, 'wb') as f:
+			for name in sorted(self.samples):
+				for stack, count in self.samples[name].iteritems():
+					f.write('{0};{1} {2}\n'.format(name, ';'.join(stack),
+						count))
+	
+	def close(self):
+		"""
+		Stop the sampling thread.
+		"""
+		
+		self.running = False
+		if self.thread is not None:
+			self.thread.join()
+			self.thread = None
+
+class MemoryHook(BaseHook):
+	"""
+	Memory profiling by sampling the resident set size of the process (see
+	L{PeakMemory<lfw_gender.memory.PeakMemory>}), as tracemalloc isn't
+	available for Python 2. For the outermost call of each probe, the peak
+	and the final change of the resident set size are kept. A sampling
+	thread is started per call, so this is meant for coarse probes (e.g. a
+	whole training pass) rather than single steps.
+	"""
+	
+	def __init__(self, interval=0.001):
+		"""
+		Initialize this class.
+		
+		@param interval: The number of seconds between samples of the resident
+		set size.
+		
+		@raise UnavailableHook: Raised if the resident set size can't be read.
+		"""
+		
+		if rss() is None:
+			raise UnavailableHook('MemoryHook', 'the resident set size of the '
+				'process (/proc/self/statm)')
+		
+		self.interval = interval
+		self.calls    = defaultdict(list)
+		self.depths   = defaultdict(int)
+		self.peaks    = {}
+	
+	def enter(self, name):
+		"""
+		Start sampling the resident set size.
+		
+		@param name: The name of the probe.
+		"""
+		
+		self.depths[name] += 1
+		if self.depths[name] == 1:
+			self.peaks[name] = PeakMemory(self.interval).__enter__()
+	
+	def exit(self, name):
+		"""
+		Stop sampling and keep the peak and change of the call.
+		
+		@param name: The name of the probe.
+		"""
+		
+		self.depths[name] -= 1
+		if self.depths[name] == 0:
+			peak = self.peaks.pop(name)
+			peak.__exit__(None, None, None)
+			self.calls[name].append((peak.peak, peak.change))
+	
+	def report(self, name, call=-1):
+		"""
+		Get the report of a single call of a probe.
+		
+		@param name: The name of the probe.
+		
+		@param call: The index of the call.
+		
+		@return: A string containing the peak and the change of the resident
+		set size, relative to the start of the call.
+		"""
+		
+		peak, change = self.calls[name][call]
+		
+		return 'Peak: {0}\nChange: {1}'.format(pretty_bytes(peak),
+			pretty_bytes(change))
+	
+	def close(self):
+		"""
+		Stop sampling any calls that are still running.
+		"""
+		
+		for peak in self.peaks.values():
+			peak.__exit__(None, None, None)
+		self.peaks.clear()
\ No newline at end of file
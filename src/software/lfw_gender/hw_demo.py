@@ -31,11 +31,12 @@ from lfw_gender.q_format   import imgs_to_fp, fps_to_imgs
 from lfw_gender.preprocess import reshape
 from lfw_gender.util       import get_data
 from lfw_gender.hw_net     import CompetitiveLearningClassifier
+from lfw_gender.hw_perf    import sweep, format_estimates
 from lfw_gender.plot       import plot_epoch, plot_weights
 
 def main(train_x, train_y, test_x, test_y, m, n, categories, nepochs=1,
 	plot=True, verbose=True, learning_rate=0.001, min_weight=-1, max_weight=1,
-	nrows=1, ncols=1, shape=(10, 10)):
+	nrows=1, ncols=1, shape=(10, 10), sink=None, perf=None):
 	"""
 	Demonstrates the CompetitiveLearningClassifier on LFW.
 	
@@ -78,6 +79,13 @@ def main(train_x, train_y, test_x, test_y, m, n, categories, nepochs=1,
 	shape of (100, ). This vector would then need to be resized to your desired
 	shape of (10, 10).
 	
+	@param sink: If provided, a record of metrics will be written to this
+	L{BaseMetricsSink<lfw_gender.metrics.BaseMetricsSink>} after every epoch.
+	
+	@param perf: If provided, the operations of the network are counted and
+	the HW time is estimated by this L{PerformanceModel<lfw_gender.hw_perf.
+	PerformanceModel>}.
+	
 	@return: A tuple containing the training results, testing results, and
 	weights, respectively.
 	"""
@@ -90,12 +98,13 @@ def main(train_x, train_y, test_x, test_y, m, n, categories, nepochs=1,
 		categories     = categories,
 		learning_rate  = learning_rate,
 		min_weight     = min_weight,
-		max_weight     = max_weight
+		max_weight     = max_weight,
+		perf           = perf
 	)
 	
 	# Run the network
 	train_results, test_results = net.run(train_x, train_y, test_x, test_y,
-		nepochs, verbose)
+		nepochs, verbose, sink=sink)
 	
 	# Reshape the weights
 	weights = {}
@@ -288,6 +297,54 @@ def vary_fractional_bits(out_dir, nepochs=20, niters=10, show_plot=True):
 	with open(os.path.join(out_dir2, 'vary_fractional_bits.pkl'), 'wb') as f:
 		cPickle.dump(((train_results, train_stds),
 				(test_results, test_stds)), f, cPickle.HIGHEST_PROTOCOL)
+	
+	# Estimate the HW performance of each size
+	estimates = sweep(ns=sizes, ntrain=len(train_y), ntest=len(test_y))
+	print format_estimates(estimates)
+	with open(os.path.join(out_dir2, 'vary_fractional_bits_perf.pkl'),
+		'wb') as f:
+		cPickle.dump(estimates, f, cPickle.HIGHEST_PROTOCOL)
+
+def vary_parallelism(out_dir=None, imsizes=(5, 7, 10, 15, 20), lanes=(None,
+	49, 16, 8, 1), pipeline_depths=(2, 4), m=1, n=11, ntrain=800, ntest=200):
+	"""
+	Estimate the HW performance while varying the image size and the
+	parallelism of the datapath.
+	
+	@param out_dir: The directory to save the estimates in. If None, they are
+	only printed.
+	
+	@param imsizes: The image sizes.
+	
+	@param lanes: The numbers of lanes, where None is one lane per input.
+	
+	@param pipeline_depths: The numbers of pipeline stages.
+	
+	@param m: The number of integer bits for fixed point.
+	
+	@param n: The number of fractional bits for fixed point.
+	
+	@param ntrain: The number of training samples of an epoch.
+	
+	@param ntest: The number of testing samples of an epoch.
+	
+	@return: A list containing the estimates.
+	"""
+	
+	estimates = sweep(imsizes, (m,), (n,), lanes, pipeline_depths, ntrain,
+		ntest)
+	print format_estimates(estimates)
+	
+	if out_dir is not None:
+		out_dir2 = os.path.join(out_dir, 'parallelism')
+		try:
+			os.makedirs(out_dir2)
+		except OSError:
+			pass
+		with open(os.path.join(out_dir2, 'vary_parallelism.pkl'), 'wb') as f:
+			cPickle.dump(estimates, f, cPickle.HIGHEST_PROTOCOL)
+	
+	return estimates
 
 if __name__ == '__main__':
 	# The results path (currently set to the path in the repo)
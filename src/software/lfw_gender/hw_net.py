@@ -27,8 +27,10 @@ import random
 import numpy as np
 
 # Program imports
-from lfw_gender.q_format import Q
-from lfw_gender.timers   import MultiTimer, pretty_time
+from lfw_gender.q_format import Q, format_counters
+from lfw_gender.timers   import MultiTimer, pretty_time, clock
+from lfw_gender.metrics  import new_run_id
+from lfw_gender.hooks    import register_probes
 
 ###############################################################################
 ########## Class Templates
@@ -92,7 +94,7 @@ class SimpleCompetitiveLearning(BaseCompetitiveLearning):
 	"""
 	
 	def __init__(self, ninputs, m, n, learning_rate=0.001, min_weight=-1,
-		max_weight=1):
+		max_weight=1, perf=None):
 		"""
 		Initializes this competitive learning network.
 		
@@ -107,6 +109,9 @@ class SimpleCompetitiveLearning(BaseCompetitiveLearning):
 		@param min_weight: The minimum weight value.
 		
 		@param max_weight: The maximum weight value.
+		
+		@param perf: If provided, the operations of every step are counted by
+		this L{PerformanceModel<lfw_gender.hw_perf.PerformanceModel>}.
 		"""
 		
 		# Store the params
@@ -114,6 +119,7 @@ class SimpleCompetitiveLearning(BaseCompetitiveLearning):
 		self.n              = n
 		self.learning_rate  = Q(self.m, self.n, learning_rate)
 		self.scale          = Q(self.m, self.n, 1. / (ninputs ** 0.5))
+		self.perf           = perf
 		
 		# Enable learning
 		self.enable_learning()
@@ -128,6 +134,10 @@ class SimpleCompetitiveLearning(BaseCompetitiveLearning):
 		@param x: The input data to compute for this step.
 		"""
 		
+		# Count the operations
+		if self.perf is not None:
+			self.perf.count_step(self.learning)
+		
 		# Calculate the output
 		self.soutput = Q(self.m, self.n, 0)
 		for wi, xi in izip(self.weights, x):
@@ -147,7 +157,7 @@ class CompetitiveLearningClassifier(object):
 	"""
 	
 	def __init__(self, ninputs, m, n, categories, learning_rate=0.001,
-		min_weight=-1, max_weight=1):
+		min_weight=-1, max_weight=1, perf=None):
 		"""
 		Initializes this competitive learning network.
 		
@@ -165,11 +175,18 @@ class CompetitiveLearningClassifier(object):
 		@param min_weight: The minimum weight value.
 		
 		@param max_weight: The maximum weight value.
+		
+		@param perf: If provided, the operations of every step are counted by
+		this L{PerformanceModel<lfw_gender.hw_perf.PerformanceModel>}.
 		"""
 		
 		# Create the competitive learning networks
 		self.cnets = {category:SimpleCompetitiveLearning(ninputs, m, n,
-			learning_rate, min_weight, max_weight) for category in categories}
+			learning_rate, min_weight, max_weight, perf) for category in
+			categories}
+		self.m     = m
+		self.n     = n
+		self.perf  = perf
 		
 		# Initialize a timing unit
 		self.timers = MultiTimer()
@@ -239,10 +256,16 @@ class CompetitiveLearningClassifier(object):
 		
 		return accuracy
 	
-	def run(self, train_x, train_y, test_x, test_y, nepochs=1, verbose=True):
+	def run(self, train_x, train_y, test_x, test_y, nepochs=1, verbose=True,
+		sink=None, run_id=None):
 		"""
 		Simulate the entire network.
 		
+		The fixed point events (see L{new_counters<lfw_gender.q_format.
+		new_counters>}) of every epoch are reported as well. These include all
+		Q numbers with the format of this network, not only those of this
+		network.
+		
 		@param train_x: The data to train with. This must be an iterable
 		returning a numpy array.
 		
@@ -259,6 +282,12 @@ class CompetitiveLearningClassifier(object):
 		
 		@param verbose: If True, details will be printed after each epoch.
 		
+		@param sink: A L{BaseMetricsSink<lfw_gender.metrics.BaseMetricsSink>}
+		to write a record of metrics to after each epoch.
+		
+		@param run_id: The identifier to add to each record. If None, a unique
+		identifier is generated.
+		
 		@return: A tuple containing the training and test accuracies.
 		"""
 		
@@ -271,15 +300,26 @@ class CompetitiveLearningClassifier(object):
 		# Initializations
 		train = self.train; classify = self.classify
 		train_accuracy = np.zeros(nepochs); test_accuracy  = np.zeros(nepochs)
+		if sink is not None and run_id is None:
+			run_id = new_run_id()
+		hw_epoch_time = None if self.perf is None else self.perf.estimate(
+			len(train_y), len(test_y))['epoch_time']
+		counters      = format_counters(self.m, self.n)
 		
 		# Iterate through all epochs
 		for i in xrange(nepochs):
+			prev_counters = dict(counters)
+			
 			# Train with all of the patterns
 			self.timers.start_timers('train', 'train_epoch')
+			start = clock()
 			self.train(train_x, train_y)
+			train_time = clock() - start
 			
 			# Get the accuracy for all of the training patterns
+			start = clock()
 			train_accuracy[i] = classify(train_x, train_y)
+			train_eval_time = clock() - start
 			self.timers.pause_timers('train')
 			self.timers.stop_timers('train_epoch')
 			
@@ -293,7 +333,9 @@ class CompetitiveLearningClassifier(object):
 			
 			# Get the accuracy for all of the testing patterns
 			self.timers.start_timers('test', 'test_epoch')
+			start = clock()
 			test_accuracy[i] = classify(test_x, test_y)
+			test_time = clock() - start
 			self.timers.pause_timers('test')
 			self.timers.stop_timers('test_epoch')
 			
@@ -303,6 +345,36 @@ class CompetitiveLearningClassifier(object):
 					100)
 				print '  Testing Time      : {0}'.format(
 					self.timers.get_elapsed_time('test_epoch', True))
+			
+			# Get the fixed point events of this epoch
+			events = {name:counters[name] - prev_counters[name] for name in
+				('overflows', 'underflows', 'saturations', 'zero_flushes')}
+			if verbose:
+				print '  Saturations       : {0} ({1} overflows, {2} ' \
+					'underflows)'.format(events['saturations'],
+					events['overflows'], events['underflows'])
+				print '  Zero Flushes      : {0}'.format(
+					events['zero_flushes'])
+				if self.perf is not None:
+					print '  Estimated HW Time : {0}'.format(pretty_time(
+						hw_epoch_time))
+			
+			# Write out the metrics
+			if sink is not None:
+				events.update({
+					'run_id'                : run_id,
+					'epoch'                 : i + 1,
+					'nepochs'               : nepochs,
+					'train_accuracy'        : train_accuracy[i],
+					'test_accuracy'         : test_accuracy[i],
+					'train_time'            : train_time,
+					'train_eval_time'       : train_eval_time,
+					'test_time'             : test_time,
+					'train_samples_per_sec' : len(train_y) / train_time,
+					'test_samples_per_sec'  : len(test_y) / test_time,
+					'hw_epoch_time'         : hw_epoch_time
+				})
+				sink.write(events)
 		
 		# Print out the final results
 		self.timers.stop_timers('global')
@@ -323,4 +395,11 @@ class CompetitiveLearningClassifier(object):
 			print 'Average Testing Epoch Time  : {0}'.format(
 				pretty_time(self.timers.get_elapsed_time('test') / nepochs))		
 		
-		return (train_accuracy, test_accuracy)
\ No newline at end of file
+		return (train_accuracy, test_accuracy)
+
+###############################################################################
+########## Probes
+###############################################################################
+
+register_probes(SimpleCompetitiveLearning, 'step')
+register_probes(CompetitiveLearningClassifier, 'train', 'classify', 'run')
\ No newline at end of file
@@ -0,0 +1,292 @@
+# hw_perf.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Cycle level performance model of the HW datapath.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Cycle level performance model of the HW datapath.
+
+The datapath processes the inputs of a sample in lanes, one input per lane
+and clock cycle. While training, a sample must leave the pipeline before the
+next one may read the updated weights, so samples don't overlap. While
+classifying, the samples overlap, but the output evaluation blocks are shared
+between the networks.
+
+The defaults match the design in src/hardware: one lane per input, a two stage
+pipeline, a single output evaluation block, a 100 MHz clock and a reset of
+4 * ninputs + 1 cycles. Thus, both training and classification take two
+cycles per sample, as in the test benches.
+
+G{packagetree lfw_gender}
+"""
+
+__docformat__ = 'epytext'
+
+# Native imports
+import math
+from   collections import defaultdict
+
+###############################################################################
+########## Functions
+###############################################################################
+
+def step_ops(ninputs, learning):
+	"""
+	Count the operations of a single step of a single network.
+	
+	@param ninputs: The number of inputs to the network.
+	
+	@param learning: If True, the weights are also updated, i.e.
+	w += lr * (x - w). The output, i.e. the sum of ((w - x) * scale) ^ 2, is
+	evaluated either way.
+	
+	@return: A dictionary mapping the name of each operation ("add", "sub",
+	"mult" and "square") to the number of times it is performed.
+	"""
+	
+	# The sum is computed by an adder tree
+	ops = {'add':ninputs - 1, 'sub':ninputs, 'mult':ninputs,
+		'square':ninputs}
+	if learning:
+		for op in ('add', 'sub', 'mult'):
+			ops[op] += ninputs
+	
+	return ops
+
+###############################################################################
+########## Class Implementations
+###############################################################################
+
+class PerformanceModel(object):
+	"""
+	Performance model of the HW for a single configuration.
+	"""
+	
+	def __init__(self, imsize, m, n, ncategories=2, lanes=None,
+		pipeline_depth=2, evaluators=1, clock_hz=100e6):
+		"""
+		Initialize this class.
+		
+		@param imsize: The size of the (square) images.
+		
+		@param m: The number of integer bits for fixed point.
+		
+		@param n: The number of fractional bits for fixed point.
+		
+		@param ncategories: The number of networks.
+		
+		@param lanes: The number of inputs processed in parallel. If None (or
+		more than the number of inputs), every input has its own lane.
+		
+		@param pipeline_depth: The number of pipeline stages.
+		
+		@param evaluators: The number of output evaluation blocks.
+		
+		@param clock_hz: The clock frequency.
+		"""
+		
+		# Store the params
+		self.imsize         = imsize
+		self.m              = m
+		self.n              = n
+		self.ninputs        = imsize ** 2
+		self.ncategories    = ncategories
+		self.lanes          = self.ninputs if lanes is None else min(lanes,
+			self.ninputs)
+		self.pipeline_depth = pipeline_depth
+		self.evaluators     = evaluators
+		self.clock_hz       = clock_hz
+		
+		# The counted operations
+		self.reset_counts()
+	
+	def reset_counts(self):
+		"""
+		Reset the counted steps and operations.
+		"""
+		
+		self.steps = 0
+		self.ops   = defaultdict(int)
+	
+	def count_step(self, learning):
+		"""
+		Count a single step of a single network.
+		
+		@param learning: If True, the step updated the weights.
+		"""
+		
+		self.steps += 1
+		for op, count in step_ops(self.ninputs, learning).iteritems():
+			self.ops[op] += count
+	
+	def passes(self):
+		"""
+		Get the number of cycles needed to feed all inputs through the lanes.
+		
+		@return: The number of passes.
+		"""
+		
+		return int(math.ceil(self.ninputs / float(self.lanes)))
+	
+	def train_cycles(self):
+		"""
+		Get the number of cycles per training sample.
+		
+		@return: The number of cycles.
+		"""
+		
+		return self.passes() + self.pipeline_depth - 1
+	
+	def classify_cycles(self):
+		"""
+		Get the number of cycles per classified sample, ignoring the cycles
+		needed to fill the pipeline.
+		
+		@return: The number of cycles.
+		"""
+		
+		return int(math.ceil(self.ncategories / float(self.evaluators))) * \
+			self.passes()
+	
+	def reset_cycles(self):
+		"""
+		Get the number of cycles needed to initialize the weights.
+		
+		@return: The number of cycles.
+		"""
+		
+		return 4 * self.ninputs + 1
+	
+	def epoch_cycles(self, ntrain, ntest):
+		"""
+		Get the number of cycles of an epoch, i.e. training followed by the
+		classification of the training and testing data.
+		
+		@param ntrain: The number of training samples.
+		
+		@param ntest: The number of testing samples.
+		
+		@return: The number of cycles.
+		"""
+		
+		return ntrain * self.train_cycles() + (ntrain + ntest) * \
+			self.classify_cycles() + self.pipeline_depth - 1
+	
+	def estimate(self, ntrain=None, ntest=None):
+		"""
+		Estimate the performance and resources.
+		
+		@param ntrain: The number of training samples. If None, the epoch
+		isn't estimated.
+		
+		@param ntest: The number of testing samples.
+		
+		@return: A dictionary containing the configuration, the operations
+		per training and classified sample ("train_ops" and "classify_ops"),
+		the cycles and samples per second of both, the cycles of the reset
+		and the number of multipliers, adders (including subtractors) and bits
+		of weight storage. The "area" is a relative cost of the datapath, in
+		which a multiplier costs the square of the number of bits, an adder
+		the number of bits and a bit of storage one. If the number of samples
+		is provided, the cycles and seconds of an epoch are included as well.
+		The steps and operations counted with L{count_step} so far are
+		included as "counted_steps" and "counted_ops".
+		"""
+		
+		bits         = self.m + self.n + 1
+		train_ops    = step_ops(self.ninputs, True)
+		classify_ops = {op:self.ncategories * count for op, count in
+			step_ops(self.ninputs, False).iteritems()}
+		
+		estimate = {
+			'imsize'                   : self.imsize,
+			'm'                        : self.m,
+			'n'                        : self.n,
+			'lanes'                    : self.lanes,
+			'pipeline_depth'           : self.pipeline_depth,
+			'evaluators'               : self.evaluators,
+			'clock_hz'                 : self.clock_hz,
+			'train_ops'                : train_ops,
+			'classify_ops'             : classify_ops,
+			'train_cycles'             : self.train_cycles(),
+			'classify_cycles'          : self.classify_cycles(),
+			'train_samples_per_sec'    : self.clock_hz / self.train_cycles(),
+			'classify_samples_per_sec' : self.clock_hz /
+				self.classify_cycles(),
+			'reset_cycles'             : self.reset_cycles(),
+			'multipliers'              : self.lanes * (2 * self.evaluators +
+				1),
+			'adders'                   : self.lanes * (self.evaluators + 2) +
+				(self.lanes - 1) * self.evaluators,
+			'weight_bits'              : self.ncategories * self.ninputs * (
+				self.m + self.n + 1),
+			'counted_steps'            : self.steps,
+			'counted_ops'              : dict(self.ops)
+		}
+		estimate['area'] = estimate['multipliers'] * bits ** 2 + \
+			estimate['adders'] * bits + estimate['weight_bits']
+		if ntrain is not None:
+			estimate['epoch_cycles'] = self.epoch_cycles(ntrain, ntest)
+			estimate['epoch_time']   = estimate['epoch_cycles'] / self.clock_hz
+		
+		return estimate
+
+###############################################################################
+########## Sweeps
+###############################################################################
+
+def sweep(imsizes=(7,), ms=(1,), ns=(11,), lanes=(None,), pipeline_depths=(2,),
+	ntrain=None, ntest=None, **kargs):
+	"""
+	Estimate the performance of every combination of the parameters.
+	
+	@param imsizes: The image sizes.
+	
+	@param ms: The numbers of integer bits.
+	
+	@param ns: The numbers of fractional bits.
+	
+	@param lanes: The numbers of lanes, where None is one lane per input.
+	
+	@param pipeline_depths: The numbers of pipeline stages.
+	
+	@param ntrain: The number of training samples of an epoch.
+	
+	@param ntest: The number of testing samples of an epoch.
+	
+	@param kargs: Any other keyword arguments for L{PerformanceModel}.
+	
+	@return: A list containing the estimates.
+	"""
+	
+	return [PerformanceModel(imsize, m, n, lanes=l, pipeline_depth=d,
+		**kargs).estimate(ntrain, ntest) for imsize in imsizes for m in ms
+		for n in ns for l in lanes for d in pipeline_depths]
+
+def format_estimates(estimates):
+	"""
+	Format estimates as a table.
+	
+	@param estimates: The estimates.
+	
+	@return: A string containing the table.
+	"""
+	
+	lines = ['{0:>6} {1:>3} {2:>3} {3:>6} {4:>5} {5:>12} {6:>12} {7:>14} '
+		'{8:>6} {9:>8}'.format('imsize', 'm', 'n', 'lanes', 'depth',
+		'train cyc', 'class. cyc', 'train samp/s', 'mults', 'w bits')]
+	for e in estimates:
+		lines.append('{0:>6} {1:>3} {2:>3} {3:>6} {4:>5} {5:>12} {6:>12} '
+			'{7:>14.0f} {8:>6} {9:>8}'.format(e['imsize'], e['m'], e['n'],
+			e['lanes'], e['pipeline_depth'], e['train_cycles'],
+			e['classify_cycles'], e['train_samples_per_sec'],
+			e['multipliers'], e['weight_bits']))
+	
+	return '\n'.join(lines)
\ No newline at end of file
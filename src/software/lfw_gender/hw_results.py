@@ -0,0 +1,349 @@
+# hw_results.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Vectorized parsing of the HW result files.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Vectorized parsing of the HW result files.
+
+A result file is read as bytes and converted into a matrix of labels, with one
+row per epoch and one column per sample, without looping over its lines in
+Python. Two layouts are supported: one epoch per line, with the labels
+separated by whitespace, and one label per line, which is a single epoch. The
+labels must be single digits.
+
+Parsed files are cached and only parsed again if their modification time or
+size changes.
+
+The accuracies of a directory of result files are aggregated by parsing the
+files across a pool of worker processes and accumulating the mean and standard
+deviation of each epoch with Welford's algorithm. Only the running statistics
+are kept, so the memory doesn't grow with the number of files. The cache of
+each worker lives as long as its pool, so a pool should be created once and
+passed to every call of L{aggregate} for the cache to be reused.
+
+G{packagetree lfw_gender}
+"""
+
+__docformat__ = 'epytext'
+
+# Native imports
+import os
+from itertools import izip, repeat
+from multiprocessing import Pool, cpu_count
+
+# Third party imports
+import numpy as np
+
+# Program imports
+from lfw_gender.exception_handler import BaseException, wrap_error
+
+# The parsed files, mapping (kind, path) to (mtime, size, result)
+_cache = {}
+
+###############################################################################
+########## Exception Handling
+###############################################################################
+
+class RaggedResults(BaseException):
+	"""
+	Exception if the epochs of a result file don't have the same number of
+	labels.
+	"""
+	
+	def __init__(self, path):
+		"""
+		Initialize this class.
+		
+		@param path: The full path to the result file.
+		"""
+		
+		self.msg = wrap_error('The result file "{0}" has epochs with '
+			'differing numbers of labels.'.format(path))
+
+class NoResults(BaseException):
+	"""
+	Exception if a directory doesn't contain any result files.
+	"""
+	
+	def __init__(self, dir_path):
+		"""
+		Initialize this class.
+		
+		@param dir_path: The directory that was aggregated.
+		"""
+		
+		self.msg = wrap_error('The directory "{0}" doesn\'t contain any '
+			'result files.'.format(dir_path))
+
+###############################################################################
+########## Parsing
+###############################################################################
+
+def parse_results(data, path='<bytes>'):
+	"""
+	Convert the contents of a result file into a label matrix.
+	
+	@param data: A string containing the contents of the file.
+	
+	@param path: The name of the file, used for reporting errors.
+	
+	@return: A numpy array of shape (epochs, samples) containing the labels.
+	
+	@raise RaggedResults: Raised if the epochs have a differing number of
+	labels.
+	"""
+	
+	b      = np.frombuffer(data, dtype=np.uint8)
+	digits = (b >= ord('0')) & (b <= ord('9'))
+	labels = b[digits] - ord('0')
+	
+	# Count the labels on each line, skipping empty lines
+	counts = np.bincount(np.cumsum(b == ord('\n'))[digits])
+	counts = counts[counts != 0]
+	if counts.size == 0:
+		return np.zeros((0, 0), dtype=np.uint8)
+	if np.any(counts != counts[0]):
+		raise RaggedResults(path)
+	
+	# A single label per line is a single epoch
+	if counts[0] == 1:
+		return labels.reshape(1, -1)
+	return labels.reshape(counts.size, counts[0])
+
+def parse_labels(data):
+	"""
+	Get the ground truths from the contents of a HW train / test file, i.e.
+	the first character of each line.
+	
+	@param data: A string containing the contents of the file.
+	
+	@return: A numpy array containing the labels.
+	"""
+	
+	b     = np.frombuffer(data, dtype=np.uint8)
+	first = b[np.flatnonzero(np.concatenate(([True], b[:-1] == ord('\n'))))]
+	
+	# Empty lines start with a line break, so they are dropped here
+	return first[(first >= ord('0')) & (first <= ord('9'))] - ord('0')
+
+def _cached(name, path, parser):
+	"""
+	Parse a file, reusing the previous result if the file didn't change.
+	
+	@param name: The name of the kind of file.
+	
+	@param path: The full path to the file.
+	
+	@param parser: The function to convert the contents of the file.
+	
+	@return: The parsed file.
+	"""
+	
+	path  = os.path.abspath(path)
+	st    = os.stat(path)
+	key   = (name, path)
+	entry = _cache.get(key)
+	if entry is not None and entry[:2] == (st.st_mtime, st.st_size):
+		return entry[2]
+	
+	with open(path, 'rb') as f:
+		data = f.read()
+	result      = parser(data)
+	_cache[key] = (st.st_mtime, st.st_size, result)
+	
+	return result
+
+def read_results(path):
+	"""
+	Read a result file.
+	
+	@param path: The full path to the result file.
+	
+	@return: A numpy array of shape (epochs, samples) containing the labels.
+	"""
+	
+	return _cached('results', path, lambda data: parse_results(data, path))
+
+def read_labels(path):
+	"""
+	Read the ground truths of a HW train / test file.
+	
+	@param path: The full path to the HW train / test file.
+	
+	@return: A numpy array containing the labels.
+	"""
+	
+	return _cached('labels', path, parse_labels)
+
+def clear_cache():
+	"""
+	Forget all of the parsed files.
+	"""
+	
+	_cache.clear()
+
+###############################################################################
+########## Accuracy
+###############################################################################
+
+def accuracy(predicted, actual):
+	"""
+	Determine the percent correct of each epoch. If the number of samples
+	differs, only the samples that exist in both are compared.
+	
+	@param predicted: A numpy array of shape (epochs, samples) containing the
+	predicted labels.
+	
+	@param actual: A numpy array containing the actual labels.
+	
+	@return: A numpy array containing the accuracy of each epoch.
+	"""
+	
+	n = min(predicted.shape[-1], len(actual))
+	
+	return np.mean(predicted[..., :n] == actual[:n], -1) * 100
+
+def result_accuracy(path, actual):
+	"""
+	Determine the percent correct of each epoch of a result file.
+	
+	@param path: The full path to the result file.
+	
+	@param actual: A numpy array containing the actual labels.
+	
+	@return: A numpy array containing the accuracy of each epoch.
+	"""
+	
+	return accuracy(read_results(path), actual)
+
+def directory_accuracy(dir_path, actual):
+	"""
+	Determine the percent correct of each epoch of every result file in a
+	directory.
+	
+	@param dir_path: The directory containing the result files.
+	
+	@param actual: A numpy array containing the actual labels.
+	
+	@return: A numpy array of shape (files, epochs) containing the accuracies,
+	with the files in sorted order.
+	"""
+	
+	return np.array([result_accuracy(os.path.join(dir_path, path), actual)
+		for path in sorted(os.listdir(dir_path))])
+
+###############################################################################
+########## Aggregation
+###############################################################################
+
+class RunningStats(object):
+	"""
+	Streaming mean and standard deviation, computed with Welford's algorithm.
+	"""
+	
+	def __init__(self):
+		"""
+		Initialize this class.
+		"""
+		
+		self.n    = 0
+		self.mean = None
+		self.m2   = None
+	
+	def update(self, x):
+		"""
+		Add a sample.
+		
+		@param x: The sample, e.g. a numpy array containing the accuracy of
+		each epoch.
+		"""
+		
+		x       = np.asarray(x, dtype='float64')
+		self.n += 1
+		if self.n == 1:
+			self.mean = x.copy()
+			self.m2   = np.zeros_like(x)
+		else:
+			delta      = x - self.mean
+			self.mean += delta / self.n
+			self.m2   += delta * (x - self.mean)
+	
+	def std(self):
+		"""
+		Get the (population) standard deviation, as computed by np.std.
+		
+		@return: The standard deviation, or None if there are no samples.
+		"""
+		
+		return None if self.n == 0 else np.sqrt(self.m2 / self.n)
+
+def _worker_accuracy(args):
+	"""
+	Determine the percent correct of each epoch of a result file in a worker
+	process.
+	
+	@param args: A tuple containing the full path to the result file and a
+	numpy array containing the actual labels.
+	
+	@return: A numpy array containing the accuracy of each epoch.
+	"""
+	
+	return result_accuracy(*args)
+
+def aggregate(dir_path, actual, nworkers=None, chunksize=16, pool=None):
+	"""
+	Compute the mean and standard deviation of the accuracy of each epoch over
+	all of the result files in a directory.
+	
+	@param dir_path: The directory containing the result files.
+	
+	@param actual: A numpy array containing the actual labels.
+	
+	@param nworkers: The number of worker processes. If None, one per CPU is
+	used. If 1, the files are parsed in this process. This is ignored if a
+	pool is provided.
+	
+	@param chunksize: The number of files sent to a worker at a time.
+	
+	@param pool: A multiprocessing pool to parse the files with. It is left
+	running, such that the files parsed by its workers stay cached for later
+	calls. If None, a pool is created for this call only.
+	
+	@return: A tuple containing the mean, the standard deviation and the
+	number of files.
+	
+	@raise NoResults: Raised if the directory doesn't contain any files.
+	"""
+	
+	paths = [os.path.join(dir_path, path) for path in
+		sorted(os.listdir(dir_path))]
+	if not paths:
+		raise NoResults(dir_path)
+	nworkers = cpu_count() if nworkers is None else nworkers
+	stats    = RunningStats()
+	
+	if pool is None and (nworkers == 1 or len(paths) <= 1):
+		for path in paths:
+			stats.update(result_accuracy(path, actual))
+	else:
+		owned = pool is None
+		if owned:
+			pool = Pool(min(nworkers, len(paths)))
+		try:
+			for x in pool.imap_unordered(_worker_accuracy, izip(paths,
+				repeat(actual)), chunksize):
+				stats.update(x)
+		finally:
+			if owned:
+				pool.terminate()
+				pool.join()
+	
+	return stats.mean, stats.std(), stats.n
\ No newline at end of file
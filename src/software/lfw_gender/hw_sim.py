@@ -0,0 +1,473 @@
+# hw_sim.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Fast fixed point simulator and HW co-simulation.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Fast fixed point simulator and HW co-simulation.
+
+The simulator is bit-exact with L{hw_net<lfw_gender.hw_net>}, but stores the
+weights as numpy arrays of raw integers (see
+L{fp_encode<lfw_gender.q_format.fp_encode>}) instead of lists of Q numbers.
+Training still steps through one sample at a time, but all of the inputs of a
+sample are updated at once and classification is done for all samples at
+once.
+
+The co-simulation replays the HW data (as created by
+L{generate_hw_data<lfw_gender.generate_hw_data>}) through the simulator,
+starting with the weights loaded by the LFSR of the HW, and reports the first
+sample where the predictions differ from the HW results.
+
+G{packagetree lfw_gender}
+"""
+
+__docformat__ = 'epytext'
+
+# Native imports
+import os, random
+
+# Third party imports
+import numpy as np
+
+# Program imports
+from lfw_gender.q_format   import fp_encode, fp_decode, fp_from_q, \
+	fp_saturate, fp_sub, fp_add, fp_mult, new_counters, check_rounding
+from lfw_gender.hw_results import read_results
+from lfw_gender.hooks      import register_probes
+
+###############################################################################
+########## HW Data
+###############################################################################
+
+def load_fixed_point(path, m=1, n=11):
+	"""
+	Load a HW train / test file. Each line contains the label, followed by the
+	Q formatted number of each pixel.
+	
+	@param path: The full path to the HW train / test file.
+	
+	@param m: The number of integer bits for fixed point.
+	
+	@param n: The number of fractional bits for fixed point.
+	
+	@return: A tuple containing a numpy array with the raw integers of one
+	image per row and a numpy array with the labels.
+	"""
+	
+	with open(path, 'rb') as f:
+		data = f.read()
+	ninputs = len(data[:data.find('\n')].split()) - 1
+	tokens  = np.array(data.split()).reshape(-1, ninputs + 1)
+	
+	return fp_from_q(tokens[:, 1:], m, n), tokens[:, 0].astype(int)
+
+# The taps of the 12 bit LFSR of the HW (see LFSR.vhd)
+LFSR_TAPS = 0xCA0
+
+def lfsr_states(init, count, nbits=12, taps=LFSR_TAPS):
+	"""
+	Compute the states of the LFSR of the HW.
+	
+	@param init: The initial state, either as an integer or as a string of
+	bits (e.g. "011111100001").
+	
+	@param count: The number of states to compute.
+	
+	@param nbits: The number of bits of the LFSR.
+	
+	@param taps: The bits that are flipped if the LSB is shifted out.
+	
+	@return: A numpy array containing the states, starting with the initial
+	state.
+	"""
+	
+	state  = int(init, 2) if isinstance(init, basestring) else init
+	states = np.zeros(count, dtype=np.int64)
+	for i in xrange(count):
+		states[i] = state
+		state     = (state >> 1) ^ (taps if state & 1 else 0)
+	
+	# The output is sign extended by a bit
+	return states - (states >> (nbits - 1)) * (1 << nbits)
+
+def lfsr_weights(init, ninputs, chain=(1, 0), m=1, n=11, reset_cycles=None):
+	"""
+	Compute the weights loaded by the HW during reset. The weight registers of
+	all networks form a chain that is fed by the LFSR, shifting by one
+	register per clock cycle.
+	
+	@param init: The initial state of the LFSR.
+	
+	@param ninputs: The number of inputs to each network.
+	
+	@param chain: The categories of the networks, in the order of the chain.
+	The male network (trained with the label 1) is first.
+	
+	@param m: The number of integer bits for fixed point.
+	
+	@param n: The number of fractional bits for fixed point.
+	
+	@param reset_cycles: The number of clock cycles of the reset. If None,
+	the 4 * ninputs + 1 cycles of the state machine are used.
+	
+	@return: A dictionary mapping each category to a numpy array containing
+	the raw integers of its weights.
+	"""
+	
+	reset_cycles = 4 * ninputs + 1 if reset_cycles is None else reset_cycles
+	states       = lfsr_states(init, reset_cycles, m + n)
+	
+	# The j-th register of the chain holds the (reset_cycles - j)-th state
+	registers = states[::-1][:len(chain) * ninputs]
+	
+	return {category:registers[i*ninputs:(i+1)*ninputs].copy() for i, category
+		in enumerate(chain)}
+
+###############################################################################
+########## Class Implementations
+###############################################################################
+
+class FixedPointClassifier(object):
+	"""
+	Fast simulator of L{CompetitiveLearningClassifier<lfw_gender.hw_net.
+	CompetitiveLearningClassifier>}.
+	"""
+	
+	def __init__(self, ninputs, m, n, categories, learning_rate=0.001,
+		min_weight=-1, max_weight=1, weights=None, rounding='truncate',
+		seed=None):
+		"""
+		Initializes this competitive learning network.
+		
+		@param ninputs: The number of inputs to the network.
+		
+		@param m: The number of integer bits for fixed point.
+		
+		@param n: The number of fractional bits for fixed point.
+		
+		@param categories: A list of the labels for the categories. Each label
+		should be an integer.
+		
+		@param learning_rate: The learning rate to use.
+		
+		@param min_weight: The minimum weight value.
+		
+		@param max_weight: The maximum weight value.
+		
+		@param weights: A dictionary mapping each category to the raw integers
+		of its initial weights. If None, the weights are initialized randomly,
+		drawing the same numbers as hw_net would.
+		
+		@param rounding: The rounding mode used to encode the parameters and
+		to multiply (see L{fp_round<lfw_gender.q_format.fp_round>}). Only
+		"truncate" is bit-exact with hw_net.
+		
+		@param seed: The seed for the random numbers of stochastic rounding.
+		
+		@raise InvalidRoundingMode: Raised if the rounding mode isn't
+		supported.
+		"""
+		
+		check_rounding(rounding)
+		
+		# Store the params
+		self.ninputs       = ninputs
+		self.m             = m
+		self.n             = n
+		self.categories    = list(categories)
+		self.rounding      = rounding
+		self.rng           = np.random.RandomState(seed)
+		self.learning_rate = fp_encode(learning_rate, m, n, None, rounding,
+			self.rng)
+		self.scale         = fp_encode(1. / (ninputs ** 0.5), m, n, None,
+			rounding, self.rng)
+		self.rows          = {c:i for i, c in enumerate(self.categories)}
+		
+		# Construct the weights
+		if weights is None:
+			weights = {c:fp_encode([random.uniform(min_weight, max_weight) for
+				_ in xrange(ninputs)], m, n, None, rounding, self.rng) for c in
+				self.categories}
+		self.weights = np.array([weights[c] for c in self.categories],
+			dtype=np.int64)
+		
+		# Count the arithmetic operations
+		self.reset_counts()
+	
+	@classmethod
+	def from_hw_net(cls, net):
+		"""
+		Create a simulator with the current weights of a HW net.
+		
+		@param net: The L{CompetitiveLearningClassifier<lfw_gender.hw_net.
+		CompetitiveLearningClassifier>}.
+		
+		@return: The simulator.
+		"""
+		
+		cnet    = net.cnets.values()[0]
+		m, n    = cnet.m, cnet.n
+		weights = {c:fp_from_q([str(w) for w in cnet.weights], m, n) for c,
+			cnet in net.cnets.iteritems()}
+		
+		return cls(len(cnet.weights), m, n, net.cnets.keys(), fp_decode(
+			fp_from_q([str(cnet.learning_rate)], m, n)[0], m, n),
+			weights=weights)
+	
+	def reset_counts(self):
+		"""
+		Reset the counts of the arithmetic operations and their fixed point
+		events.
+		"""
+		
+		self.counts = new_counters()
+	
+	def saturation_rate(self):
+		"""
+		Get the fraction of the arithmetic operations that saturated, since
+		the counts were last reset.
+		
+		@return: The fraction.
+		"""
+		
+		return self.counts['saturations'] / float(max(self.counts['ops'], 1))
+	
+	def step(self, x, y):
+		"""
+		Train the network of a category with a single sample.
+		
+		@param x: A numpy array containing the raw integers of the sample.
+		
+		@param y: The label of the sample.
+		"""
+		
+		m = self.m; n = self.n; c = self.counts
+		w = self.weights[self.rows[y]]
+		w[:] = fp_add(w, fp_mult(self.learning_rate, fp_sub(x, w, m, n, c), m,
+			n, c, self.rounding, self.rng), m, n, c)
+	
+	def train(self, x, y):
+		"""
+		Train the network for a single epoch.
+		
+		@param x: A numpy array containing the raw integers of one sample per
+		row.
+		
+		@param y: The labels for the training data.
+		"""
+		
+		for xi, yi in zip(x, y):
+			self.step(xi, yi)
+	
+	def outputs(self, x):
+		"""
+		Compute the output (the accumulated distance) of every network.
+		
+		@param x: A numpy array containing the raw integers of one sample per
+		row.
+		
+		@return: A numpy array of shape (samples, categories) containing the
+		raw integers of the outputs.
+		"""
+		
+		m = self.m; n = self.n; c = self.counts
+		r = self.rounding
+		d = fp_mult(fp_sub(self.weights[None], x[:, None], m, n, c),
+			self.scale, m, n, c, r, self.rng)
+		
+		# The squares are never negative, so saturating each addition is the
+		# same as saturating the sum
+		return fp_saturate(fp_mult(d, d, m, n, c, r, self.rng).sum(-1), m, n,
+			c)
+	
+	def predict(self, x):
+		"""
+		Classify samples. Ties go to the first category.
+		
+		@param x: A numpy array containing the raw integers of one sample per
+		row.
+		
+		@return: A numpy array containing the predicted categories.
+		"""
+		
+		return np.array(self.categories)[np.argmin(self.outputs(x), 1)]
+	
+	def classify(self, x, y):
+		"""
+		Classify the network.
+		
+		@param x: A numpy array containing the raw integers of one sample per
+		row.
+		
+		@param y: The labels for the classification data.
+		
+		@return: The classification accuracy (1 == 100%).
+		"""
+		
+		return np.mean(self.predict(x) == y)
+	
+	def run(self, train_x, train_y, test_x, test_y, nepochs=1):
+		"""
+		Simulate the entire network.
+		
+		@param train_x: A numpy array containing the raw integers of the
+		training data.
+		
+		@param train_y: The labels for the training data.
+		
+		@param test_x: A numpy array containing the raw integers of the testing
+		data.
+		
+		@param test_y: The labels for the testing data.
+		
+		@param nepochs: The number of training epochs to perform.
+		
+		@return: A tuple containing the training and test accuracies.
+		"""
+		
+		train_accuracy = np.zeros(nepochs); test_accuracy = np.zeros(nepochs)
+		for i in xrange(nepochs):
+			self.train(train_x, train_y)
+			train_accuracy[i] = self.classify(train_x, train_y)
+			test_accuracy[i]  = self.classify(test_x, test_y)
+		
+		return (train_accuracy, test_accuracy)
+
+###############################################################################
+########## Co-Simulation
+###############################################################################
+
+def cosimulate(sim, train, test, hw_train, hw_test, nepochs=30):
+	"""
+	Train the simulator with the HW data and compare its predictions with the
+	HW results after each epoch.
+	
+	@param sim: The L{FixedPointClassifier}, with the initial weights of the
+	HW.
+	
+	@param train: A tuple containing the training data and labels.
+	
+	@param test: A tuple containing the testing data and labels.
+	
+	@param hw_train: A numpy array of shape (epochs, samples) containing the HW
+	predictions for the training data. The rows are the last epochs, e.g. a
+	single row holds the predictions after the final epoch.
+	
+	@param hw_test: The HW predictions for the testing data, in the same
+	format.
+	
+	@param nepochs: The number of training epochs.
+	
+	@return: None if all predictions match, otherwise a dictionary describing
+	the first divergent sample, containing its "epoch" (starting at 1), its
+	"dataset" ("train" or "test"), the index of the "sample", its "label", the
+	"sim" and "hw" predictions, the "outputs" (a list of (category, raw
+	integer, value) tuples with the accumulated distance of every network)
+	and the number of "mismatches" in that epoch and dataset.
+	"""
+	
+	first = nepochs - len(hw_train)
+	for i in xrange(nepochs):
+		sim.train(*train)
+		if i < first:
+			continue
+		
+		for dataset, (x, y), hw in (('train', train, hw_train), ('test', test,
+			hw_test)):
+			outputs   = sim.outputs(x)
+			predicted = np.array(sim.categories)[np.argmin(outputs, 1)]
+			diverged  = np.flatnonzero(predicted[:hw.shape[1]] != hw[i - first])
+			if diverged.size == 0:
+				continue
+			
+			j = diverged[0]
+			return {
+				'epoch'      : i + 1,
+				'dataset'    : dataset,
+				'sample'     : j,
+				'label'      : y[j],
+				'sim'        : predicted[j],
+				'hw'         : hw[i - first, j],
+				'outputs'    : [(c, outputs[j, k], fp_decode(outputs[j, k],
+					sim.m, sim.n)) for k, c in enumerate(sim.categories)],
+				'mismatches' : diverged.size
+			}
+
+def format_divergence(divergence):
+	"""
+	Format the result of L{cosimulate} for printing.
+	
+	@param divergence: The divergence, or None.
+	
+	@return: A string describing the divergence.
+	"""
+	
+	if divergence is None:
+		return 'The simulation matches the HW results.'
+	
+	d     = divergence
+	lines = ['First divergence at epoch {0}, {1} sample {2} (line {3}):'.format(
+		d['epoch'], d['dataset'], d['sample'], d['sample'] + 1),
+		'  Label      : {0}'.format(d['label']),
+		'  Simulation : {0}'.format(d['sim']),
+		'  HW         : {0}'.format(d['hw']),
+		'  Mismatches : {0} in this epoch'.format(d['mismatches'])]
+	for c, raw, value in d['outputs']:
+		lines.append('  Output {0}   : {1} ({2})'.format(c, raw, value))
+	
+	return '\n'.join(lines)
+
+def main(fp_path, train_result_path, test_result_path, init, nepochs=30, m=1,
+	n=11):
+	"""
+	Co-simulate a HW run.
+	
+	@param fp_path: The directory containing the HW train / test files.
+	
+	@param train_result_path: The full path to the HW results for the training
+	data.
+	
+	@param test_result_path: The full path to the HW results for the testing
+	data.
+	
+	@param init: The initial state of the LFSR.
+	
+	@param nepochs: The number of training epochs of the HW run.
+	
+	@param m: The number of integer bits for fixed point.
+	
+	@param n: The number of fractional bits for fixed point.
+	"""
+	
+	train   = load_fixed_point(os.path.join(fp_path, 'train.txt'), m, n)
+	test    = load_fixed_point(os.path.join(fp_path, 'test.txt'), m, n)
+	ninputs = train[0].shape[1]
+	sim     = FixedPointClassifier(ninputs, m, n, (0, 1), weights=lfsr_weights(
+		init, ninputs, m=m, n=n))
+	
+	print format_divergence(cosimulate(sim, train, test, read_results(
+		train_result_path), read_results(test_result_path), nepochs))
+
+###############################################################################
+########## Probes
+###############################################################################
+
+register_probes(FixedPointClassifier, 'step', 'train', 'outputs', 'predict')
+
+if __name__ == '__main__':
+	base_path    = os.path.dirname(os.path.dirname(os.path.dirname(
+		os.getcwd())))
+	fp_path      = os.path.join(base_path, 'data', 'fixed_point')
+	results_path = os.path.join(base_path, 'results', '7x7', 'hw')
+	
+	# The initial state of the LFSR in tb_top.vhd
+	main(fp_path, os.path.join(results_path, 'training', 'train_output_1.txt'),
+		os.path.join(results_path, 'testing', 'test_output_1.txt'),
+		'011111100001')
\ No newline at end of file
@@ -0,0 +1,284 @@
+# memory.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Memory footprint accounting.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Memory footprint accounting.
+
+The size of an object is split into the bytes held by numpy array data and
+the overhead of the Python objects around it (the array headers, lists,
+dictionaries, Q numbers, etc.). Objects are followed recursively and shared
+objects are only counted once.
+
+The peak memory of a call is measured by sampling the resident set size of
+the process during the call, as tracemalloc isn't available for Python 2.
+This includes memory that is not allocated by Python, is only as precise as
+a page, and misses short spikes between two samples.
+
+G{packagetree lfw_gender}
+"""
+
+__docformat__ = 'epytext'
+
+# Native imports
+import os, sys, mmap, threading
+
+# Third party imports
+import numpy as np
+
+###############################################################################
+########## Object Sizes
+###############################################################################
+
+def sizeof(obj, seen=None):
+	"""
+	Compute the size of an object and everything it references.
+	
+	@param obj: The object.
+	
+	@param seen: The ids of the objects that were already counted. These are
+	skipped.
+	
+	@return: A tuple containing the number of bytes of array data and the
+	number of bytes of Python object overhead.
+	"""
+	
+	if seen is None:
+		seen = set()
+	if id(obj) in seen:
+		return 0, 0
+	seen.add(id(obj))
+	
+	# The data of an array is counted once, towards the array that owns it;
+	# memory mapped data is not counted, as it is backed by a file
+	if isinstance(obj, np.ndarray):
+		header = sys.getsizeof(obj) - (obj.nbytes if obj.flags.owndata else 0)
+		base   = obj.base
+		if base is None:
+			return obj.nbytes, header
+		if isinstance(obj, np.memmap) or isinstance(base, mmap.mmap):
+			return 0, header
+		if isinstance(base, np.ndarray):
+			data, overhead = sizeof(base, seen)
+			return data, overhead + header
+		
+		# The data is held by a buffer, e.g. an unpickled string
+		if id(base) in seen:
+			return 0, header
+		seen.add(id(base))
+		return obj.nbytes, header
+	
+	array_bytes  = 0
+	object_bytes = sys.getsizeof(obj)
+	if isinstance(obj, dict):
+		children = [x for item in obj.iteritems() for x in item]
+	elif isinstance(obj, (list, tuple, set, frozenset)):
+		children = obj
+	else:
+		children = []
+		if hasattr(obj, '__dict__'):
+			children.append(obj.__dict__)
+		for attr in getattr(type(obj), '__slots__', ()):
+			if hasattr(obj, attr):
+				children.append(getattr(obj, attr))
+	
+	for child in children:
+		a, o          = sizeof(child, seen)
+		array_bytes  += a
+		object_bytes += o
+	
+	return array_bytes, object_bytes
+
+def memory_report(components):
+	"""
+	Compute the size of each component. Objects shared between components are
+	only counted towards the first one.
+	
+	@param components: A sequence of (name, object) tuples.
+	
+	@return: A list of (name, array bytes, object bytes) tuples.
+	"""
+	
+	seen = set()
+	
+	return [(name,) + sizeof(obj, seen) for name, obj in components]
+
+def classifier_components(net):
+	"""
+	Split a CompetitiveLearningClassifier into its components.
+	
+	@param net: The classifier.
+	
+	@return: A list of (name, object) tuples, with the stacked weights and
+	multipliers of all of the categories, one component per array of every
+	category, followed by the index, timers and latency histograms (if they
+	exist). The weights (and boosts) of the categories are views of the
+	stacked arrays, thus their data is counted towards the stacked arrays.
+	"""
+	
+	components = [('weights', net.weights), ('multipliers', net.multipliers)]
+	for category in sorted(net.cnets):
+		for attr, value in sorted(vars(net.cnets[category]).iteritems()):
+			if isinstance(value, np.ndarray):
+				components.append(('{0}/{1}'.format(category, attr), value))
+	for name in ('index', 'timers', 'latencies'):
+		if getattr(net, name) is not None:
+			components.append((name, getattr(net, name)))
+	
+	return components
+
+def dataset_components(data):
+	"""
+	Split a dataset, as returned by L{get_data<lfw_gender.util.get_data>}, into
+	its components.
+	
+	@param data: The dataset.
+	
+	@return: A list of (name, object) tuples.
+	"""
+	
+	(train_x, train_y), (test_x, test_y) = data
+	
+	return [('train_x', train_x), ('train_y', train_y), ('test_x', test_x),
+		('test_y', test_y)]
+
+def pretty_bytes(nbytes):
+	"""
+	Convert a number of bytes to a human readable string.
+	
+	@param nbytes: The number of bytes.
+	
+	@return: A string containing the size with the most suitable unit.
+	"""
+	
+	for unit in ('B', 'KB', 'MB'):
+		if abs(nbytes) < 1024:
+			return '{0:.1f} {1}'.format(nbytes, unit)
+		nbytes /= 1024.
+	
+	return '{0:.1f} GB'.format(nbytes)
+
+def format_report(report):
+	"""
+	Format a memory report as a table.
+	
+	@param report: The report, as returned by L{memory_report}.
+	
+	@return: A string containing the table, including the totals.
+	"""
+	
+	lines = ['{0:<40} {1:>12} {2:>12} {3:>12}'.format('Component', 'Arrays',
+		'Objects', 'Total')]
+	for name, a, o in report + [('Total', sum(r[1] for r in report),
+		sum(r[2] for r in report))]:
+		lines.append('{0:<40} {1:>12} {2:>12} {3:>12}'.format(name,
+			pretty_bytes(a), pretty_bytes(o), pretty_bytes(a + o)))
+	
+	return '\n'.join(lines)
+
+###############################################################################
+########## Peak Memory
+###############################################################################
+
+def rss():
+	"""
+	Get the resident set size of this process.
+	
+	@return: The number of bytes, or None if the platform doesn't report it.
+	"""
+	
+	try:
+		with open('/proc/self/statm', 'rb') as f:
+			return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+	except (IOError, OSError, ValueError):
+		return None
+
+class PeakMemory(object):
+	"""
+	Context manager that measures the peak memory allocated within the block,
+	relative to the start of the block, by sampling the resident set size in
+	a background thread.
+	"""
+	
+	def __init__(self, interval=0.001, enabled=True):
+		"""
+		Initialize this class. The instance may be used for multiple blocks,
+		in which case the largest peak is kept.
+		
+		@param interval: The number of seconds between samples of the resident
+		set size.
+		
+		@param enabled: If False, nothing is measured and the peak remains
+		None.
+		"""
+		
+		self.interval = interval
+		self.enabled  = enabled
+		self.peak     = None
+		
+		# The change of the resident set size over the last block
+		self.change = None
+	
+	def _sample(self):
+		"""
+		Sample the resident set size until the block exits.
+		"""
+		
+		while not self.done.wait(self.interval):
+			self.max_rss = max(self.max_rss, rss())
+	
+	def _update(self, peak):
+		"""
+		Keep the largest peak.
+		
+		@param peak: The peak of the block that just exited.
+		"""
+		
+		self.peak = peak if self.peak is None else max(self.peak, peak)
+	
+	def __enter__(self):
+		if self.enabled:
+			self.start = self.max_rss = rss()
+			if self.start is not None:
+				self.done   = threading.Event()
+				self.thread = threading.Thread(target=self._sample)
+				self.thread.daemon = True
+				self.thread.start()
+		
+		return self
+	
+	def __exit__(self, *exc_info):
+		if self.enabled and self.start is not None:
+			self.done.set()
+			self.thread.join()
+			end         = rss()
+			self.change = end - self.start
+			self._update(max(self.max_rss, end) - self.start)
+
+def measure_peak(func, *args, **kargs):
+	"""
+	Measure the peak memory of a call, e.g. of the preprocessing pipeline.
+	
+	@param func: The function to call.
+	
+	@param args: The positional arguments for the function.
+	
+	@param kargs: The keyword arguments for the function.
+	
+	@return: A tuple containing the result of the call and the peak number of
+	bytes allocated during the call. The peak is None if it couldn't be
+	measured.
+	"""
+	
+	with PeakMemory() as peak:
+		result = func(*args, **kargs)
+	
+	return result, peak.peak
\ No newline at end of file
@@ -0,0 +1,182 @@
+# metrics.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Structured export of the per epoch metrics.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Structured export of the per epoch metrics.
+
+A metrics sink receives one record (a dictionary) per epoch from the "run"
+method of a classifier. Every record contains the "run_id" of the run that
+produced it, such that the records of many runs may be streamed into a single
+file and aggregated later.
+
+G{packagetree lfw_gender}
+"""
+
+__docformat__ = 'epytext'
+
+# Native imports
+import os, csv, json, uuid
+from abc import ABCMeta, abstractmethod
+
+###############################################################################
+########## Functions
+###############################################################################
+
+def new_run_id():
+	"""
+	Generate a unique identifier for a run.
+	
+	@return: A string containing the identifier.
+	"""
+	
+	return uuid.uuid4().hex
+
+###############################################################################
+########## Class Templates
+###############################################################################
+
+class BaseMetricsSink(object):
+	"""
+	Base class for a metrics sink.
+	"""
+	__metaclass__ = ABCMeta
+	
+	@abstractmethod
+	def write(self, record):
+		"""
+		Write a single record.
+		
+		@param record: A dictionary containing the metrics.
+		"""
+	
+	def close(self):
+		"""
+		Release any resources held by the sink.
+		"""
+	
+	def __enter__(self):
+		return self
+	
+	def __exit__(self, *exc_info):
+		self.close()
+
+###############################################################################
+########## Class Implementations
+###############################################################################
+
+class MemorySink(BaseMetricsSink):
+	"""
+	Sink that keeps all of the records in a list.
+	"""
+	
+	def __init__(self):
+		"""
+		Initialize this sink.
+		"""
+		
+		self.records = []
+	
+	def write(self, record):
+		"""
+		Write a single record.
+		
+		@param record: A dictionary containing the metrics.
+		"""
+		
+		self.records.append(record)
+
+class JSONLinesSink(BaseMetricsSink):
+	"""
+	Sink that appends each record as a line of JSON to a file.
+	"""
+	
+	def __init__(self, out_path):
+		"""
+		Initialize this sink.
+		
+		@param out_path: The full path to the file to append to.
+		"""
+		
+		self.f = open(out_path, 'ab')
+	
+	def write(self, record):
+		"""
+		Write a single record.
+		
+		@param record: A dictionary containing the metrics.
+		"""
+		
+		self.f.write(json.dumps(record, sort_keys=True) + '\n')
+		self.f.flush()
+	
+	def close(self):
+		"""
+		Close the file.
+		"""
+		
+		self.f.close()
+
+class CSVSink(BaseMetricsSink):
+	"""
+	Sink that appends each record as a row of a CSV file. Values that are not
+	scalars (e.g. the winner distribution) are stored as JSON.
+	"""
+	
+	# The default columns, covering the epochs of both the floating point and
+	# the fixed point ("hw_epoch_time" and the fixed point counters) networks
+	FIELDS = ('run_id', 'epoch', 'nepochs', 'train_accuracy', 'test_accuracy',
+		'train_time', 'train_eval_time', 'test_time', 'train_samples_per_sec',
+		'test_samples_per_sec', 'peak_memory', 'weight_change', 'boost_mean',
+		'boost_min', 'boost_max', 'winners', 'hw_epoch_time', 'overflows',
+		'underflows', 'saturations', 'zero_flushes')
+	
+	def __init__(self, out_path, fields=FIELDS):
+		"""
+		Initialize this sink. The header is only written if the file is new.
+		
+		@param out_path: The full path to the file to append to.
+		
+		@param fields: The names of the columns. Any other metrics are
+		ignored and any missing metrics are left empty.
+		"""
+		
+		new         = not os.path.exists(out_path) or \
+			os.path.getsize(out_path) == 0
+		self.fields = fields
+		self.f      = open(out_path, 'ab')
+		self.writer = csv.writer(self.f)
+		if new:
+			self.writer.writerow(fields)
+			self.f.flush()
+	
+	def write(self, record):
+		"""
+		Write a single record.
+		
+		@param record: A dictionary containing the metrics.
+		"""
+		
+		row = []
+		for field in self.fields:
+			value = record.get(field)
+			if isinstance(value, (dict, list, tuple)):
+				value = json.dumps(value, sort_keys=True)
+			row.append('' if value is None else value)
+		self.writer.writerow(row)
+		self.f.flush()
+	
+	def close(self):
+		"""
+		Close the file.
+		"""
+		
+		self.f.close()
\ No newline at end of file
@@ -19,14 +19,51 @@ G{packagetree lfw_gender}
 __docformat__ = 'epytext'
 
 # Native imports
-from abc       import ABCMeta, abstractmethod
-from itertools import izip
+import os, json
+from abc             import ABCMeta, abstractmethod
+from itertools       import izip
+from collections     import OrderedDict
+from multiprocessing import Pool
 
 # Third party imports
 import numpy as np
 
 # Program imports
-from lfw_gender.timers import MultiTimer, pretty_time
+from lfw_gender.timers            import MultiTimer, LatencyHistogram, \
+	log_histograms, pretty_time, clock, step_clock
+from lfw_gender.cluster_index     import ClusterIndex, squared_distances
+from lfw_gender.metrics           import new_run_id
+from lfw_gender.hooks             import register_probes
+from lfw_gender.memory            import PeakMemory, pretty_bytes
+from lfw_gender.exception_handler import BaseException, wrap_error
+from lfw_gender.projection        import load_projection
+
+# The version of the saved model format
+#   - 1: The networks.
+#   - 2: Adds the optional projection of the inputs.
+MODEL_VERSION = 2
+
+###############################################################################
+########## Exception Handling
+###############################################################################
+
+class InvalidModelVersion(BaseException):
+	"""
+	Exception if a saved model was created with an unsupported format.
+	"""
+	
+	def __init__(self, path, version):
+		"""
+		Initialize this class.
+		
+		@param path: The full path to the saved model.
+		
+		@param version: The version of the saved model.
+		"""
+		
+		self.msg = wrap_error('The model at "{0}" has a format version of {1}.'
+			' Only versions 1 to {2} are supported. Resave the model with this'
+			' version of the package.'.format(path, version, MODEL_VERSION))
 
 ###############################################################################
 ########## Class Templates
@@ -52,7 +89,8 @@ class BaseCompetitiveLearning(object):
 		@param x: The input data to compute for this step.
 		"""
 	
-	def initialize_weights(self, shape, min_weight=-1, max_weight=1):
+	def initialize_weights(self, shape, min_weight=-1, max_weight=1,
+		dtype='float64'):
 		"""
 		Initialize the weights of the network. Initialization is done randomly.
 		
@@ -62,9 +100,12 @@ class BaseCompetitiveLearning(object):
 		@param min_weight: The minimum weight value.
 		
 		@param max_weight: The maximum weight value.
+		
+		@param dtype: The floating point type of the weights.
 		"""
 		
-		self.weights = np.random.uniform(min_weight, max_weight, shape)
+		self.weights = np.random.uniform(min_weight, max_weight, shape).astype(
+			dtype)
 	
 	def enable_learning(self):
 		"""
@@ -90,7 +131,7 @@ class SimpleCompetitiveLearning(BaseCompetitiveLearning):
 	"""
 	
 	def __init__(self, ninputs, learning_rate=0.001, min_weight=-1,
-		max_weight=1):
+		max_weight=1, dtype='float64'):
 		"""
 		Initializes this competitive learning network.
 		
@@ -101,6 +142,9 @@ class SimpleCompetitiveLearning(BaseCompetitiveLearning):
 		@param min_weight: The minimum weight value.
 		
 		@param max_weight: The maximum weight value.
+		
+		@param dtype: The floating point type of the weights. The inputs should
+		be of the same type, else every step converts them.
 		"""
 		
 		# Store the params
@@ -110,25 +154,55 @@ class SimpleCompetitiveLearning(BaseCompetitiveLearning):
 		self.enable_learning()
 		
 		# Construct the weights
-		self.initialize_weights(ninputs, min_weight, max_weight)
+		self.initialize_weights(ninputs, min_weight, max_weight, dtype)
 		
 		# Construct the scalar output
-		self.soutputs = np.zeros(1)
+		#   - The 0-d view is the output buffer of the dot product.
+		self.soutputs = np.zeros(1, dtype)
+		self._soutput = self.soutputs.reshape(())
+		
+		# Construct the scratch buffers, such that a step never allocates
+		#   - The scale is constant for a given number of inputs.
+		#   - The difference buffer holds (w - x), then the weight update.
+		#   - The scaled buffer holds the scaled difference.
+		self.scale   = 1 / (ninputs ** 0.5)
+		self._diff   = np.empty(ninputs, dtype)
+		self._scaled = np.empty(ninputs, dtype)
 	
 	def step(self, x):
 		"""
-		Compute a single step of the network.
+		Compute a single step of the network. All of the computations are
+		performed in place, using the preallocated scratch buffers.
 		
 		@param x: The input data to compute for this step.
 		"""
 		
 		# Calculate the outputs
-		scale            = 1 / (len(self.weights) ** 0.5)
-		self.soutputs[0] = np.sum(((self.weights - x) * scale) ** 2)
+		diff = self._diff; scaled = self._scaled
+		np.subtract(self.weights, x, out=diff)
+		np.multiply(diff, self.scale, out=scaled)
+		np.dot(scaled, scaled, out=self._soutput)
 		
 		# Train the network
+		#   - w += lr * (x - w) is computed as w -= lr * (w - x)
 		if self.learning:
-			self.weights += self.learning_rate * (x - self.weights)
+			np.multiply(diff, self.learning_rate, out=diff)
+			np.subtract(self.weights, diff, out=self.weights)
+	
+	def distance(self, x):
+		"""
+		Compute the output of the network, without modifying its state.
+		
+		@param x: The input data.
+		
+		@return: The output of the cluster.
+		"""
+		
+		scaled = self._scaled
+		np.subtract(self.weights, x, out=scaled)
+		np.multiply(scaled, self.scale, out=scaled)
+		
+		return np.dot(scaled, scaled)
 
 class CompetitiveLearning(BaseCompetitiveLearning):
 	"""
@@ -138,7 +212,7 @@ class CompetitiveLearning(BaseCompetitiveLearning):
 	
 	def __init__(self, ninputs, nclusters, learning_rate=0.001, boost_inc=0.1,
 		boost_dec=0.01, duty_cycle=50, min_duty_cycle=5, min_weight=-1,
-		max_weight=1):
+		max_weight=1, dtype='float64', rate_decay=0.):
 		"""
 		Initializes this competitive learning network.
 		
@@ -163,6 +237,14 @@ class CompetitiveLearning(BaseCompetitiveLearning):
 		@param min_weight: The minimum weight value.
 		
 		@param max_weight: The maximum weight value.
+		
+		@param dtype: The floating point type of the weights. The inputs should
+		be of the same type, else every step converts them.
+		
+		@param rate_decay: The per cluster decay of the learning rate. Each
+		cluster learns at a rate of learning_rate / (1 + rate_decay * wins),
+		where wins is the number of training steps it has won. If 0, every
+		cluster uses the learning rate.
 		"""
 		
 		# Store the params
@@ -171,12 +253,14 @@ class CompetitiveLearning(BaseCompetitiveLearning):
 		self.boost_dec      = boost_dec
 		self.duty_cycle     = duty_cycle
 		self.min_duty_cycle = min_duty_cycle
+		self.rate_decay     = rate_decay
 		
 		# Enable learning
 		self.enable_learning()
 		
 		# Construct the weights
-		self.initialize_weights((ninputs, nclusters), min_weight, max_weight)
+		self.initialize_weights((ninputs, nclusters), min_weight, max_weight,
+			dtype)
 		
 		# Construct the boost values
 		self.boost = np.ones(nclusters)
@@ -193,49 +277,83 @@ class CompetitiveLearning(BaseCompetitiveLearning):
 		#   - Each item represents a single cluster.
 		#   - Each cluster only maintains the current output
 		self.soutputs = np.zeros(nclusters)
+		
+		# Construct the win counts
+		#   - Each item is the number of training steps a cluster has won.
+		self.wins = np.zeros(nclusters, dtype='int64')
 	
 	def _update_boost(self):
 		"""
-		Update the boost values.
+		Update the boost values, for all of the clusters at once.
 		"""
 		
-		for i, active in enumerate(self.boutputs):
-			if int(np.sum(active)) >= self.min_duty_cycle:
-				self.boost[i] += self.boost_inc
-			else:
-				self.boost[i] = max(self.boost[i] - self.boost_dec, 0)
+		active = np.sum(self.boutputs, 1) >= self.min_duty_cycle
+		boost  = self.boost
+		boost[active]  += self.boost_inc
+		boost[~active]  = np.maximum(boost[~active] - self.boost_dec, 0)
+	
+	def cluster_rates(self):
+		"""
+		Get the current learning rate of every cluster.
+		
+		@return: A numpy array containing the learning rate of each cluster.
+		"""
+		
+		return self.learning_rate / (1. + self.rate_decay * self.wins)
 	
 	def step(self, x):
 		"""
-		Compute a single step of the network.
+		Compute a single step of the network. The outputs of all of the
+		clusters are computed at once, and only the winning cluster is
+		updated.
 		
 		@param x: The input data to compute for this step.
 		"""
 		
-		# Shift outputs
-		self.boutputs = np.roll(self.boutputs, 1, 1)
+		# Shift outputs, in place
+		boutputs = self.boutputs
+		boutputs[:, 1:] = boutputs[:, :-1]
 		
 		# Calculate the outputs
-		for i, weights in enumerate(self.weights.T):
-			self.boutputs[i][0] = self.boost[i] * np.sum((weights - x) ** 2)
-		
-		# Get the scalar outputs
-		self.soutputs = np.copy(self.boutputs.T[0])
+		diff = self.weights - x[:, np.newaxis]
+		np.multiply(self.boost, np.einsum('ij,ij->j', diff, diff),
+			out=self.soutputs)
 		
 		# Set a specific cluster to be the winner
-		min_ix                   = np.argmin(self.boutputs.T[0])
-		self.boutputs.T[0]       = 0
-		self.boutputs[min_ix][0] = 1
+		min_ix              = np.argmin(self.soutputs)
+		boutputs[:, 0]      = 0
+		boutputs[min_ix, 0] = 1
 		
 		# Train the network
 		if self.learning:
+			# Get the rate of the winner, before counting its win
+			rate = self.learning_rate if not self.rate_decay else \
+				self.learning_rate / (1. + self.rate_decay *
+				self.wins[min_ix])
+			
+			# Count the win
+			self.wins[min_ix] += 1
+			
 			# Update the boosts
 			self._update_boost()
 			
-			# Update the weights
-			for i, weights in enumerate(self.weights.T):
-				self.weights.T[i] += self.learning_rate * self.boutputs[i][0] \
-					* (x - weights)
+			# Update the weights of the winner
+			weights  = self.weights[:, min_ix]
+			weights += rate * (x - weights)
+	
+	def distance(self, x):
+		"""
+		Compute the output of the winning cluster, without modifying the state
+		of the network (unlike L{step}, the activation history isn't shifted).
+		
+		@param x: The input data.
+		
+		@return: The smallest boosted output across the clusters.
+		"""
+		
+		diff = self.weights - x[:, np.newaxis]
+		
+		return np.min(self.boost * np.einsum('ij,ij->j', diff, diff))
 
 class CompetitiveLearningClassifier(object):
 	"""
@@ -245,7 +363,8 @@ class CompetitiveLearningClassifier(object):
 	
 	def __init__(self, ninputs, nclusters, categories, learning_rate=0.001,
 		boost_inc=0.1, boost_dec=0.01, duty_cycle=50, min_duty_cycle=5,
-		min_weight=-1, max_weight=1):
+		min_weight=-1, max_weight=1, dtype='float64', rate_decay=0.,
+		projection=None):
 		"""
 		Initializes this competitive learning network.
 		
@@ -274,30 +393,124 @@ class CompetitiveLearningClassifier(object):
 		@param min_weight: The minimum weight value.
 		
 		@param max_weight: The maximum weight value.
+		
+		@param dtype: The floating point type of the weights, e.g. "float32"
+		to halve the memory. The data should be of the same type, else it is
+		converted at every step.
+		
+		@param rate_decay: The per cluster decay of the learning rate, based on
+		the number of times each cluster has won. Refer to
+		L{CompetitiveLearning} for more details. This is ignored if only 1
+		cluster is being used.
+		
+		@param projection: A fitted L{BaseProjection<lfw_gender.projection.
+		BaseProjection>} mapping the raw samples to the inputs of the nets, in
+		which case "ninputs" is the number of components. The data for
+		training and classification must already be projected (see
+		L{project_data<lfw_gender.projection.project_data>}), while raw
+		samples are projected by L{project}. The projection is saved along
+		with the network.
 		"""
 		
 		# Store the params
+		self.ninputs        = ninputs
 		self.nclusters      = nclusters
+		self.categories     = list(categories)
 		self.learning_rate  = learning_rate
 		self.boost_inc      = boost_inc
 		self.boost_dec      = boost_dec
 		self.duty_cycle     = duty_cycle
 		self.min_duty_cycle = min_duty_cycle
+		self.min_weight     = min_weight
+		self.max_weight     = max_weight
+		self.dtype          = np.dtype(dtype)
+		self.rate_decay     = rate_decay
+		self.projection     = projection
 		
 		# Create the competitive learning networks
 		if nclusters == 1:
 			self.cnets = {category:SimpleCompetitiveLearning(ninputs,
-				learning_rate, min_weight, max_weight)
+				learning_rate, min_weight, max_weight, dtype)
 				for category in categories}
 		else:
 			self.cnets = {category:CompetitiveLearning(ninputs, nclusters,
 				learning_rate, boost_inc, boost_dec, duty_cycle,
-				min_duty_cycle, min_weight, max_weight)
+				min_duty_cycle, min_weight, max_weight, dtype, rate_decay)
 				for category in categories}
+		self._stack()
+		
+		# The optional nearest cluster index, built on demand
+		self.index = None
+		
+		# If True, every training step is timed as a section
+		self.time_steps = False
+		
+		# The per sample latency histograms, if enabled
+		self.latencies = None
+		
+		# The index of the best epoch of the last run, if it used a patience
+		self.best_epoch = None
 		
 		# Initialize a timing unit
 		self.timers = MultiTimer()
 	
+	def _stack(self, weights=None, boost=None):
+		"""
+		Store the clusters of all of the nets in single contiguous arrays, in
+		the order of "cnets", and replace the arrays of each net with views of
+		them. The nets keep training in place, so the stacked arrays are
+		always current:
+			- "weights" holds the weights, with one row per cluster.
+			- "multipliers" holds the multiplier applied to the distance of
+			each cluster, i.e. the boost (or the squared scale, if the nets
+			have a single cluster).
+			- "cluster_categories" holds the category of each cluster.
+			- "offsets" holds the index of the first cluster of each net.
+		
+		@param weights: The stacked weights to use, e.g. as loaded by L{load}.
+		If None, the current weights of the nets are copied.
+		
+		@param boost: The stacked boosts to use. If None, the current boosts
+		of the nets are copied. This is ignored if the nets have a single
+		cluster.
+		"""
+		
+		categories = list(self.cnets); cnets = self.cnets.values()
+		n          = self.nclusters
+		
+		if weights is None:
+			weights = np.ascontiguousarray(np.vstack([cnet.weights[
+				np.newaxis] if n == 1 else cnet.weights.T for cnet in cnets]))
+		if n == 1:
+			multipliers = np.array([cnet.scale ** 2 for cnet in cnets])
+		elif boost is None:
+			multipliers = np.concatenate([cnet.boost for cnet in cnets])
+		else:
+			multipliers = boost
+		
+		for i, cnet in enumerate(cnets):
+			if n == 1:
+				cnet.weights = weights[i]
+			else:
+				cnet.weights = weights[i * n:(i + 1) * n].T
+				cnet.boost   = multipliers[i * n:(i + 1) * n]
+		
+		self.weights            = weights
+		self.multipliers        = multipliers
+		self.cluster_categories = np.repeat(categories, n)
+		self.offsets            = np.arange(0, len(weights), n)
+	
+	def set_learning_rate(self, learning_rate):
+		"""
+		Change the learning rate of all of the nets.
+		
+		@param learning_rate: The new learning rate.
+		"""
+		
+		self.learning_rate = learning_rate
+		for cnet in self.cnets.values():
+			cnet.learning_rate = learning_rate
+	
 	def enable_learning(self):
 		"""
 		Enable learning for all of the nets.
@@ -314,21 +527,404 @@ class CompetitiveLearningClassifier(object):
 		for cnet in self.cnets.values():
 			cnet.disable_learning()
 	
-	def train(self, x, y):
+	def enable_latency_tracking(self):
+		"""
+		Enable the recording of the per sample latencies. Latencies are kept
+		in fixed memory histograms, which are reset by this call. The
+		histograms are named:
+			- "train" and "classify", for the latency of each sample.
+			- "train/<category>" and "classify/<category>", for the latency of
+			the net of each category.
+			- "predict", for the latency of each call to L{predict}.
+		"""
+		
+		self.latencies = {'predict':LatencyHistogram()}
+		for phase in ('train', 'classify'):
+			self.latencies[phase] = LatencyHistogram()
+			for category in self.cnets:
+				self.latencies['{0}/{1}'.format(phase, category)] = \
+					LatencyHistogram()
+	
+	def disable_latency_tracking(self):
+		"""
+		Disable the recording of the per sample latencies.
+		"""
+		
+		self.latencies = None
+	
+	def _category_latencies(self, phase):
+		"""
+		Get the latency histogram of each category for a phase.
+		
+		@param phase: The phase, i.e. "train" or "classify".
+		
+		@return: A dictionary mapping each category to its histogram.
+		"""
+		
+		return {category:self.latencies['{0}/{1}'.format(phase, category)]
+			for category in self.cnets}
+	
+	def latency_report(self, percentiles=(50, 90, 99)):
+		"""
+		Get a human-readable summary of the latency histograms.
+		
+		@param percentiles: The percentiles to report.
+		
+		@return: A string containing one line per histogram.
+		"""
+		
+		header = ['{0:<16}{1:>9}'.format('Latency [us]', 'Count')]
+		header.extend('{0:>9}'.format('p{0}'.format(p)) for p in percentiles)
+		lines  = [''.join(header) + '{0:>9}'.format('Max')]
+		for name in sorted(self.latencies):
+			h = self.latencies[name]
+			lines.append('{0:<16}{1:>9}'.format(name, h.count) + ''.join(
+				'{0:>9.1f}'.format(h.percentile(p) * 1e6) for p in percentiles)
+				+ '{0:>9.1f}'.format(h.max * 1e6))
+		
+		return '\n'.join(lines)
+	
+	def log_latencies(self, out_path, header=True):
+		"""
+		Creates a log CSV file for the latency histograms. This is the
+		companion of L{MultiTimer.log_timers}.
+		
+		@param out_path: The full path to the CSV to write to.
+		
+		@param header: Flag denoting whether the header should be printed or
+		not.
+		"""
+		
+		log_histograms(self.latencies, out_path, header)
+	
+	def train(self, x, y, evaluate=False, nworkers=1):
 		"""
 		Train the network for a single step.
 		
 		@param x: The training data.
 		
 		@param y: The labels for the training data.
+		
+		@param evaluate: If True, each sample is also classified just before
+		it is trained on, such that the training accuracy is obtained without
+		a second pass over the data. The net of the sample's own category
+		provides its output from the training step; the other nets are only
+		evaluated, leaving their state untouched. The per step latencies and
+		timings are not recorded in this mode.
+		
+		@param nworkers: The number of processes to train with. If more than
+		1, the samples are partitioned by their label and the nets of the
+		categories are divided among forked worker processes, which then
+		send back the state of their nets. The nets are independent and each
+		one still sees its samples in order, so the weights are the same as
+		when training serially. Forking the workers and copying back the
+		nets costs a fixed amount per call, so this only helps when each
+		epoch is long and there are at least as many categories as cores.
+		This is ignored when evaluating or recording the per step latencies
+		or timings.
+		
+		@return: If evaluating, the classification accuracy (1 == 100%) of the
+		samples prior to training on them, else None.
 		"""
 		
 		# Enable learning for all of the networks
 		self.enable_learning()
 		
+		# The weights are about to change, so any index is now stale
+		self.index = None
+		
 		# Train the networks
-		for xi, yi in izip(x, y):
-			self.cnets[yi].step(xi)
+		if evaluate:
+			accuracy = 0.; count = 0
+			cnets    = self.cnets.items()
+			for xi, yi in izip(x, y):
+				self.cnets[yi].step(xi)
+				min_dist = np.inf; found_class = None
+				for category, cnet in cnets:
+					if category == yi:
+						cur_min = np.min(cnet.soutputs)
+					else:
+						cur_min = cnet.distance(xi)
+					if cur_min < min_dist:
+						min_dist = cur_min; found_class = category
+				if found_class == yi: accuracy += 1
+				count += 1
+			
+			return accuracy / count
+		elif self.latencies is not None:
+			# The latencies are also recorded as the step sections if requested
+			total        = self.latencies['train']
+			per_category = self._category_latencies('train')
+			step         = self.timers.subsection('step') if self.time_steps \
+				else None
+			for xi, yi in izip(x, y):
+				start = step_clock()
+				self.cnets[yi].step(xi)
+				elapsed = step_clock() - start
+				total.record(elapsed); per_category[yi].record(elapsed)
+				if step is not None: step.record(elapsed)
+		elif self.time_steps:
+			# The section is recorded directly, as entering it costs as much
+			# as a small step
+			step = self.timers.subsection('step')
+			for xi, yi in izip(x, y):
+				start = step_clock()
+				self.cnets[yi].step(xi)
+				step.record(step_clock() - start)
+		elif nworkers > 1:
+			# The workers inherit the jobs when they are forked
+			global _train_jobs
+			samples = OrderedDict((category, []) for category in self.cnets)
+			for xi, yi in izip(x, y):
+				samples[yi].append(xi)
+			_train_jobs = [(self.cnets[c], s) for c, s in samples.iteritems()
+				if s]
+			nworkers    = min(nworkers, len(_train_jobs))
+			pool        = Pool(nworkers)
+			try:
+				results = [pool.apply_async(_train_worker, (j, nworkers))
+					for j in xrange(nworkers)]
+				for j, result in enumerate(results):
+					for (cnet, _), state in izip(_train_jobs[j::nworkers],
+						result.get()):
+						for name, value in state.iteritems():
+							np.copyto(getattr(cnet, name), value)
+			finally:
+				_train_jobs = None
+				pool.terminate()
+				pool.join()
+		else:
+			for xi, yi in izip(x, y):
+				self.cnets[yi].step(xi)
+	
+	def _distances(self, x):
+		"""
+		Compute the output of every cluster of every net for every sample.
+		
+		@param x: A 2D numpy array, where each row is a sample.
+		
+		@return: A numpy array of shape (samples, clusters) containing the
+		outputs, with the clusters in the order of the stacked weights.
+		"""
+		
+		d  = squared_distances(x, self.weights)
+		d *= self.multipliers
+		
+		return d
+	
+	def _nearest_categories(self, d):
+		"""
+		Find the category of the net with the smallest output for every
+		sample. The outputs are reduced to the minimum of each net (a
+		segmented minimum over the clusters) before taking the argmin, so ties
+		go to the first net, as when classifying one net at a time.
+		
+		@param d: The outputs, as returned by L{_distances}.
+		
+		@return: A numpy array containing the predicted categories.
+		"""
+		
+		return self.cluster_categories[self.offsets][np.argmin(
+			np.minimum.reduceat(d, self.offsets, 1), 1)]
+	
+	def _record_winners(self, d):
+		"""
+		Shift the activation histories of the nets, as classifying the samples
+		one at a time with the "step" of each net would.
+		
+		@param d: The outputs, as returned by L{_distances}.
+		"""
+		
+		k       = min(len(d), self.duty_cycle)
+		winners = np.argmin(d[len(d) - k:].reshape(k, -1, self.nclusters),
+			2)[::-1]
+		for i, cnet in enumerate(self.cnets.values()):
+			boutputs = cnet.boutputs
+			boutputs[:, k:]                      = boutputs[:, :-k or None]
+			boutputs[:, :k]                      = 0
+			boutputs[winners[:, i], np.arange(k)] = 1
+	
+	def _replay_history(self, x):
+		"""
+		Shift the activation histories as L{classify} would, without computing
+		the accuracy. The histories only keep the last "duty_cycle" samples,
+		so only those are evaluated.
+		
+		@param x: The samples.
+		"""
+		
+		if self.nclusters != 1:
+			x = x[max(len(x) - self.duty_cycle, 0):]
+			self._record_winners(self._distances(np.atleast_2d(np.asarray(x,
+				dtype=self.dtype))))
+	
+	def build_index(self, ncells=None, nprobe=1, niters=10, seed=None):
+		"""
+		Build an approximate nearest cluster index over the current weights.
+		The index is used by L{predict} until the network is trained again.
+		
+		@param ncells: The number of cells to partition the clusters into. If
+		None, the square root of the total number of clusters is used.
+		
+		@param nprobe: The number of cells to search for each sample. Larger
+		values increase the recall at the cost of speed.
+		
+		@param niters: The number of k-means iterations used to build the
+		cells.
+		
+		@param seed: The seed for the k-means initialization.
+		"""
+		
+		self.index = ClusterIndex(self.weights, ncells, nprobe,
+			niters, seed)
+	
+	def project(self, x):
+		"""
+		Convert raw samples into inputs for the nets, applying the projection
+		(if any) to all of the samples at once.
+		
+		@param x: The raw samples, where each row is a sample.
+		
+		@return: A 2D numpy array containing the inputs.
+		"""
+		
+		if self.projection is None:
+			return np.atleast_2d(np.asarray(x, dtype=self.dtype))
+		
+		return self.projection.transform(x, self.dtype)
+	
+	def predict(self, x, nprobe=None, exact=False):
+		"""
+		Predict the category of every sample, in a single batch. This does not
+		modify the state of any of the nets.
+		
+		@param x: The data to predict, where each row is a sample.
+		
+		@param nprobe: The number of index cells to search. If None, the
+		default of the index is used.
+		
+		@param exact: If True, an exhaustive search is performed even if an
+		index exists.
+		
+		@return: A numpy array containing the predicted categories.
+		"""
+		
+		start = clock()
+		x     = np.atleast_2d(np.asarray(x, dtype=self.dtype))
+		
+		if self.index is None or exact:
+			y = self._nearest_categories(self._distances(x))
+		else:
+			y = self.cluster_categories[self.index.search(x, self.multipliers,
+				nprobe)[0]]
+		
+		if self.latencies is not None:
+			self.latencies['predict'].record(clock() - start)
+		
+		return y
+	
+	def save(self, path):
+		"""
+		Save the network. The network is saved as a directory containing a
+		manifest, with the format version and the parameters, along with one
+		numpy file per array. The weights of all of the categories are stored
+		in a single array, with one row per cluster, such that they may be
+		memory mapped. The projection, if any, is saved in the same directory.
+		
+		@param path: The full path to the directory to save the network in. It
+		will be created if it does not exist.
+		"""
+		
+		# Make the directory
+		try:
+			os.makedirs(path)
+		except OSError:
+			pass
+		
+		# Save the arrays
+		categories = list(self.cnets)
+		np.save(os.path.join(path, 'weights.npy'), self.weights)
+		if self.nclusters != 1:
+			np.save(os.path.join(path, 'boost.npy'), self.multipliers)
+			np.save(os.path.join(path, 'boutputs.npy'), np.concatenate(
+				[self.cnets[c].boutputs for c in categories]))
+			np.save(os.path.join(path, 'wins.npy'), np.concatenate(
+				[self.cnets[c].wins for c in categories]))
+		if self.projection is not None:
+			self.projection.save(path)
+		
+		# Save the manifest
+		manifest = {
+			'version'        : MODEL_VERSION,
+			'categories'     : [int(c) for c in categories],
+			'ninputs'        : self.ninputs,
+			'nclusters'      : self.nclusters,
+			'learning_rate'  : self.learning_rate,
+			'boost_inc'      : self.boost_inc,
+			'boost_dec'      : self.boost_dec,
+			'duty_cycle'     : self.duty_cycle,
+			'min_duty_cycle' : self.min_duty_cycle,
+			'min_weight'     : self.min_weight,
+			'max_weight'     : self.max_weight,
+			'dtype'          : self.dtype.name,
+			'rate_decay'     : self.rate_decay,
+			'projection'     : self.projection is not None
+		}
+		with open(os.path.join(path, 'manifest.json'), 'wb') as f:
+			json.dump(manifest, f, indent=1, sort_keys=True)
+	
+	@classmethod
+	def load(cls, path, mmap=False):
+		"""
+		Load a network that was saved with L{save}.
+		
+		@param path: The full path to the directory containing the network.
+		
+		@param mmap: If True, the weights (and the projection) are memory
+		mapped as read-only, such that every process loading the network
+		shares a single copy. The network can then be used for classification,
+		but not training.
+		
+		@return: The loaded network.
+		
+		@raise InvalidModelVersion: Raised if the format is unsupported.
+		"""
+		
+		# Get the manifest; older formats lack the newer keys
+		with open(os.path.join(path, 'manifest.json'), 'rb') as f:
+			manifest = json.load(f)
+		if not 1 <= manifest['version'] <= MODEL_VERSION:
+			raise InvalidModelVersion(path, manifest['version'])
+		categories = manifest['categories']
+		
+		# Create the network
+		net = cls(manifest['ninputs'], manifest['nclusters'], categories,
+			manifest['learning_rate'], manifest['boost_inc'],
+			manifest['boost_dec'], manifest['duty_cycle'],
+			manifest['min_duty_cycle'], manifest['min_weight'],
+			manifest['max_weight'], manifest.get('dtype', 'float64'),
+			manifest.get('rate_decay', 0.))
+		if manifest.get('projection', False):
+			net.projection = load_projection(path, mmap)
+		
+		# Restore the weights; each net gets a view of the shared array
+		weights = np.load(os.path.join(path, 'weights.npy'),
+			mmap_mode='r' if mmap else None)
+		if net.nclusters == 1:
+			net._stack(weights)
+		else:
+			boost     = np.load(os.path.join(path, 'boost.npy'))
+			boutputs  = np.load(os.path.join(path, 'boutputs.npy'))
+			wins_path = os.path.join(path, 'wins.npy')
+			wins      = np.load(wins_path) if os.path.exists(wins_path) else \
+				np.zeros(len(boost), dtype='int64')
+			net._stack(weights, boost)
+			for i, category in enumerate(categories):
+				s = slice(i * net.nclusters, (i + 1) * net.nclusters)
+				net.cnets[category].boutputs = boutputs[s]
+				net.cnets[category].wins     = wins[s]
+		
+		return net
 	
 	def classify(self, x, y):
 		"""
@@ -347,22 +943,102 @@ class CompetitiveLearningClassifier(object):
 		# Disable learning for all of the networks
 		self.disable_learning()
 		
-		# Evaluate all patterns
+		# Classify all patterns at once, using the stacked weights, unless the
+		# latency of each sample is needed
+		latencies = self.latencies
+		if latencies is None:
+			d = self._distances(np.atleast_2d(np.asarray(x,
+				dtype=self.dtype)))
+			if self.nclusters != 1:
+				self._record_winners(d)
+			
+			return np.mean(self._nearest_categories(d) == np.asarray(y))
+		
+		# Get the latency histograms
+		total        = latencies['classify']
+		per_category = self._category_latencies('classify')
+		
+		# Evaluate all patterns, one at a time
 		count = 0
 		for xi, yi in izip(x, y):
 			min_dist = np.inf; found_class = None
+			sample_start = step_clock()
 			for i, category in enumerate(self.cnets):
+				start = step_clock()
 				self.cnets[category].step(xi)
+				per_category[category].record(step_clock() - start)
 				cur_min = np.min(self.cnets[category].soutputs)
 				if cur_min < min_dist:
 					min_dist = cur_min; found_class = category
+			total.record(step_clock() - sample_start)
 			if found_class == yi: accuracy += 1
 			count += 1
 		accuracy /= count
 		
 		return accuracy
 	
-	def run(self, train_x, train_y, test_x, test_y, nepochs=1, verbose=True):
+	def _epoch_record(self, wins):
+		"""
+		Collect the metrics describing the state of the nets after an epoch.
+		
+		@param wins: A dictionary mapping each category to the win counts of
+		its clusters at the start of the epoch, or None if the nets have a
+		single cluster.
+		
+		@return: A dictionary containing the boost statistics and the number
+		of training wins of each cluster during the epoch.
+		"""
+		
+		if wins is None:
+			return {'boost_mean':None, 'boost_min':None, 'boost_max':None,
+				'winners':None}
+		
+		boost = np.concatenate([cnet.boost for cnet in self.cnets.values()])
+		return {
+			'boost_mean' : float(np.mean(boost)),
+			'boost_min'  : float(np.min(boost)),
+			'boost_max'  : float(np.max(boost)),
+			'winners'    : {str(category):(cnet.wins - wins[category]).tolist()
+				for category, cnet in self.cnets.iteritems()}
+		}
+	
+	def _state(self):
+		"""
+		Get the arrays making up the learned state of the nets.
+		
+		@return: A list of the arrays, in a consistent order.
+		"""
+		
+		state = []
+		for cnet in self.cnets.values():
+			state.append(cnet.weights)
+			if self.nclusters != 1:
+				state.extend((cnet.boost, cnet.boutputs, cnet.wins))
+		
+		return state
+	
+	def _weight_change(self, prev_weights):
+		"""
+		Compute how much the weights changed since the previous call.
+		
+		@param prev_weights: The weights of each net at the previous call, in
+		the order of "cnets". These are updated to the current weights.
+		
+		@return: The L2 norm of the change in all of the weights.
+		"""
+		
+		total = 0.
+		for prev, cnet in izip(prev_weights, self.cnets.values()):
+			diff   = (cnet.weights - prev).ravel()
+			total += np.dot(diff, diff)
+			np.copyto(prev, cnet.weights)
+		
+		return total ** 0.5
+	
+	def run(self, train_x, train_y, test_x, test_y, nepochs=1, verbose=True,
+		time_steps=False, sink=None, run_id=None, track_memory=False,
+		fused=False, patience=None, min_delta=0., weight_tol=None,
+		restore_best=True, schedule=None, nworkers=1):
 		"""
 		Simulate the entire network.
 		
@@ -382,68 +1058,250 @@ class CompetitiveLearningClassifier(object):
 		
 		@param verbose: If True, details will be printed after each epoch.
 		
-		@return: A tuple containing the training and test accuracies.
+		@param time_steps: If True, every training step is timed. The timings
+		are available in the "epoch/train/step" section of the timers. This
+		slows the training by about 10% to 25%, depending on the number of
+		inputs.
+		
+		@param sink: A L{BaseMetricsSink<lfw_gender.metrics.BaseMetricsSink>}
+		to write a record of metrics to after each epoch.
+		
+		@param run_id: The identifier to add to each record. If None, a unique
+		identifier is generated.
+		
+		@param track_memory: If True, the peak memory allocated during each
+		epoch is measured. Refer to L{PeakMemory<lfw_gender.memory.PeakMemory>}
+		for more details.
+		
+		@param fused: If True, the training accuracy is computed during the
+		training pass, from the predictions made just before each sample is
+		trained on. This avoids a second pass over the training data, but the
+		accuracy lags the end of epoch accuracy slightly. The activation
+		histories are still shifted as the skipped pass would have, which
+		only needs the last "duty_cycle" samples, so the boosts and weights
+		are the same as when not fused. Refer to L{train} for more details.
+		
+		@param patience: If provided, training stops once the test accuracy
+		hasn't improved for this many epochs.
+		
+		@param min_delta: The amount the test accuracy must increase by to be
+		considered an improvement.
+		
+		@param weight_tol: If provided, training stops once the L2 norm of the
+		change in all of the weights over an epoch falls below this value.
+		
+		@param restore_best: If True and a patience was provided, the nets are
+		restored to their state at the end of the epoch with the best test
+		accuracy once training stops. The index of that epoch is stored in
+		"best_epoch".
+		
+		@param schedule: If provided, the learning rate of each epoch is
+		obtained from this L{BaseSchedule<lfw_gender.schedules.BaseSchedule>}.
+		
+		@param nworkers: The number of processes to train the nets of the
+		categories with. Refer to L{train} for more details.
+		
+		@return: A tuple containing the training and test accuracies. If
+		training stopped early, only the completed epochs are included.
 		"""
 		
 		# Make some timers
+		#   - The flat timers track the totals.
+		#   - The sections break each epoch down into its phases.
 		self.timers = MultiTimer()
 		self.timers.add_timers('global', 'train', 'train_epoch', 'test',
 			'test_epoch')
 		self.timers.stop_timers('train', 'train_epoch', 'test', 'test_epoch')
+		self.time_steps = time_steps
+		section         = self.timers.section
 		
 		# Initializations
 		train = self.train; classify = self.classify
 		train_accuracy = np.zeros(nepochs); test_accuracy  = np.zeros(nepochs)
+		if sink is not None and run_id is None:
+			run_id = new_run_id()
+		
+		# Preallocate the snapshots used for early stopping
+		best_accuracy = -np.inf; self.best_epoch = None
+		if patience is not None and restore_best:
+			best_state = [np.empty_like(a) for a in self._state()]
+		if weight_tol is not None:
+			prev_weights = [np.array(cnet.weights) for cnet in
+				self.cnets.values()]
+		weight_change = None
 		
 		# Iterate through all epochs
+		#   - "i" is the last completed epoch, which is -1 if none were run.
+		i = -1
 		for i in xrange(nepochs):
-			# Train with all of the patterns
-			self.timers.start_timers('train', 'train_epoch')
-			self.train(train_x, train_y)
-			
-			# Get the accuracy for all of the training patterns
-			train_accuracy[i] = classify(train_x, train_y)
-			self.timers.pause_timers('train')
-			self.timers.stop_timers('train_epoch')
+			with section('epoch'):
+				if sink is not None and self.nclusters != 1:
+					wins = {category:cnet.wins.copy() for category, cnet in
+						self.cnets.iteritems()}
+				else:
+					wins = None
+				peak = PeakMemory(enabled=track_memory)
+				if schedule is not None:
+					self.set_learning_rate(schedule(i))
+				
+				# Train with all of the patterns
+				self.timers.start_timers('train', 'train_epoch')
+				start = clock()
+				with section('train'), peak:
+					accuracy = train(train_x, train_y, fused, nworkers)
+				train_time = clock() - start
+				if weight_tol is not None:
+					weight_change = self._weight_change(prev_weights)
+				
+				# Get the accuracy for all of the training patterns
+				start = clock()
+				if fused:
+					train_accuracy[i] = accuracy
+					self._replay_history(train_x)
+				else:
+					with section('train_accuracy'), peak:
+						train_accuracy[i] = classify(train_x, train_y)
+				train_eval_time = clock() - start
+				self.timers.pause_timers('train')
+				self.timers.stop_timers('train_epoch')
+				
+				# Print out training stats
+				if verbose:
+					print '\nEpoch {0} of {1}:'.format(i + 1, nepochs)
+					print '  Training Accuracy : {0}%'.format(
+						train_accuracy[i] * 100)
+					print '  Training Time     : {0}'.format(
+						self.timers.get_elapsed_time('train_epoch', True))
+				
+				# Get the accuracy for all of the testing patterns
+				self.timers.start_timers('test', 'test_epoch')
+				start = clock()
+				with section('test_accuracy'), peak:
+					test_accuracy[i] = classify(test_x, test_y)
+				test_time = clock() - start
+				self.timers.pause_timers('test')
+				self.timers.stop_timers('test_epoch')
+				
+				# Print out testing stats
+				if verbose:
+					print '  Testing Accuracy  : {0}%'.format(
+						test_accuracy[i] * 100)
+					print '  Testing Time      : {0}'.format(
+						self.timers.get_elapsed_time('test_epoch', True))
+					if peak.peak is not None:
+						print '  Peak Memory       : {0}'.format(pretty_bytes(
+							peak.peak))
+				
+				# Write out the metrics
+				if sink is not None:
+					record = {
+						'run_id'                : run_id,
+						'epoch'                 : i + 1,
+						'nepochs'               : nepochs,
+						'train_accuracy'        : train_accuracy[i],
+						'test_accuracy'         : test_accuracy[i],
+						'train_time'            : train_time,
+						'train_eval_time'       : train_eval_time,
+						'test_time'             : test_time,
+						'train_samples_per_sec' : len(train_y) / train_time,
+						'test_samples_per_sec'  : len(test_y) / test_time,
+						'peak_memory'           : peak.peak,
+						'weight_change'         : weight_change
+					}
+					record.update(self._epoch_record(wins))
+					sink.write(record)
 			
-			# Print out training stats
-			if verbose:
-				print '\nEpoch {0} of {1}:'.format(i + 1, nepochs)
-				print '  Training Accuracy : {0}%'.format(train_accuracy[i] *
-					100)
-				print '  Training Time     : {0}'.format(
-					self.timers.get_elapsed_time('train_epoch', True))
-			
-			# Get the accuracy for all of the testing patterns
-			self.timers.start_timers('test', 'test_epoch')
-			test_accuracy[i] = classify(test_x, test_y)
-			self.timers.pause_timers('test')
-			self.timers.stop_timers('test_epoch')
-			
-			# Print out testing stats
-			if verbose:
-				print '  Testing Accuracy  : {0}%'.format(test_accuracy[i] *
-					100)
-				print '  Testing Time      : {0}'.format(
-					self.timers.get_elapsed_time('test_epoch', True))
+			# Check for convergence
+			stop = None
+			if patience is not None:
+				if test_accuracy[i] > best_accuracy + min_delta:
+					best_accuracy = test_accuracy[i]; self.best_epoch = i
+					if restore_best:
+						for s, a in izip(best_state, self._state()):
+							np.copyto(s, a)
+				elif i - self.best_epoch >= patience:
+					stop = 'the test accuracy has not improved for {0} ' \
+						'epochs'.format(patience)
+			if weight_tol is not None and weight_change < weight_tol:
+				stop = 'the weight change fell below {0}'.format(weight_tol)
+			if stop is not None:
+				if verbose:
+					print '\nStopping at epoch {0}, as {1}'.format(i + 1, stop)
+				break
+		
+		# Discard the epochs that weren't run and restore the best state
+		train_accuracy = train_accuracy[:i + 1]
+		test_accuracy  = test_accuracy[:i + 1]
+		nepochs        = i + 1
+		if patience is not None and restore_best and self.best_epoch not in (
+			None, i):
+			for s, a in izip(best_state, self._state()):
+				np.copyto(a, s)
+			self.index = None
 		
 		# Print out the final results
 		self.timers.stop_timers('global')
+		#   - The best accuracies and the epoch averages need an epoch.
 		if verbose:
 			print '\n' + '*' * 79
-			print '\nBest Training Accuracy : {0}% at Epoch {1}'.format(np.max(
-				train_accuracy) * 100, np.argmax(train_accuracy) + 1)
-			print 'Best Testing Accuracy  : {0}% at Epoch {1}'.format(np.max(
-				test_accuracy) * 100, np.argmax(test_accuracy) + 1)
+			if nepochs:
+				print '\nBest Training Accuracy : {0}% at Epoch {1}'.format(
+					np.max(train_accuracy) * 100,
+					np.argmax(train_accuracy) + 1)
+				print 'Best Testing Accuracy  : {0}% at Epoch {1}'.format(
+					np.max(test_accuracy) * 100, np.argmax(test_accuracy) + 1)
 			print '\nTotal Execution Time        : {0}'.format(
 				self.timers.get_elapsed_time('global', True))
 			print 'Total Training Time         : {0}'.format(
 				self.timers.get_elapsed_time('train', True))
-			print 'Average Training Epoch Time : {0}'.format(
-				pretty_time(self.timers.get_elapsed_time('train') / nepochs))
+			if nepochs:
+				print 'Average Training Epoch Time : {0}'.format(pretty_time(
+					self.timers.get_elapsed_time('train') / nepochs))
 			print 'Total Testing Time          : {0}'.format(
 				self.timers.get_elapsed_time('test', True))
-			print 'Average Testing Epoch Time  : {0}'.format(
-				pretty_time(self.timers.get_elapsed_time('test') / nepochs))		
-		
-		return (train_accuracy, test_accuracy)
\ No newline at end of file
+			if nepochs:
+				print 'Average Testing Epoch Time  : {0}'.format(pretty_time(
+					self.timers.get_elapsed_time('test') / nepochs))
+			print '\n' + self.timers.report()
+			if self.latencies is not None:
+				print '\n' + self.latency_report()
+		
+		return (train_accuracy, test_accuracy)
+
+###############################################################################
+########## Worker Functions
+###############################################################################
+
+# The nets being trained and their samples, inherited by the worker processes
+_train_jobs = None
+
+def _train_worker(start, step):
+	"""
+	Train the nets of some of the categories with their samples, in order, in
+	a worker process.
+	
+	@param start: The index of the first job to train.
+	
+	@param step: The number of jobs between each job to train.
+	
+	@return: A list containing the state of each trained net, as a dictionary
+	mapping the name of each of its numpy arrays to the array.
+	"""
+	
+	states = []
+	for cnet, samples in _train_jobs[start::step]:
+		for xi in samples:
+			cnet.step(xi)
+		states.append({name:value for name, value in vars(cnet).iteritems()
+			if isinstance(value, np.ndarray)})
+	
+	return states
+
+###############################################################################
+########## Probes
+###############################################################################
+
+register_probes(SimpleCompetitiveLearning, 'step')
+register_probes(CompetitiveLearning, 'step')
+register_probes(CompetitiveLearningClassifier, 'train', 'classify', 'predict',
+	'run')
\ No newline at end of file
@@ -19,12 +19,15 @@ G{packagetree lfw_gender}
 __docformat__ = 'epytext'
 
 # Native imports
-import os, csv, cPickle
+import os, sys, csv, cPickle
 
 # Third party imports
 import numpy      as     np
 from   scipy.misc import imread, imresize
 
+# Program imports
+from lfw_gender.hooks import register_probes
+
 def read_img(path):
 	"""
 	Read an image from a given path.
@@ -150,6 +153,13 @@ def main(img_path, gender_path, out_path, shape=(30, 30)):
 				with open(os.path.join(base_path, file_name), 'wb') as f:
 					cPickle.dump(img, f, cPickle.HIGHEST_PROTOCOL)
 
+###############################################################################
+########## Probes
+###############################################################################
+
+register_probes(sys.modules[__name__], 'read_img', 'rgb_to_gray',
+	'resize_and_flatten', 'reshape')
+
 if __name__ == '__main__':
 	# Set the base directory to be the data folder inside the repo
 	base_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(
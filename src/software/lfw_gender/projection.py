@@ -0,0 +1,437 @@
+# projection.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Dimensionality reduction of the inputs.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Dimensionality reduction of the inputs.
+
+The cost of a step of the competitive nets grows with the number of inputs,
+i.e. the number of pixels. A projection maps every flattened image to a small
+number of components, such that larger images may be used at the cost of
+smaller ones. Two projections are provided:
+	- L{PCAProjection}, which keeps the directions of largest variance of the
+	training data.
+	- L{RandomProjection}, which multiplies by a random Gaussian matrix. It
+	approximately preserves the distances between the images and is
+	practically free to fit.
+
+A projection is fitted once, on the training data, and then applied to
+batches of images, both while preprocessing the data (L{project_data}) and
+while serving (see L{CompetitiveLearningClassifier<lfw_gender.net.
+CompetitiveLearningClassifier>}). Fitted projections may be cached on disk,
+keyed by the data and the parameters, such that they are only fitted once.
+
+G{packagetree lfw_gender}
+"""
+
+__docformat__ = 'epytext'
+
+# Native imports
+import os, sys, json, hashlib
+from abc import ABCMeta, abstractmethod
+
+# Third party imports
+import numpy as np
+
+# Program imports
+from lfw_gender.hooks             import register_probes
+from lfw_gender.exception_handler import BaseException, wrap_error
+
+###############################################################################
+########## Exception Handling
+###############################################################################
+
+class InvalidComponents(BaseException):
+	"""
+	Exception if a projection can't have the requested number of components.
+	"""
+	
+	def __init__(self, ncomponents, max_components):
+		"""
+		Initialize this class.
+		
+		@param ncomponents: The requested number of components.
+		
+		@param max_components: The largest number of components allowed.
+		"""
+		
+		self.msg = wrap_error('The number of components, {0}, is invalid. It '
+			'must be between 1 and {1}.'.format(ncomponents, max_components))
+
+class UnknownProjection(BaseException):
+	"""
+	Exception if a saved projection is of an unknown kind.
+	"""
+	
+	def __init__(self, path, kind):
+		"""
+		Initialize this class.
+		
+		@param path: The full path to the saved projection.
+		
+		@param kind: The kind of the saved projection.
+		"""
+		
+		self.msg = wrap_error('The projection at "{0}" is of kind "{1}". Only '
+			'the following kinds are supported: {2}.'.format(path, kind,
+			', '.join(sorted(PROJECTIONS))))
+
+###############################################################################
+########## Class Templates
+###############################################################################
+
+class BaseProjection(object):
+	"""
+	Base class for a linear projection, i.e. (x - mean) * components^T.
+	"""
+	__metaclass__ = ABCMeta
+	
+	# The name of the kind of projection, used when saving
+	kind = None
+	
+	def __init__(self, ncomponents):
+		"""
+		Initialize this class.
+		
+		@param ncomponents: The number of components to project to.
+		"""
+		
+		self.ncomponents = ncomponents
+		self.ninputs     = None
+		self.mean        = None
+		self.components  = None
+	
+	@abstractmethod
+	def fit(self, x):
+		"""
+		Fit the projection.
+		
+		@param x: A 2D numpy array, where each row is a sample.
+		
+		@return: This projection.
+		"""
+	
+	def params(self):
+		"""
+		Get the parameters needed to recreate this projection, other than the
+		fitted arrays.
+		
+		@return: A dictionary of the parameters.
+		"""
+		
+		return {'ncomponents':self.ncomponents}
+	
+	def _check_components(self, max_components):
+		"""
+		Verify the number of components.
+		
+		@param max_components: The largest number of components allowed.
+		
+		@raise InvalidComponents: Raised if the number is invalid.
+		"""
+		
+		if not 1 <= self.ncomponents <= max_components:
+			raise InvalidComponents(self.ncomponents, max_components)
+	
+	def transform(self, x, dtype='float64', batch_size=1024):
+		"""
+		Project samples, in batches.
+		
+		@param x: A numpy array, where each row is a sample.
+		
+		@param dtype: The floating point type of the projected samples.
+		
+		@param batch_size: The number of samples projected at a time, which
+		bounds the memory used for the centered samples.
+		
+		@return: A numpy array of shape (samples, ncomponents) containing the
+		projected samples.
+		"""
+		
+		x   = np.atleast_2d(x)
+		out = np.empty((len(x), self.ncomponents), dtype)
+		for i in xrange(0, len(x), batch_size):
+			out[i:i + batch_size] = np.dot(x[i:i + batch_size] - self.mean,
+				self.components.T)
+		
+		return out
+	
+	def save(self, path):
+		"""
+		Save the fitted projection. The projection is saved in a directory as a
+		manifest ("projection.json") along with one numpy file per array. The
+		directory may be shared with a saved network.
+		
+		@param path: The full path to the directory to save the projection in.
+		It will be created if it does not exist.
+		"""
+		
+		# Make the directory
+		try:
+			os.makedirs(path)
+		except OSError:
+			pass
+		
+		# Save the arrays and the manifest
+		np.save(os.path.join(path, 'projection_mean.npy'), self.mean)
+		np.save(os.path.join(path, 'projection_components.npy'),
+			self.components)
+		manifest = {'kind':self.kind, 'ninputs':self.ninputs,
+			'params':self.params()}
+		with open(os.path.join(path, 'projection.json'), 'wb') as f:
+			json.dump(manifest, f, indent=1, sort_keys=True)
+
+###############################################################################
+########## Class Implementations
+###############################################################################
+
+class PCAProjection(BaseProjection):
+	"""
+	Projection onto the principal components of the training data.
+	"""
+	
+	kind = 'pca'
+	
+	def __init__(self, ncomponents, whiten=False):
+		"""
+		Initialize this class.
+		
+		@param ncomponents: The number of components to project to.
+		
+		@param whiten: If True, the components are scaled such that every
+		projected component has a unit variance.
+		"""
+		
+		super(PCAProjection, self).__init__(ncomponents)
+		self.whiten = whiten
+		
+		# The fraction of the variance explained by each component
+		self.explained_variance_ratio = None
+	
+	def params(self):
+		"""
+		Get the parameters needed to recreate this projection, other than the
+		fitted arrays.
+		
+		@return: A dictionary of the parameters.
+		"""
+		
+		return {'ncomponents':self.ncomponents, 'whiten':self.whiten}
+	
+	def fit(self, x):
+		"""
+		Fit the projection, using the SVD of the centered samples. The sign of
+		each component is chosen such that its largest entry is positive,
+		making the fit deterministic.
+		
+		@param x: A 2D numpy array, where each row is a sample.
+		
+		@return: This projection.
+		
+		@raise InvalidComponents: Raised if there are more components than
+		inputs, or than samples less one, or than the numerical rank of the
+		centered samples. Centering removes one degree of freedom, and
+		duplicated or collinear samples remove more, so the remaining
+		components would have no variance (and couldn't be whitened).
+		"""
+		
+		self._check_components(min(len(x) - 1, x.shape[1]))
+		
+		x         = np.asarray(x, dtype='float64')
+		self.mean = np.mean(x, 0)
+		u, s, vt  = np.linalg.svd(x - self.mean, full_matrices=False)
+		
+		# Singular values below the rounding error of the centering and the
+		# SVD are zero
+		tol = max(x.shape) * np.finfo('float64').eps * max(s[0],
+			np.linalg.norm(x))
+		self._check_components(np.count_nonzero(s > tol))
+		
+		vt        = vt[:self.ncomponents]
+		signs     = np.sign(vt[np.arange(len(vt)), np.argmax(np.abs(vt), 1)])
+		vt       *= signs[:, np.newaxis]
+		
+		variance                      = s ** 2 / max(len(x) - 1, 1)
+		self.explained_variance_ratio = variance[:self.ncomponents] / np.sum(
+			variance)
+		if self.whiten:
+			vt /= np.sqrt(variance[:self.ncomponents])[:, np.newaxis]
+		
+		self.ninputs    = x.shape[1]
+		self.components = vt
+		
+		return self
+
+class RandomProjection(BaseProjection):
+	"""
+	Projection with a random Gaussian matrix, whose entries have a variance of
+	1 / ncomponents, such that the expected squared distances are preserved.
+	"""
+	
+	kind = 'random'
+	
+	def __init__(self, ncomponents, seed=None):
+		"""
+		Initialize this class.
+		
+		@param ncomponents: The number of components to project to.
+		
+		@param seed: The seed for the random matrix.
+		"""
+		
+		super(RandomProjection, self).__init__(ncomponents)
+		self.seed = seed
+	
+	def params(self):
+		"""
+		Get the parameters needed to recreate this projection, other than the
+		fitted arrays.
+		
+		@return: A dictionary of the parameters.
+		"""
+		
+		return {'ncomponents':self.ncomponents, 'seed':self.seed}
+	
+	def fit(self, x):
+		"""
+		Fit the projection. Only the mean of the samples is learned; the
+		matrix only depends on the number of inputs and the seed.
+		
+		@param x: A 2D numpy array, where each row is a sample.
+		
+		@return: This projection.
+		
+		@raise InvalidComponents: Raised if there are more components than
+		inputs.
+		"""
+		
+		self._check_components(x.shape[1])
+		
+		self.ninputs    = x.shape[1]
+		self.mean       = np.mean(x, 0, dtype='float64')
+		self.components = np.random.RandomState(self.seed).normal(0,
+			self.ncomponents ** -0.5, (self.ncomponents, self.ninputs))
+		
+		return self
+
+# The kinds of projections, mapping the name of each kind to its class
+PROJECTIONS = {cls.kind:cls for cls in (PCAProjection, RandomProjection)}
+
+###############################################################################
+########## Functions
+###############################################################################
+
+def load_projection(path, mmap=False):
+	"""
+	Load a projection that was saved with L{BaseProjection.save}.
+	
+	@param path: The full path to the directory containing the projection.
+	
+	@param mmap: If True, the arrays are memory mapped as read-only.
+	
+	@return: The loaded projection.
+	
+	@raise UnknownProjection: Raised if the kind of projection is unknown.
+	"""
+	
+	with open(os.path.join(path, 'projection.json'), 'rb') as f:
+		manifest = json.load(f)
+	if manifest['kind'] not in PROJECTIONS:
+		raise UnknownProjection(path, manifest['kind'])
+	
+	mmap_mode             = 'r' if mmap else None
+	projection            = PROJECTIONS[manifest['kind']](**manifest['params'])
+	projection.ninputs    = manifest['ninputs']
+	projection.mean       = np.load(os.path.join(path, 'projection_mean.npy'),
+		mmap_mode=mmap_mode)
+	projection.components = np.load(os.path.join(path,
+		'projection_components.npy'), mmap_mode=mmap_mode)
+	
+	return projection
+
+def has_projection(path):
+	"""
+	Check if a directory contains a saved projection.
+	
+	@param path: The full path to the directory.
+	
+	@return: True if a projection was saved in the directory.
+	"""
+	
+	return os.path.exists(os.path.join(path, 'projection.json'))
+
+def fit_cached(projection, x, cache_dir):
+	"""
+	Fit a projection, reusing a previous fit of the same kind of projection,
+	with the same parameters, on the same data. The fits are saved in
+	subdirectories of the cache directory, named by a hash of the data and the
+	parameters.
+	
+	@param projection: The projection to fit.
+	
+	@param x: A 2D numpy array, where each row is a sample.
+	
+	@param cache_dir: The full path to the cache directory.
+	
+	@return: The fitted projection. This is the provided projection if it was
+	fitted, else the cached one.
+	"""
+	
+	x   = np.ascontiguousarray(x)
+	key = hashlib.sha1(json.dumps([projection.kind, projection.params(),
+		x.shape, x.dtype.str], sort_keys=True))
+	key.update(x.data)
+	path = os.path.join(cache_dir, key.hexdigest())
+	
+	if has_projection(path):
+		return load_projection(path)
+	
+	projection.fit(x)
+	projection.save(path)
+	
+	return projection
+
+def project_data(data, projection, cache_dir=None, dtype='float64'):
+	"""
+	Fit a projection on the training data and project both the training and
+	the testing data.
+	
+	@param data: The data, as returned by L{get_data<lfw_gender.util.
+	get_data>}, with the images scaled as they should be for the nets.
+	
+	@param projection: The projection to fit.
+	
+	@param cache_dir: If provided, the fit is cached in this directory (see
+	L{fit_cached}).
+	
+	@param dtype: The floating point type of the projected data.
+	
+	@return: A tuple containing the projected data, in the same format as the
+	provided data, and the fitted projection.
+	"""
+	
+	(train_x, train_y), (test_x, test_y) = data
+	if cache_dir is None:
+		projection.fit(train_x)
+	else:
+		projection = fit_cached(projection, train_x, cache_dir)
+	
+	return ((projection.transform(train_x, dtype), train_y),
+		(projection.transform(test_x, dtype), test_y)), projection
+
+###############################################################################
+########## Probes
+###############################################################################
+
+register_probes(BaseProjection, 'transform')
+register_probes(PCAProjection, 'fit')
+register_probes(RandomProjection, 'fit')
+register_probes(sys.modules[__name__], 'project_data')
\ No newline at end of file
@@ -15,8 +15,24 @@ Module for dealing with Q formatted numbers.
 """
 __docformat__ = 'epytext'
 
+# Native imports
+import sys
+
+# Third party imports
+import numpy as np
+
 # Program imports
 from lfw_gender.exception_handler import wrap_error, BaseException
+from lfw_gender.hooks             import register_probes
+
+# The counters of the Q class, mapping (m, n) to the counters of the format
+_counters = {}
+
+# The supported rounding modes
+ROUNDING_MODES = ('truncate', 'round_half_even', 'stochastic')
+
+# The random number generator used for stochastic rounding, unless one is given
+_rng = np.random.RandomState()
 
 ###############################################################################
 ########## Exception Handling
@@ -42,6 +58,155 @@ class InvalidQNumber(BaseException):
 			'decoding or fix your Q formatted number.'.format(q, len(q),
 			num_bits))
 
+class InvalidRoundingMode(BaseException):
+	"""
+	Exception if the rounding mode isn't supported.
+	"""
+	
+	def __init__(self, rounding):
+		"""
+		Initializes this class.
+		
+		@param rounding: The rounding mode.
+		"""
+		
+		self.msg = wrap_error('The rounding mode, "{0}", is not supported. '
+			'The supported modes are: {1}.'.format(rounding, ', '.join(
+			ROUNDING_MODES)))
+
+###############################################################################
+########## Counters
+###############################################################################
+
+def new_counters():
+	"""
+	Create a set of counters for the fixed point events, i.e. the results that
+	were greater than the maximum ("overflows"), less than the minimum
+	("underflows"), either of the two ("saturations") or nonzero values that
+	became zero ("zero_flushes"). The vectorized functions also count the
+	number of results ("ops").
+	
+	@return: A dictionary mapping the name of each counter to zero.
+	"""
+	
+	return {'ops':0, 'overflows':0, 'underflows':0, 'saturations':0,
+		'zero_flushes':0}
+
+def format_counters(m, n):
+	"""
+	Get the counters of the Q class for a format. The counters are updated by
+	every instance with that format.
+	
+	@param m: The number of integer bits for fixed point.
+	
+	@param n: The number of fractional bits for fixed point.
+	
+	@return: The dictionary of counters.
+	"""
+	
+	try:
+		return _counters[(m, n)]
+	except KeyError:
+		return _counters.setdefault((m, n), new_counters())
+
+def reset_format_counters():
+	"""
+	Reset the counters of the Q class for all formats.
+	"""
+	
+	for counters in _counters.values():
+		counters.update(new_counters())
+
+###############################################################################
+########## Rounding
+###############################################################################
+
+def check_rounding(rounding):
+	"""
+	Verifies that a rounding mode is supported.
+	
+	@param rounding: The rounding mode.
+	
+	@raise InvalidRoundingMode: Raised if the mode isn't in L{ROUNDING_MODES}.
+	"""
+	
+	if rounding not in ROUNDING_MODES:
+		raise InvalidRoundingMode(rounding)
+
+def seed_rounding(seed):
+	"""
+	Seed the random number generator used for stochastic rounding when no
+	generator is given, e.g. by the Q class.
+	
+	@param seed: The seed.
+	"""
+	
+	_rng.seed(seed)
+
+def fp_round(x, rounding='truncate', rng=None):
+	"""
+	Round scaled scalars, i.e. scalars multiplied by 2^n, to raw integers.
+	
+	@param x: A numpy array containing the scaled scalars.
+	
+	@param rounding: The rounding mode. "truncate" rounds towards zero,
+	"round_half_even" rounds to the nearest integer (ties to even) and
+	"stochastic" rounds up with a probability equal to the fractional part.
+	
+	@param rng: The numpy RandomState used for stochastic rounding. If None,
+	the generator seeded by L{seed_rounding} is used.
+	
+	@return: A numpy array containing the raw integers.
+	
+	@raise InvalidRoundingMode: Raised if the rounding mode isn't supported.
+	"""
+	
+	check_rounding(rounding)
+	x = np.asarray(x, dtype='float64')
+	if rounding == 'truncate':
+		x = np.trunc(x)
+	elif rounding == 'round_half_even':
+		x = np.rint(x)
+	else:
+		x = np.floor(x + (_rng if rng is None else rng).random_sample(x.shape))
+	
+	return x.astype(np.int64)
+
+def fp_shift(x, n, rounding='truncate', rng=None):
+	"""
+	Divide raw integers by 2^n, e.g. to drop the extra fractional bits of a
+	product.
+	
+	@param x: A numpy array containing the raw integers.
+	
+	@param n: The number of bits to drop.
+	
+	@param rounding: The rounding mode. "truncate" is a plain arithmetic
+	shift, i.e. it rounds towards negative infinity as done by the HW. The
+	other modes are as in L{fp_round}.
+	
+	@param rng: The numpy RandomState used for stochastic rounding. If None,
+	the generator seeded by L{seed_rounding} is used.
+	
+	@return: A numpy array containing the raw integers.
+	
+	@raise InvalidRoundingMode: Raised if the rounding mode isn't supported.
+	"""
+	
+	check_rounding(rounding)
+	x = np.asarray(x, dtype=np.int64)
+	if rounding == 'truncate' or n == 0:
+		return x >> n
+	
+	if rounding == 'round_half_even':
+		q    = x >> n
+		r    = x & ((1 << n) - 1)
+		half = 1 << (n - 1)
+		return q + ((r > half) | ((r == half) & (q & 1 == 1)))
+	
+	return (x + (_rng if rng is None else rng).randint(0, 1 << n,
+		x.shape)) >> n
+
 ###############################################################################
 ########## Classes
 ###############################################################################
@@ -59,7 +224,8 @@ class Q(object):
 	
 	NOTE - This is a lossy operation. Conversions from a scalar to the Q format
 	and back may result in a loss of data. This is based off the provided
-	precision for "m" and "n".
+	precision for "m" and "n". How the data is lost is set by the rounding
+	mode (see L{fp_round} and L{fp_shift}).
 	
 	For example:
 		The number 1.125 is represented as 01.0010 if m = 1 and n = 4.
@@ -78,7 +244,7 @@ class Q(object):
 	
 	"""
 	
-	def __init__(self, m, n, scalar=None):
+	def __init__(self, m, n, scalar=None, rounding='truncate'):
 		"""
 		Initializes this class.
 		
@@ -89,15 +255,71 @@ class Q(object):
 		@param scalar: The number to convert to fixed point. If provided, this
 		object will be used as a data type. If it isn't provided, this object
 		will be used to perform conversions.
+		
+		@param rounding: The rounding mode used by encode and mult. The
+		numbers created by the arithmetic operators use the same mode. With
+		"truncate", encoding truncates towards zero and products are rounded
+		towards negative infinity. The other modes saturate instead of
+		overflowing while encoding, and add, subtract and multiply the raw
+		integers.
+		
+		@raise InvalidRoundingMode: Raised if the rounding mode isn't
+		supported.
 		"""
 		
+		check_rounding(rounding)
+		
 		self.m        = m
 		self.n        = n
 		self.num_bits = m + n + 1
+		self.rounding = rounding
+		self.counters = format_counters(m, n)
 		
 		if scalar is not None:
 			self.q_num = self.encode(scalar)
 	
+	def _new(self, scalar):
+		"""
+		Create a number with the same format and rounding mode.
+		
+		@param scalar: The number to convert to fixed point.
+		
+		@return: The new Q object.
+		"""
+		
+		return Q(self.m, self.n, scalar, self.rounding)
+	
+	def _to_raw(self, q):
+		"""
+		Convert a Q formatted number to its raw integer.
+		
+		@param q: The Q formatted number.
+		
+		@return: The raw integer, i.e. the number multiplied by 2^n.
+		"""
+		
+		raw = int(q, 2)
+		
+		return raw - (1 << self.num_bits) if q[0] == '1' else raw
+	
+	def _from_raw(self, raw):
+		"""
+		Convert a raw integer to a Q formatted number, saturating it at the
+		max and min bounds.
+		
+		@param raw: The raw integer.
+		
+		@return: The Q formatted number.
+		"""
+		
+		low, high = fp_limits(self.m, self.n)
+		if raw < low or raw > high:
+			self.counters['saturations'] += 1
+			self.counters['underflows' if raw < low else 'overflows'] += 1
+			raw = min(max(raw, low), high)
+		
+		return bin(raw & ((1 << self.num_bits) - 1))[2:].zfill(self.num_bits)
+	
 	def _clamp(self, q):
 		"""
 		Check the q number for overflow and underflow and then clamp at the
@@ -108,8 +330,10 @@ class Q(object):
 		
 		# Check for overflow and underflow
 		if len(q) > self.num_bits:
-			if q[0] == 1:
-				return '1' * (self.m + 1) + '0' * self.n
+			self.counters['saturations'] += 1
+			self.counters['underflows' if q[0] == '1' else 'overflows'] += 1
+			if q[0] == '1':
+				return '1' + '0' * (self.m + self.n)
 			else:
 				return '0' + '1' * (self.m + self.n)
 		else:
@@ -154,6 +378,14 @@ class Q(object):
 		@return: A string representing the Q point number.
 		"""
 		
+		# Round the raw integer, unless the bits are simply truncated
+		if self.rounding != 'truncate':
+			q_num = self._from_raw(int(fp_round(scalar * (1 << self.n),
+				self.rounding)))
+			if scalar != 0 and '1' not in q_num:
+				self.counters['zero_flushes'] += 1
+			return q_num
+		
 		sign   = int(scalar < 0)
 		scalar = abs(scalar)
 		
@@ -178,24 +410,23 @@ class Q(object):
 		# Create q number
 		q_num = bi + ''.join(bf)
 		
-		# Use 2's complement to convert negative number
+		# Use 2's complement to convert negative number. Numbers less than the
+		# minimum are left too long, as are the numbers greater than the
+		# maximum, such that they are clamped by L{_clamp}.
 		if sign:
-			# Invert the bits
-			q_num = ''.join('1' if bit == '0' else '0' for bit in q_num)
-			
-			# Add 1 and insert sign
-			q_num =  '1' + bin(int(q_num, 2) + 1)[2:].zfill(self.num_bits - 1)
-			
-			# Check for underflow
-			if len(q_num) > self.num_bits:
-				q_num = q_num[:-1]
-			
-			# Check for poor encoding (required for numbers close to 0)
-			if abs(self.decode(q_num)) > scalar:
-				return '0' * self.num_bits
+			raw = -int(q_num, 2)
+			if raw < fp_limits(self.m, self.n)[0]:
+				q_num = '1' + q_num
+			else:
+				q_num = bin(raw & ((1 << self.num_bits) - 1))[2:].zfill(
+					self.num_bits)
 		else:
 			q_num = '0' + q_num
 		
+		# Count nonzero numbers that were too small to encode
+		if scalar != 0 and '1' not in q_num:
+			self.counters['zero_flushes'] += 1
+		
 		return q_num
 		
 	def decode(self, q):
@@ -244,9 +475,27 @@ class Q(object):
 		self._check_q_num(q0)
 		self._check_q_num(q1)
 		
+		# The sum of the raw integers is exact, so it only needs saturating
+		if self.rounding != 'truncate':
+			return self._from_raw(self._to_raw(q0) + self._to_raw(q1))
+		
 		# Perform addition
-		val   = self.decode(q0) + self.decode(q1)
-		q_num = self._clamp(self.encode(val))
+		return self._floor(self.decode(q0) + self.decode(q1))
+	
+	def _floor(self, val):
+		"""
+		Encode the exact result of an operation, rounding it towards negative
+		infinity.
+		
+		@param val: The exact result.
+		
+		@return: The result as a Q formatted number.
+		"""
+		
+		# A saturated result is already the closest number
+		q_num = self.encode(val)
+		if len(q_num) > self.num_bits:
+			return self._clamp(q_num)
 		
 		# Enforce encoded number to be smaller than the actual result
 		if self.decode(q_num) > val:
@@ -255,6 +504,28 @@ class Q(object):
 		# Check for overflow and underflow
 		return self._clamp(q_num)
 	
+	def sub(self, q0, q1):
+		"""
+		Subtracts two Q formatted numbers.
+		
+		@param q0: A Q formatted number.
+		
+		@param q1: The Q formatted number to subtract from q0.
+		
+		@return: The difference of q0 and q1 as a Q formatted number.
+		"""
+		
+		# Error checking
+		self._check_q_num(q0)
+		self._check_q_num(q1)
+		
+		# The difference of the raw integers is exact, as for add
+		if self.rounding != 'truncate':
+			return self._from_raw(self._to_raw(q0) - self._to_raw(q1))
+		
+		# Perform subtraction; the negated number may not be representable
+		return self._floor(self.decode(q0) - self.decode(q1))
+	
 	def mult(self, q0, q1):
 		"""
 		Multiplies two Q formatted numbers.
@@ -270,9 +541,20 @@ class Q(object):
 		self._check_q_num(q0)
 		self._check_q_num(q1)
 		
-		# Perform multiplication
+		# Round the exact product, unless the bits are simply truncated
+		if self.rounding != 'truncate':
+			p     = self._to_raw(q0) * self._to_raw(q1)
+			q_num = self._from_raw(int(fp_shift(p, self.n, self.rounding)))
+			if p != 0 and '1' not in q_num:
+				self.counters['zero_flushes'] += 1
+			return q_num
+		
+		# Perform multiplication; a saturated product is already the closest
+		# number
 		val   = self.decode(q0) * self.decode(q1)
-		q_num = self._clamp(self.encode(val))
+		q_num = self.encode(val)
+		if len(q_num) > self.num_bits:
+			return self._clamp(q_num)
 		
 		# Enforce encoded number to be smaller than the actual result
 		if self.decode(q_num) > val:
@@ -311,38 +593,37 @@ class Q(object):
 		return self.decode(self.q_num) >= self.decode(q.q_num)
 	
 	def __add__(self, q):
-		return Q(self.m, self.n, self.decode(self.add(self.q_num, q.q_num)))
+		return self._new(self.decode(self.add(self.q_num, q.q_num)))
 	
 	def __iadd__(self, q):
 		self.q_num = self.add(self.q_num, q.q_num)
 		return self
 	
 	def __sub__(self, q):
-		return Q(self.m, self.n, self.decode(self.add(self.q_num,
-			self.encode(-self.decode(q.q_num)))))
+		return self._new(self.decode(self.sub(self.q_num, q.q_num)))
 	
 	def __isub__(self, q):
-		self.q_num = self.add(self.q_num, self.encode(-self.decode(q.q_num)))
+		self.q_num = self.sub(self.q_num, q.q_num)
 		return self
 	
 	def __mul__(self, q):
-		return Q(self.m, self.n, self.decode(self.mult(self.q_num, q.q_num)))
+		return self._new(self.decode(self.mult(self.q_num, q.q_num)))
 	
 	def __imul__(self, q):
 		self.q_num = self.mult(self.q_num, q.q_num)
 		return self
 	
 	def __pow__(self, num):
-		val = Q(self.m, self.n, self.decode(self.q_num))
+		val = self._new(self.decode(self.q_num))
 		for _ in xrange(num - 1):
-			val = Q(self.m, self.n, self.decode(self.mult(self.q_num,
+			val = self._new(self.decode(self.mult(self.q_num,
 				str(val))))
 		return val
 	
 	def __ipow__(self, num):
-		val = Q(self.m, self.n, self.decode(self.q_num))
+		val = self._new(self.decode(self.q_num))
 		for _ in xrange(num - 1):
-			val = Q(self.m, self.n, self.decode(self.mult(self.q_num,
+			val = self._new(self.decode(self.mult(self.q_num,
 				str(val))))
 		self.q_num = val.q_num
 		return self
@@ -381,6 +662,194 @@ def fps_to_imgs(x, m, n):
 	
 	return np.array([np.array([y.decode(y.q_num) for y in xi]) for xi in x])
 
+###############################################################################
+########## Vectorized Functions
+###############################################################################
+
+# These functions operate on numpy arrays of raw integers, i.e. the two's
+# complement value of a Q formatted number, such that the number is equal to
+# raw / 2^n. The results are bit-exact with the Q class (using the same
+# rounding mode), except for truncated results at or below the minimum of the
+# range, which are saturated to the minimum (the Q class can't encode it).
+# Stochastic rounding draws different random numbers than the Q class.
+
+def fp_limits(m, n):
+	"""
+	Get the range of the raw integers of a format.
+	
+	@param m: The number of integer bits for fixed point.
+	
+	@param n: The number of fractional bits for fixed point.
+	
+	@return: A tuple containing the minimum and maximum raw integers.
+	"""
+	
+	return -(1 << (m + n)), (1 << (m + n)) - 1
+
+def fp_encode(x, m, n, counts=None, rounding='truncate', rng=None):
+	"""
+	Encode scalars to fixed point, saturating on overflow.
+	
+	@param x: A numpy array containing the scalars.
+	
+	@param m: The number of integer bits for fixed point.
+	
+	@param n: The number of fractional bits for fixed point.
+	
+	@param counts: If provided, the events are added to these counters (see
+	L{new_counters}).
+	
+	@param rounding: The rounding mode (see L{fp_round}).
+	
+	@param rng: The numpy RandomState used for stochastic rounding.
+	
+	@return: A numpy array containing the raw integers.
+	"""
+	
+	x  = np.asarray(x, dtype='float64')
+	x2 = fp_round(x * (1 << n), rounding, rng)
+	if counts is not None:
+		counts['zero_flushes'] += np.count_nonzero((x2 == 0) & (x != 0))
+	
+	return fp_saturate(x2, m, n, counts)
+
+def fp_saturate(x, m, n, counts=None):
+	"""
+	Saturate raw integers to the range of a format.
+	
+	@param x: A numpy array containing the raw integers.
+	
+	@param m: The number of integer bits for fixed point.
+	
+	@param n: The number of fractional bits for fixed point.
+	
+	@param counts: If provided, the events are added to these counters (see
+	L{new_counters}).
+	
+	@return: A numpy array containing the saturated raw integers.
+	"""
+	
+	low, high = fp_limits(m, n)
+	if counts is not None:
+		overflows  = np.count_nonzero(x > high)
+		underflows = np.count_nonzero(x < low)
+		counts['ops']         += np.size(x)
+		counts['overflows']   += overflows
+		counts['underflows']  += underflows
+		counts['saturations'] += overflows + underflows
+	
+	return np.clip(x, low, high)
+
+def fp_decode(x, m, n):
+	"""
+	Decode fixed point numbers to scalars.
+	
+	@param x: A numpy array containing the raw integers.
+	
+	@param m: The number of integer bits for fixed point.
+	
+	@param n: The number of fractional bits for fixed point.
+	
+	@return: A numpy array containing the scalars.
+	"""
+	
+	return np.asarray(x) / float(1 << n)
+
+def fp_from_q(q, m, n):
+	"""
+	Convert Q formatted numbers to raw integers.
+	
+	@param q: A sequence of strings containing the Q formatted numbers.
+	
+	@param m: The number of integer bits for fixed point.
+	
+	@param n: The number of fractional bits for fixed point.
+	
+	@return: A numpy array containing the raw integers.
+	
+	@raise InvalidQNumber: Raised if a number doesn't have m + n + 1 bits.
+	"""
+	
+	num_bits = m + n + 1
+	q        = np.ascontiguousarray(q)
+	if q.dtype.itemsize != num_bits or np.any(np.char.str_len(q) != num_bits):
+		raise InvalidQNumber(q.flat[0], num_bits)
+	
+	bits = q.view(np.uint8).reshape(q.shape + (num_bits,)) - ord('0')
+	x    = bits.dot(1 << np.arange(num_bits - 1, -1, -1, dtype=np.int64))
+	
+	return x - (x >> (num_bits - 1)) * (1 << num_bits)
+
+def fp_add(x0, x1, m, n, counts=None):
+	"""
+	Add fixed point numbers, saturating on overflow.
+	
+	@param x0: A numpy array containing the raw integers.
+	
+	@param x1: A numpy array containing the raw integers.
+	
+	@param m: The number of integer bits for fixed point.
+	
+	@param n: The number of fractional bits for fixed point.
+	
+	@param counts: If provided, the events are added to these counters (see
+	L{new_counters}).
+	
+	@return: A numpy array containing the raw integers of the sums.
+	"""
+	
+	return fp_saturate(np.add(x0, x1, dtype=np.int64), m, n, counts)
+
+def fp_sub(x0, x1, m, n, counts=None):
+	"""
+	Subtract fixed point numbers, saturating on overflow.
+	
+	@param x0: A numpy array containing the raw integers.
+	
+	@param x1: A numpy array containing the raw integers to subtract.
+	
+	@param m: The number of integer bits for fixed point.
+	
+	@param n: The number of fractional bits for fixed point.
+	
+	@param counts: If provided, the events are added to these counters (see
+	L{new_counters}).
+	
+	@return: A numpy array containing the raw integers of the differences.
+	"""
+	
+	return fp_saturate(np.subtract(x0, x1, dtype=np.int64), m, n, counts)
+
+def fp_mult(x0, x1, m, n, counts=None, rounding='truncate', rng=None):
+	"""
+	Multiply fixed point numbers, saturating on overflow.
+	
+	@param x0: A numpy array containing the raw integers.
+	
+	@param x1: A numpy array containing the raw integers.
+	
+	@param m: The number of integer bits for fixed point.
+	
+	@param n: The number of fractional bits for fixed point.
+	
+	@param counts: If provided, the events are added to these counters (see
+	L{new_counters}).
+	
+	@param rounding: The rounding mode (see L{fp_shift}). By default, the
+	products are rounded towards negative infinity.
+	
+	@param rng: The numpy RandomState used for stochastic rounding.
+	
+	@return: A numpy array containing the raw integers of the products.
+	"""
+	
+	x  = np.multiply(x0, x1, dtype=np.int64)
+	x2 = fp_shift(x, n, rounding, rng)
+	if counts is not None:
+		counts['zero_flushes'] += np.count_nonzero((x2 == 0) & (x != 0))
+	
+	return fp_saturate(x2, m, n, counts)
+
 def test_cases():
 	"""
 	An example usage for the Q class.
@@ -472,6 +941,14 @@ def test_net(m=1, n=11, learning_rate=0.001, iters=100):
 		'Update Error: {5:3.2f}%; {6} vs. {7}'.format(m, n, o_err, o_vals[0],
 		o_vals[1], w_err, w_vals[0], w_vals[1])
 
+###############################################################################
+########## Probes
+###############################################################################
+
+register_probes(Q, 'encode', 'decode', 'add', 'mult')
+register_probes(sys.modules[__name__], 'imgs_to_fp', 'fps_to_imgs', 'fp_encode',
+	'fp_add', 'fp_sub', 'fp_mult')
+
 if __name__ == '__main__':
 	# test_cases()
 	# test_cases2()
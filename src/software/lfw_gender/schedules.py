@@ -0,0 +1,162 @@
+# schedules.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Learning rate schedules.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Learning rate schedules.
+
+A schedule maps the index of an epoch (starting at 0) to the learning rate to
+use for that epoch. Schedules are passed to the "run" method of a classifier.
+
+G{packagetree lfw_gender}
+"""
+
+__docformat__ = 'epytext'
+
+# Native imports
+from abc import ABCMeta, abstractmethod
+
+###############################################################################
+########## Class Templates
+###############################################################################
+
+class BaseSchedule(object):
+	"""
+	Base class for a learning rate schedule.
+	"""
+	__metaclass__ = ABCMeta
+	
+	@abstractmethod
+	def __call__(self, epoch):
+		"""
+		Get the learning rate for an epoch.
+		
+		@param epoch: The index of the epoch, starting at 0.
+		
+		@return: The learning rate.
+		"""
+
+###############################################################################
+########## Class Implementations
+###############################################################################
+
+class ConstantSchedule(BaseSchedule):
+	"""
+	The same learning rate for every epoch.
+	"""
+	
+	def __init__(self, learning_rate):
+		"""
+		Initialize this class.
+		
+		@param learning_rate: The learning rate.
+		"""
+		
+		self.learning_rate = learning_rate
+	
+	def __call__(self, epoch):
+		"""
+		Get the learning rate for an epoch.
+		
+		@param epoch: The index of the epoch, starting at 0.
+		
+		@return: The learning rate.
+		"""
+		
+		return self.learning_rate
+
+class StepSchedule(BaseSchedule):
+	"""
+	Multiply the learning rate by a factor every few epochs.
+	"""
+	
+	def __init__(self, learning_rate, factor=0.5, step_size=5):
+		"""
+		Initialize this class.
+		
+		@param learning_rate: The initial learning rate.
+		
+		@param factor: The factor to multiply the learning rate by.
+		
+		@param step_size: The number of epochs between each change.
+		"""
+		
+		self.learning_rate = learning_rate
+		self.factor        = factor
+		self.step_size     = step_size
+	
+	def __call__(self, epoch):
+		"""
+		Get the learning rate for an epoch.
+		
+		@param epoch: The index of the epoch, starting at 0.
+		
+		@return: The learning rate.
+		"""
+		
+		return self.learning_rate * self.factor ** (epoch // self.step_size)
+
+class ExponentialSchedule(BaseSchedule):
+	"""
+	Decay the learning rate exponentially, i.e. lr * decay ^ epoch.
+	"""
+	
+	def __init__(self, learning_rate, decay=0.9):
+		"""
+		Initialize this class.
+		
+		@param learning_rate: The initial learning rate.
+		
+		@param decay: The factor to multiply the learning rate by each epoch.
+		"""
+		
+		self.learning_rate = learning_rate
+		self.decay         = decay
+	
+	def __call__(self, epoch):
+		"""
+		Get the learning rate for an epoch.
+		
+		@param epoch: The index of the epoch, starting at 0.
+		
+		@return: The learning rate.
+		"""
+		
+		return self.learning_rate * self.decay ** epoch
+
+class InverseTimeSchedule(BaseSchedule):
+	"""
+	Decay the learning rate in proportion to 1 / t, i.e.
+	lr / (1 + decay * epoch).
+	"""
+	
+	def __init__(self, learning_rate, decay=1.):
+		"""
+		Initialize this class.
+		
+		@param learning_rate: The initial learning rate.
+		
+		@param decay: The rate of the decay.
+		"""
+		
+		self.learning_rate = learning_rate
+		self.decay         = decay
+	
+	def __call__(self, epoch):
+		"""
+		Get the learning rate for an epoch.
+		
+		@param epoch: The index of the epoch, starting at 0.
+		
+		@return: The learning rate.
+		"""
+		
+		return self.learning_rate / (1. + self.decay * epoch)
\ No newline at end of file
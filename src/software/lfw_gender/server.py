@@ -0,0 +1,318 @@
+# server.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Local prediction service for a saved network.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Local prediction service for a saved CompetitiveLearningClassifier.
+
+The service is a threaded HTTP server. Concurrent requests are combined into
+batches by a L{RequestCoalescer<lfw_gender.coalescer.RequestCoalescer>}, which
+are classified by a pool of worker processes using the vectorized predict
+path. Every worker memory maps the weights of the saved network, so all of the
+workers share a single physical copy. If the network was saved with a
+projection, each batch of images is projected before it is classified.
+
+Requests are made with a POST to "/predict", whose body is a JSON object of
+the form {"x": [[...], ...]}, containing one image per row. The response is of
+the form {"y": [...]}, containing one category per image. A GET to "/stats"
+returns the request latency percentiles.
+
+G{packagetree lfw_gender}
+"""
+
+__docformat__ = 'epytext'
+
+# Native imports
+import sys, json, httplib, threading
+from BaseHTTPServer  import HTTPServer, BaseHTTPRequestHandler
+from SocketServer    import ThreadingMixIn
+from multiprocessing import Pool, cpu_count
+
+# Third party imports
+import numpy as np
+
+# Program imports
+from lfw_gender.net       import CompetitiveLearningClassifier
+from lfw_gender.coalescer import RequestCoalescer
+from lfw_gender.timers    import LatencyHistogram, clock
+
+###############################################################################
+########## Worker Functions
+###############################################################################
+
+# The network used by a worker process
+_net = None
+
+def _init_worker(model_path):
+	"""
+	Load the network for a worker process.
+	
+	@param model_path: The full path to the saved network.
+	"""
+	
+	global _net
+	_net = CompetitiveLearningClassifier.load(model_path, mmap=True)
+
+def _predict(x):
+	"""
+	Classify a batch of images in a worker process.
+	
+	@param x: A numpy array containing one image per row.
+	
+	@return: A tuple containing a success flag and either the predicted
+	categories or the error message.
+	"""
+	
+	try:
+		return True, _net.predict(_net.project(x)).tolist()
+	except Exception, e:
+		return False, repr(e)
+
+###############################################################################
+########## Class Implementations
+###############################################################################
+
+class PredictionServer(ThreadingMixIn, HTTPServer):
+	"""
+	Threaded HTTP server that batches requests across a worker pool.
+	"""
+	
+	daemon_threads = True
+	
+	def __init__(self, address, model_path, nworkers=None, max_batch_size=64,
+		max_wait=0.002, timeout=30.):
+		"""
+		Initialize the server and start the workers.
+		
+		@param address: A tuple containing the host and port to bind to.
+		
+		@param model_path: The full path to the saved network.
+		
+		@param nworkers: The number of worker processes. If None, one per CPU
+		is used.
+		
+		@param max_batch_size: The maximum number of images to combine into a
+		single batch.
+		
+		@param max_wait: The maximum number of seconds a request waits for
+		others to join its batch.
+		
+		@param timeout: The maximum number of seconds a request waits for its
+		result before it fails.
+		"""
+		
+		HTTPServer.__init__(self, address, PredictionHandler)
+		
+		# Store the params
+		self.max_batch_size = max_batch_size
+		self.timeout        = timeout
+		self.latencies      = LatencyHistogram()
+		self.latency_lock   = threading.Lock()
+		
+		# The images are checked against the size of the raw inputs
+		net          = CompetitiveLearningClassifier.load(model_path,
+			mmap=True)
+		self.ninputs = net.ninputs if net.projection is None else \
+			net.projection.ninputs
+		
+		# Start the workers, keeping one batch in flight per worker
+		nworkers       = cpu_count() if nworkers is None else nworkers
+		self.pool      = Pool(nworkers, _init_worker, (model_path,))
+		self.coalescer = RequestCoalescer(self._predict, max_batch_size,
+			max_wait, nworkers)
+	
+	def _predict(self, x):
+		"""
+		Classify a batch of images using one of the workers.
+		
+		@param x: A numpy array containing one image per row.
+		
+		@return: A list containing the predicted categories.
+		
+		@raise RuntimeError: Raised if the prediction failed.
+		"""
+		
+		success, y = self.pool.apply(_predict, (x,))
+		if not success:
+			raise RuntimeError(y)
+		
+		return y
+	
+	def submit(self, x):
+		"""
+		Classify the provided images, waiting for the result.
+		
+		@param x: The images to classify, one per row.
+		
+		@return: A list containing the predicted categories.
+		
+		@raise ValueError: Raised if the images have the wrong size.
+		
+		@raise RuntimeError: Raised if the prediction failed, timed out, or the
+		server was closed.
+		"""
+		
+		# Reject bad images here, such that they can't spoil a batch
+		x = np.atleast_2d(np.asarray(x, dtype='float64'))
+		if x.ndim != 2 or x.shape[1] != self.ninputs:
+			raise ValueError('Expected images with {0} pixels'.format(
+				self.ninputs))
+		
+		start = clock()
+		try:
+			return self.coalescer.submit(x).result(self.timeout)
+		finally:
+			with self.latency_lock:
+				self.latencies.record(clock() - start)
+	
+	def server_close(self):
+		"""
+		Stop the coalescer and the workers, and close the socket.
+		"""
+		
+		self.coalescer.close()
+		self.pool.terminate()
+		self.pool.join()
+		HTTPServer.server_close(self)
+
+class PredictionHandler(BaseHTTPRequestHandler):
+	"""
+	Handles the HTTP requests for the prediction server.
+	"""
+	
+	def _respond(self, code, body):
+		"""
+		Send a JSON response.
+		
+		@param code: The HTTP status code.
+		
+		@param body: The object to encode as the body.
+		"""
+		
+		data = json.dumps(body)
+		self.send_response(code)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+	
+	def do_POST(self):
+		"""
+		Classify the images in the request.
+		"""
+		
+		if self.path != '/predict':
+			return self._respond(404, {'error':'Unknown path'})
+		
+		try:
+			body = json.loads(self.rfile.read(int(
+				self.headers.getheader('Content-Length', 0))))
+			y    = self.server.submit(body['x'])
+		except (ValueError, KeyError, TypeError), e:
+			return self._respond(400, {'error':repr(e)})
+		except RuntimeError, e:
+			return self._respond(500, {'error':str(e)})
+		
+		self._respond(200, {'y':y})
+	
+	def do_GET(self):
+		"""
+		Report the latency percentiles.
+		"""
+		
+		if self.path != '/stats':
+			return self._respond(404, {'error':'Unknown path'})
+		
+		with self.server.latency_lock:
+			summary = self.server.latencies.summary()
+		self._respond(200, {'latency':summary})
+	
+	def log_message(self, format, *args):
+		"""
+		Silence the per request logging.
+		"""
+
+###############################################################################
+########## Functions
+###############################################################################
+
+def predict(x, host='127.0.0.1', port=8000):
+	"""
+	Classify images using a running prediction server.
+	
+	@param x: The images to classify, one per row.
+	
+	@param host: The host of the server.
+	
+	@param port: The port of the server.
+	
+	@return: A list containing the predicted categories.
+	
+	@raise RuntimeError: Raised if the server reported an error.
+	"""
+	
+	conn = httplib.HTTPConnection(host, port)
+	try:
+		conn.request('POST', '/predict', json.dumps({'x':np.asarray(x,
+			dtype='float64').tolist()}), {'Content-Type':'application/json'})
+		response = conn.getresponse()
+		body     = json.loads(response.read())
+	finally:
+		conn.close()
+	if response.status != 200:
+		raise RuntimeError(body['error'])
+	
+	return body['y']
+
+def stats(host='127.0.0.1', port=8000):
+	"""
+	Get the latency statistics from a running prediction server.
+	
+	@param host: The host of the server.
+	
+	@param port: The port of the server.
+	
+	@return: A dictionary containing the statistics.
+	"""
+	
+	conn = httplib.HTTPConnection(host, port)
+	try:
+		conn.request('GET', '/stats')
+		return json.loads(conn.getresponse().read())
+	finally:
+		conn.close()
+
+def main(model_path, host='127.0.0.1', port=8000, nworkers=None):
+	"""
+	Serve a saved network until interrupted.
+	
+	@param model_path: The full path to the saved network.
+	
+	@param host: The host to bind to.
+	
+	@param port: The port to bind to.
+	
+	@param nworkers: The number of worker processes. If None, one per CPU is
+	used.
+	"""
+	
+	server = PredictionServer((host, port), model_path, nworkers)
+	print 'Serving {0} on {1}:{2}'.format(model_path, host, port)
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+
+if __name__ == '__main__':
+	# The path to the saved network must be provided
+	main(sys.argv[1])
\ No newline at end of file
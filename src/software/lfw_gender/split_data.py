@@ -21,13 +21,14 @@ G{packagetree lfw_gender}
 __docformat__ = 'epytext'
 
 # Native imports
-import os, random, cPickle
+import os, sys, random, cPickle
 
 # Third party imports
 import numpy as np
 
 # Program imports
 from lfw_gender.exception_handler import BaseException, wrap_error
+from lfw_gender.hooks             import register_probes
 
 ###############################################################################
 ########## Exception Handling
@@ -90,10 +91,14 @@ def get_count(preprocessed_path):
 	
 	return male_names, female_names
 
-def build_dataset(names, gender, ntrain, ntest):
+def build_dataset(preprocessed_path, names, gender, ntrain, ntest):
 	"""
 	Generate a dataset for a single gender.
 	
+	@param preprocessed_path: The full path to the preprocessed data. There
+	should be a folder for "male" and "female" in this path, containing a
+	number of pickle files, representing the desired images.
+	
 	@param names: A distribution of the names for each gender.
 	
 	@param gender: The gender to use ("male" or "female").
@@ -169,10 +174,10 @@ def main(preprocessed_path, out_dir, ntrain=800, ntest=200):
 		raise InvalidSelectionAmount(max_samples, requested_samples)
 	
 	# Generate the data
-	(m_train_x, m_train_y), (m_test_x, m_test_y) = build_dataset(male_names,
-		'male',	ntrain / 2, ntest / 2)
-	(f_train_x, f_train_y), (f_test_x, f_test_y) = build_dataset(female_names,
-		'female', ntrain / 2, ntest / 2)
+	(m_train_x, m_train_y), (m_test_x, m_test_y) = build_dataset(
+		preprocessed_path, male_names, 'male', ntrain / 2, ntest / 2)
+	(f_train_x, f_train_y), (f_test_x, f_test_y) = build_dataset(
+		preprocessed_path, female_names, 'female', ntrain / 2, ntest / 2)
 	
 	# Combine the male and female data and randomly shuffle them
 	b_train_x = np.concatenate((m_train_x, f_train_x))
@@ -191,6 +196,12 @@ def main(preprocessed_path, out_dir, ntrain=800, ntest=200):
 		cPickle.dump(((train_x, train_y), (test_x, test_y)), f,
 			cPickle.HIGHEST_PROTOCOL)
 
+###############################################################################
+########## Probes
+###############################################################################
+
+register_probes(sys.modules[__name__], 'get_count', 'build_dataset')
+
 if __name__ == '__main__':
 	# Get the path, based off the path in the repo
 	preprocessed_path = os.path.join(os.path.dirname(os.path.dirname(
@@ -13,15 +13,73 @@
 """
 Module used for timing.
 
+Two clocks are provided. L{clock} is monotonic, so it is used for the
+timers, the sections and anything that waits. On Python 2, it is read
+through ctypes, costing about 0.8 us per call (against 0.07 us for
+time.time). That is too much for timing a single step of a network, which
+takes about 5 us for 49 inputs, so the per step sections and latencies use
+L{step_clock} instead, which is cheap but, on Python 2, not monotonic. A
+jump of the wall clock then only distorts the sample it occurs in.
+Measured on a step with 49 / 900 inputs, the overhead of timing each step
+is:
+	- About 100% / 50% with L{MultiTimer.enter} / L{MultiTimer.exit}.
+	- About 45% / 50% with L{TimerNode.record} and L{clock}.
+	- About 10% / 25% with L{TimerNode.record} and L{step_clock}, as done by
+	the networks.
+
 G{packagetree lfw_gender}
 """
 
 __docformat__ = 'epytext'
 
 # Native imports
-import time, csv
+import csv, math, sys, threading, ctypes, ctypes.util
+from functools import wraps
 from itertools import izip
 
+def _monotonic_clock():
+	"""
+	Get a monotonic clock for Python 2, which lacks one. On Linux,
+	CLOCK_MONOTONIC is read with clock_gettime from the C library. Elsewhere,
+	the wall clock is the only clock available, so it is used instead.
+	
+	@return: A function returning the current time, in seconds.
+	"""
+	
+	if not sys.platform.startswith('linux'):
+		from timeit import default_timer
+		return default_timer
+	
+	CLOCK_MONOTONIC = 1
+	clock_gettime   = ctypes.CDLL(ctypes.util.find_library('rt') or
+		ctypes.util.find_library('c'), use_errno=True).clock_gettime
+	local           = threading.local()
+	
+	# The function is bound once and each thread reuses its own timespec,
+	# i.e. (tv_sec, tv_nsec), leaving only the cost of the foreign call
+	def clock():
+		try:
+			ts = local.ts
+		except AttributeError:
+			ts = local.ts = (ctypes.c_long * 2)()
+		if clock_gettime(CLOCK_MONOTONIC, ts) != 0:
+			raise OSError(ctypes.get_errno(), 'clock_gettime failed')
+		return ts[0] + ts[1] * 1e-9
+	
+	return clock
+
+# Use the highest resolution monotonic clock available
+try:
+	from time import perf_counter as clock
+except ImportError:
+	clock = _monotonic_clock()
+
+# Use the cheapest high resolution clock for timing single steps
+try:
+	from time import perf_counter as step_clock
+except ImportError:
+	from time import time as step_clock
+
 ###############################################################################
 ########## Primary Functions
 ###############################################################################
@@ -64,6 +122,32 @@ def pretty_time(elapsed_time):
 	# Return the formatted time
 	return ', '.join(formatted_times) + str.format(times[-1], labels[-1])
 
+def log_histograms(histograms, out_path, header=True,
+	percentiles=(50, 90, 99)):
+	"""
+	Creates a log CSV file for a set of latency histograms, with one row per
+	histogram.
+	
+	@param histograms: A dictionary mapping a name to a L{LatencyHistogram}.
+	
+	@param out_path: The full path to the CSV to write to.
+	
+	@param header: Flag denoting whether the header should be printed or
+	not.
+	
+	@param percentiles: The percentiles to report.
+	"""
+	
+	with open(out_path, 'wb') as f:
+		writer = csv.writer(f)
+		if header:
+			writer.writerow(['name', 'count', 'mean'] + ['p{0}'.format(p) for p
+				in percentiles] + ['max'])
+		for name in sorted(histograms):
+			h = histograms[name]
+			writer.writerow([name, h.count, h.mean()] + [h.percentile(p) for p
+				in percentiles] + [h.max])
+
 ###############################################################################
 ########## Class Implementations
 ###############################################################################
@@ -88,14 +172,14 @@ class SimpleTimer(object):
 		Start the timer.
 		"""
 		
-		self.start_time = time.time()
+		self.start_time = clock()
 	
 	def pause(self):
 		"""
 		Pauses the timer and compute the elapsed time.
 		"""
 		
-		self.finish_time  = time.time()
+		self.finish_time  = clock()
 		self.elapsed_time += self.finish_time - self.start_time
 	
 	def stop(self):
@@ -103,7 +187,7 @@ class SimpleTimer(object):
 		Stop the timer and compute the elapsed time.
 		"""
 		
-		self.finish_time  = time.time()
+		self.finish_time  = clock()
 		self.elapsed_time = self.finish_time - self.start_time
 	
 	def get_elapsed_time(self, pretty=False):
@@ -122,9 +206,241 @@ class SimpleTimer(object):
 		else:
 			return pretty_time(self.elapsed_time)
 
+class LatencyHistogram(object):
+	"""
+	Fixed memory histogram of latencies, using logarithmically sized buckets.
+	Each bucket spans a constant ratio, thus every percentile is accurate to
+	within that ratio, regardless of the magnitude of the latency.
+	"""
+	
+	def __init__(self, min_latency=1e-7, max_latency=1e3,
+		buckets_per_decade=20):
+		"""
+		Initialize this histogram.
+		
+		@param min_latency: The smallest latency, in seconds, to resolve. Any
+		smaller latency is placed in the first bucket.
+		
+		@param max_latency: The largest latency, in seconds, to resolve. Any
+		larger latency is placed in the last bucket.
+		
+		@param buckets_per_decade: The number of buckets per factor of ten.
+		"""
+		
+		# Store the params
+		self.min_latency        = min_latency
+		self.buckets_per_decade = buckets_per_decade
+		self.log_min            = math.log10(min_latency)
+		self.nbuckets           = int(math.ceil((math.log10(max_latency) -
+			self.log_min) * buckets_per_decade)) + 1
+		
+		# Initialize the statistics
+		self.counts = [0] * self.nbuckets
+		self.count  = 0
+		self.total  = 0.
+		self.max    = 0.
+	
+	def record(self, latency):
+		"""
+		Add a single latency.
+		
+		@param latency: The latency in seconds.
+		"""
+		
+		if latency > self.min_latency:
+			i = int((math.log10(latency) - self.log_min) *
+				self.buckets_per_decade)
+			if i >= self.nbuckets: i = self.nbuckets - 1
+		else:
+			i = 0
+		self.counts[i] += 1
+		self.count     += 1
+		self.total     += latency
+		if latency > self.max: self.max = latency
+	
+	def merge(self, histogram):
+		"""
+		Add all of the latencies from another histogram with the same buckets.
+		
+		@param histogram: The L{LatencyHistogram} to add.
+		"""
+		
+		self.counts = [a + b for a, b in izip(self.counts, histogram.counts)]
+		self.count += histogram.count
+		self.total += histogram.total
+		self.max    = max(self.max, histogram.max)
+	
+	def mean(self):
+		"""
+		Get the mean latency.
+		
+		@return: The mean latency in seconds.
+		"""
+		
+		return self.total / self.count if self.count else 0.
+	
+	def percentile(self, p):
+		"""
+		Get a percentile of the latencies. The upper edge of the bucket holding
+		the percentile is reported, capped at the maximum latency.
+		
+		@param p: The percentile, between 0 and 100.
+		
+		@return: The latency in seconds.
+		"""
+		
+		if not self.count:
+			return 0.
+		
+		target = p / 100. * self.count; cumulative = 0
+		for i, c in enumerate(self.counts):
+			cumulative += c
+			if cumulative >= target and c:
+				break
+		
+		return min(10 ** (self.log_min + (i + 1.) / self.buckets_per_decade),
+			self.max)
+	
+	def summary(self, percentiles=(50, 90, 99)):
+		"""
+		Get the main statistics.
+		
+		@param percentiles: The percentiles to report.
+		
+		@return: A dictionary containing the count, mean, max, and each
+		percentile (as "p50", etc.).
+		"""
+		
+		stats = {'count':self.count, 'mean':self.mean(), 'max':self.max}
+		for p in percentiles:
+			stats['p{0}'.format(p)] = self.percentile(p)
+		
+		return stats
+
+class TimerNode(object):
+	"""
+	A single section in a tree of timed sections. Each node keeps statistics
+	across every time the section was executed.
+	"""
+	
+	__slots__ = ('name', 'parent', 'children', 'count', 'total', 'min', 'max',
+		'start_time')
+	
+	def __init__(self, name, parent=None):
+		"""
+		Initialize this node.
+		
+		@param name: The name of the section.
+		
+		@param parent: The parent node, if any.
+		"""
+		
+		self.name       = name
+		self.parent     = parent
+		self.children   = {}
+		self.count      = 0
+		self.total      = 0.
+		self.min        = float('inf')
+		self.max        = 0.
+		self.start_time = None
+	
+	def child(self, name):
+		"""
+		Get a child node, creating it if it doesn't exist.
+		
+		@param name: The name of the child section.
+		
+		@return: The child node.
+		"""
+		
+		try:
+			return self.children[name]
+		except KeyError:
+			node = self.children[name] = TimerNode(name, self)
+			return node
+	
+	def record(self, elapsed_time):
+		"""
+		Add a single execution of this section.
+		
+		@param elapsed_time: The number of elapsed seconds.
+		"""
+		
+		self.count += 1
+		self.total += elapsed_time
+		if elapsed_time < self.min: self.min = elapsed_time
+		if elapsed_time > self.max: self.max = elapsed_time
+	
+	def mean(self):
+		"""
+		Get the mean time of the section.
+		
+		@return: The mean number of seconds per execution.
+		"""
+		
+		return self.total / self.count if self.count else 0.
+	
+	def path(self):
+		"""
+		Get the full path of the section, with each level separated by a "/".
+		
+		@return: The path of this node, excluding the root.
+		"""
+		
+		names = []; node = self
+		while node.parent is not None:
+			names.append(node.name); node = node.parent
+		
+		return '/'.join(reversed(names))
+	
+	def walk(self):
+		"""
+		Iterate over this node and all of its descendants, depth first.
+		
+		@return: A generator of (depth, node) tuples.
+		"""
+		
+		stack = [(0, self)]
+		while stack:
+			depth, node = stack.pop()
+			yield depth, node
+			stack.extend((depth + 1, c) for c in sorted(node.children.values(),
+				key=lambda c: c.name, reverse=True))
+
+class TimerSection(object):
+	"""
+	Context manager used to time a section of a L{MultiTimer}.
+	"""
+	
+	__slots__ = ('timer', 'name')
+	
+	def __init__(self, timer, name):
+		"""
+		Initialize this section.
+		
+		@param timer: The L{MultiTimer} to record the section in.
+		
+		@param name: The name of the section.
+		"""
+		
+		self.timer = timer
+		self.name  = name
+	
+	def __enter__(self):
+		self.timer.enter(self.name)
+		return self
+	
+	def __exit__(self, *exc_info):
+		self.timer.exit()
+
 class MultiTimer(object):
 	"""
-	Timer class used to work with multiple timers..
+	Timer class used to work with multiple timers.
+	
+	Besides the flat, named timers, a tree of nested sections may be timed
+	using L{enter} / L{exit}, L{section}, or L{timed}. Each section is a child
+	of the section that was active when it was entered, e.g. "train/step".
+	The nested sections are not thread safe.
 	"""
 	
 	def __init__(self):
@@ -133,6 +449,131 @@ class MultiTimer(object):
 		"""
 		
 		self.timers = {}
+		self.root   = TimerNode('root')
+		self.active = self.root
+	
+	def enter(self, name):
+		"""
+		Start timing a section, nested within the active section.
+		
+		@param name: The name of the section.
+		"""
+		
+		node            = self.active.child(name)
+		self.active     = node
+		node.start_time = clock()
+	
+	def exit(self):
+		"""
+		Stop timing the active section.
+		"""
+		
+		end         = clock()
+		node        = self.active
+		node.record(end - node.start_time)
+		self.active = node.parent
+	
+	def subsection(self, name):
+		"""
+		Get a section nested within the active section, without entering it.
+		The section may then be timed directly with L{TimerNode.record}, which
+		avoids the overhead of L{enter} / L{exit} for very short sections,
+		e.g. a single step.
+		
+		@param name: The name of the section.
+		
+		@return: The L{TimerNode} for the section.
+		"""
+		
+		return self.active.child(name)
+	
+	def section(self, name):
+		"""
+		Get a context manager for timing a section.
+		
+		@param name: The name of the section.
+		
+		@return: A L{TimerSection}.
+		"""
+		
+		return TimerSection(self, name)
+	
+	def timed(self, name=None):
+		"""
+		Decorator for timing every call of a function as a section.
+		
+		@param name: The name of the section. If None, the name of the function
+		is used.
+		
+		@return: The decorator.
+		"""
+		
+		def decorator(func):
+			section_name = func.__name__ if name is None else name
+			
+			@wraps(func)
+			def wrapper(*args, **kargs):
+				self.enter(section_name)
+				try:
+					return func(*args, **kargs)
+				finally:
+					self.exit()
+			
+			return wrapper
+		
+		return decorator
+	
+	def get_section(self, path):
+		"""
+		Retrieve a section.
+		
+		@param path: The path of the section, e.g. "epoch/train".
+		
+		@return: The L{TimerNode} for the section.
+		"""
+		
+		node = self.root
+		for name in path.split('/'):
+			node = node.children[name]
+		
+		return node
+	
+	def report(self):
+		"""
+		Get a human-readable breakdown of all of the sections.
+		
+		@return: A string containing one line per section.
+		"""
+		
+		lines = ['{0:<29}{1:>10}{2:>10}{3:>10}{4:>10}{5:>10}'.format('Section',
+			'Calls', 'Total [s]', 'Min [s]', 'Mean [s]', 'Max [s]')]
+		for depth, node in self.root.walk():
+			if node is self.root: continue
+			lines.append('{0:<29}{1:>10}{2:>10.4f}{3:>10.6f}{4:>10.6f}'
+				'{5:>10.6f}'.format('  ' * (depth - 1) + node.name, node.count,
+				node.total, node.min, node.mean(), node.max))
+		
+		return '\n'.join(lines)
+	
+	def log_sections(self, out_path, header=True):
+		"""
+		Creates a log CSV file for all sections, with one row per section.
+		
+		@param out_path: The full path to the CSV to write to.
+		
+		@param header: Flag denoting whether the header should be printed or
+		not.
+		"""
+		
+		with open(out_path, 'wb') as f:
+			writer = csv.writer(f)
+			if header:
+				writer.writerow(['section', 'count', 'total', 'min', 'mean',
+					'max'])
+			for _, node in self.root.walk():
+				if node is self.root: continue
+				writer.writerow([node.path(), node.count, node.total, node.min,
+					node.mean(), node.max])
 	
 	def add_timers(self, *timer_names):
 		"""
@@ -0,0 +1,166 @@
+# test_net.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Tests for the network implementation.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Tests for the network implementation. Run from the "software" directory with:
+	python -m unittest discover -s tests
+"""
+
+__docformat__ = 'epytext'
+
+# Native imports
+import sys, unittest
+from StringIO import StringIO
+
+# Third party imports
+import numpy as np
+
+# Program imports
+from lfw_gender.net import SimpleCompetitiveLearning, \
+	CompetitiveLearningClassifier
+
+###############################################################################
+########## Helpers
+###############################################################################
+
+class CountingArray(np.ndarray):
+	"""
+	Array that counts every array created from it, e.g. the result of a ufunc
+	without an output buffer or a view. Arrays written to through "out" aren't
+	created, so they aren't counted.
+	"""
+	
+	count = 0
+	
+	def __array_finalize__(self, obj):
+		if obj is not None:
+			CountingArray.count += 1
+
+###############################################################################
+########## Tests
+###############################################################################
+
+class TestSimpleCompetitiveLearningStep(unittest.TestCase):
+	"""
+	Tests for L{SimpleCompetitiveLearning.step<lfw_gender.net.
+	SimpleCompetitiveLearning.step>}.
+	"""
+	
+	def setUp(self):
+		np.random.seed(0)
+		self.net = SimpleCompetitiveLearning(49)
+		self.x   = np.random.uniform(0, 1, (10, 49))
+	
+	def _counting(self):
+		"""
+		Replace the arrays of the net with counting views.
+		"""
+		
+		for attr in ('weights', 'soutputs', '_soutput', '_diff', '_scaled'):
+			setattr(self.net, attr, getattr(self.net, attr).view(
+				CountingArray))
+		
+		return [xi.view(CountingArray) for xi in self.x]
+	
+	def test_no_allocations(self):
+		for learning in (True, False):
+			self.net.learning = learning
+			x = self._counting()
+			CountingArray.count = 0
+			for xi in x:
+				self.net.step(xi)
+			self.assertEqual(CountingArray.count, 0)
+	
+	def test_buffers_reused(self):
+		attrs   = ('weights', 'soutputs', '_diff', '_scaled')
+		buffers = [getattr(self.net, a).ctypes.data for a in attrs]
+		for xi in self.x:
+			self.net.step(xi)
+			self.assertEqual([getattr(self.net, a).ctypes.data for a in
+				attrs], buffers)
+	
+	def test_matches_reference(self):
+		w = self.net.weights.copy(); s = self.net.scale
+		for xi in self.x:
+			self.net.step(xi)
+			self.assertAlmostEqual(self.net.soutputs[0], np.sum(((w - xi) *
+				s) ** 2))
+			w += self.net.learning_rate * (xi - w)
+			np.testing.assert_allclose(self.net.weights, w)
+
+class TestCompetitiveLearningClassifierRun(unittest.TestCase):
+	"""
+	Tests for L{CompetitiveLearningClassifier.run<lfw_gender.net.
+	CompetitiveLearningClassifier.run>}.
+	"""
+	
+	def setUp(self):
+		np.random.seed(0)
+		self.train_x = np.random.uniform(0, 1, (300, 16))
+		self.train_y = np.random.randint(0, 2, 300)
+		
+		# Fewer testing samples than the duty cycle, such that the activation
+		# histories still hold some of the training samples
+		self.test_x = np.random.uniform(0, 1, (10, 16))
+		self.test_y = np.random.randint(0, 2, 10)
+	
+	def _run(self, **kargs):
+		np.random.seed(1)
+		net = CompetitiveLearningClassifier(16, 8, (0, 1))
+		net.run(self.train_x, self.train_y, self.test_x, self.test_y,
+			verbose=False, **kargs)
+		
+		return net
+	
+	def test_fused_trains_identically(self):
+		a = self._run(nepochs=4)
+		b = self._run(nepochs=4, fused=True)
+		np.testing.assert_array_equal(a.weights, b.weights)
+		for category in a.cnets:
+			np.testing.assert_array_equal(a.cnets[category].boost,
+				b.cnets[category].boost)
+			np.testing.assert_array_equal(a.cnets[category].boutputs,
+				b.cnets[category].boutputs)
+	
+	def test_workers_train_identically(self):
+		a = self._run(nepochs=4)
+		b = self._run(nepochs=4, nworkers=2)
+		np.testing.assert_array_equal(a.weights, b.weights)
+		for category in a.cnets:
+			self.assertTrue(np.may_share_memory(b.cnets[category].weights,
+				b.weights))
+			np.testing.assert_array_equal(a.cnets[category].boost,
+				b.cnets[category].boost)
+			np.testing.assert_array_equal(a.cnets[category].boutputs,
+				b.cnets[category].boutputs)
+			np.testing.assert_array_equal(a.cnets[category].wins,
+				b.cnets[category].wins)
+	
+	def test_no_epochs(self):
+		np.random.seed(1)
+		net     = CompetitiveLearningClassifier(16, 8, (0, 1))
+		weights = net.weights.copy()
+		stdout  = sys.stdout
+		sys.stdout = StringIO()
+		try:
+			for verbose in (False, True):
+				train_accuracy, test_accuracy = net.run(self.train_x,
+					self.train_y, self.test_x, self.test_y, nepochs=0,
+					verbose=verbose, patience=2)
+				self.assertEqual(len(train_accuracy), 0)
+				self.assertEqual(len(test_accuracy), 0)
+		finally:
+			sys.stdout = stdout
+		np.testing.assert_array_equal(net.weights, weights)
+
+if __name__ == '__main__':
+	unittest.main()
\ No newline at end of file
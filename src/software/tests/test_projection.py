@@ -0,0 +1,63 @@
+# test_projection.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Tests for the input projections.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Tests for the input projections. Run from the "software" directory with:
+	python -m unittest discover -s tests
+"""
+
+__docformat__ = 'epytext'
+
+# Native imports
+import unittest
+
+# Third party imports
+import numpy as np
+
+# Program imports
+from lfw_gender.projection import PCAProjection, InvalidComponents
+
+###############################################################################
+########## Tests
+###############################################################################
+
+class TestPCAProjectionRank(unittest.TestCase):
+	"""
+	Tests for fitting a L{PCAProjection<lfw_gender.projection.PCAProjection>}
+	on rank deficient samples.
+	"""
+	
+	def setUp(self):
+		# 30 samples with 5 inputs, spanning only a 2D plane after centering
+		np.random.seed(0)
+		self.x = np.dot(np.random.normal(0, 1, (30, 2)), np.random.normal(0,
+			1, (2, 5))) + np.random.uniform(0, 1, 5)
+	
+	def test_collinear_rejected(self):
+		for whiten in (False, True):
+			self.assertRaises(InvalidComponents, PCAProjection(3,
+				whiten).fit, self.x)
+	
+	def test_duplicates_rejected(self):
+		x = np.repeat(self.x[:3], 10, 0)
+		self.assertRaises(InvalidComponents, PCAProjection(3, True).fit, x)
+		self.assertRaises(InvalidComponents, PCAProjection(1, True).fit,
+			np.repeat(self.x[:1], 10, 0))
+	
+	def test_rank_whitened(self):
+		projection = PCAProjection(2, True).fit(self.x)
+		y          = projection.transform(self.x)
+		self.assertTrue(np.all(np.isfinite(y)))
+		np.testing.assert_allclose(np.var(y, 0, ddof=1), 1)
+
+if __name__ == '__main__':
+	unittest.main()
\ No newline at end of file
@@ -0,0 +1,101 @@
+# test_q_format.py
+#	
+# Author         : James Mnatzaganian
+# Contact        : http://techtorials.me
+# Date Created   : 10/19/26
+#	
+# Description    : Tests for the fixed point implementation.
+# Python Version : 2.7.8
+#
+# License        : MIT License http://opensource.org/licenses/mit-license.php
+# Copyright      : (c) 2015 James Mnatzaganian
+
+"""
+Tests for the fixed point implementation. Run from the "software" directory
+with:
+	python -m unittest discover -s tests
+"""
+
+__docformat__ = 'epytext'
+
+# Native imports
+import unittest
+
+# Program imports
+from lfw_gender.q_format import Q, ROUNDING_MODES, format_counters, \
+	reset_format_counters
+
+###############################################################################
+########## Tests
+###############################################################################
+
+class TestQSaturation(unittest.TestCase):
+	"""
+	Tests for the saturation of L{Q<lfw_gender.q_format.Q>} arithmetic, with
+	m = 1 and n = 4, i.e. a range of [-2, 1.9375].
+	"""
+	
+	def setUp(self):
+		reset_format_counters()
+	
+	def _q(self, scalar, rounding):
+		return Q(1, 4, scalar, rounding)
+	
+	def _value(self, q):
+		return q.decode(q.q_num)
+	
+	def test_add_overflow(self):
+		for rounding in ROUNDING_MODES:
+			q = self._q(1.5, rounding) + self._q(1., rounding)
+			self.assertEqual(self._value(q), 1.9375, rounding)
+	
+	def test_add_underflow(self):
+		for rounding in ROUNDING_MODES:
+			q = self._q(-1.5, rounding) + self._q(-1., rounding)
+			self.assertEqual(self._value(q), -2., rounding)
+	
+	def test_sub_overflow(self):
+		for rounding in ROUNDING_MODES:
+			q = self._q(1.5, rounding) - self._q(-1., rounding)
+			self.assertEqual(self._value(q), 1.9375, rounding)
+	
+	def test_sub_underflow(self):
+		for rounding in ROUNDING_MODES:
+			q  = self._q(-1.5, rounding) - self._q(1., rounding)
+			q2 = self._q(-1.5, rounding)
+			q2 -= self._q(1., rounding)
+			self.assertEqual(self._value(q), -2., rounding)
+			self.assertEqual(self._value(q2), -2., rounding)
+	
+	def test_boundaries_are_exact(self):
+		for rounding in ROUNDING_MODES:
+			self.assertEqual(self._value(self._q(-1., rounding) + self._q(-1.,
+				rounding)), -2., rounding)
+			self.assertEqual(self._value(self._q(1.9375, rounding) -
+				self._q(0., rounding)), 1.9375, rounding)
+			self.assertEqual(self._value(self._q(0., rounding) - self._q(-2.,
+				rounding)), 1.9375, rounding)
+	
+	def test_counters(self):
+		for rounding in ROUNDING_MODES:
+			reset_format_counters()
+			self._q(-1.5, rounding) + self._q(-1., rounding)
+			self._q(1.5, rounding) + self._q(1., rounding)
+			counters = format_counters(1, 4)
+			self.assertEqual(counters['underflows'], 1, rounding)
+			self.assertEqual(counters['overflows'], 1, rounding)
+			self.assertEqual(counters['saturations'], 2, rounding)
+	
+	def test_encode_minimum(self):
+		for rounding in ROUNDING_MODES:
+			self.assertEqual(self._q(-2., rounding).q_num, '100000', rounding)
+	
+	def test_clamp_underflow(self):
+		q = Q(1, 4)
+		self.assertEqual(q._clamp(q.encode(-10.)), '100000')
+		self.assertEqual(q._clamp(q.encode(10.)), '011111')
+		self.assertEqual(format_counters(1, 4)['underflows'], 1)
+		self.assertEqual(format_counters(1, 4)['overflows'], 1)
+
+if __name__ == '__main__':
+	unittest.main()
\ No newline at end of file